@@ -0,0 +1,286 @@
+"""
+Benchmarks of the GA stages on the real corpus and on synthetic scale-ups.
+
+For every corpus scale it measures, in isolation:
+    fitness          recipes/s, batch (Population, encoding included and already
+                     encoded), per recipe (ga.calculate_fitness) and from cached
+                     aggregates (ga.incremental_fitness)
+    selection        parents/s for every scheme of selection.py, plus elite picking
+    crossover        children/s
+    mutation         mutations/s
+    creativity       recipes/s through evaluate_creativity_batch
+    profile          seconds to build the CorpusProfile
+and for every (population size, generations) pair of the grid a full
+generator.evolve run: generations/s and fitness evaluations/s.
+
+Synthetic corpora have the schema of 2_Scaled_Units_Cleaned.csv: every
+recipe is copied scale times under a new Recipe_Index with jittered
+quantities and ratings. They are written (and converted to .kb) once into
+the data directory and reused.
+
+    python benchmark.py --scales 1 10 100 --population-sizes 50 100 --generations 10 50 --output bench.json
+"""
+import argparse
+import contextlib
+import copy
+import csv
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+import creativity_evaluation
+import ga
+import generator
+import knowledge_base
+import recipeClean
+import selection
+from population import Population
+
+SOURCE_CSV = os.path.join(knowledge_base.DATA_DIR, '2_Scaled_Units_Cleaned.csv')
+DATA_DIR = os.path.join(knowledge_base.DATA_DIR, '.cache', 'benchmark')
+CSV_FIELDS = ['Ingredient', 'Text', 'Recipe_Index', 'Rating', 'Quantity', 'Unit']
+
+def make_synthetic_csv(path, scale, source=SOURCE_CSV, seed=0):
+    """
+    Write a corpus scale times the size of source with the same columns.
+    Copy k of recipe R is named R_k; quantities are scaled by U(0.75, 1.25)
+    and ratings shifted by U(-0.05, 0.05). Rows are streamed to the file.
+    """
+    with open(source, 'r', encoding='iso-8859-1') as f:
+        rows = list(csv.DictReader(f))
+    rng = random.Random(seed)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='iso-8859-1', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for k in range(scale):
+            for row in rows:
+                out = dict(row)
+                out['Recipe_Index'] = f"{row['Recipe_Index']}_{k}"
+                try:
+                    quantity = round(float(row['Quantity']) * rng.uniform(0.75, 1.25), 2)
+                    out['Quantity'] = quantity
+                    out['Text'] = f"{quantity} {row['Unit']} {row['Ingredient']}"
+                except ValueError:
+                    pass
+                try:
+                    out['Rating'] = round(min(1.0, max(0.0, float(row['Rating']) + rng.uniform(-0.05, 0.05))), 9)
+                except ValueError:
+                    pass
+                writer.writerow(out)
+    os.replace(tmp_path, path)
+    return path
+
+def corpus_path(scale, data_dir=DATA_DIR):
+    """Path of the .kb corpus of a scale, building the CSV and .kb if missing"""
+    os.makedirs(data_dir, exist_ok=True)
+    kb_path = os.path.join(data_dir, f"corpus_x{scale}.kb")
+    if not os.path.exists(kb_path):
+        if scale == 1:
+            csv_path = SOURCE_CSV
+        else:
+            csv_path = os.path.join(data_dir, f"corpus_x{scale}.csv")
+            if not os.path.exists(csv_path):
+                make_synthetic_csv(csv_path, scale, SOURCE_CSV)
+        categories = ga.kb.categories  # curated categories of the default knowledge base
+        with contextlib.redirect_stdout(io.StringIO()):
+            recipeClean.transform_csv_to_kb(csv_path, kb_path, categories)
+    return kb_path
+
+def timed(fn, repeat, setup=None):
+    """
+    Best wall time of repeat calls of fn(), and its last result. With setup,
+    each call is fn(setup()) and the setup is not timed.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def rate(count, seconds):
+    return {'count': count, 'seconds': seconds, 'per_second': count / seconds if seconds > 0 else None}
+
+def sample_recipes(n, rng):
+    """n normalised recipes drawn from the current knowledge base"""
+    recipes = rng.choices(ga.kb.recipes, k=n)
+    for r in recipes:
+        ga.normalise_recipe(r)
+    return recipes
+
+def bench_stages(n, repeat, seed):
+    """Throughput of the individual stages on n recipes"""
+    rng = random.Random(seed)
+    recipes = sample_recipes(n, rng)
+    pairs = [(rng.randrange(n), rng.randrange(n)) for _ in range(n)]
+    results = {}
+
+    seconds, _ = timed(lambda: Population.from_recipes(recipes).fitness(), repeat)
+    results['fitness_batch'] = rate(n, seconds)
+    encoded = Population.from_recipes(recipes)
+    seconds, _ = timed(encoded.fitness, repeat)
+    results['fitness_encoded'] = rate(n, seconds)
+    seconds, _ = timed(lambda: [ga.calculate_fitness(r) for r in recipes], repeat)
+    results['fitness_scalar'] = rate(n, seconds)
+    # Incremental scoring adds aggregates to a recipe; the breeding stages
+    # below time the default path, on recipes without them
+    with_aggregates = copy.deepcopy(recipes)
+    for r in with_aggregates:
+        ga.recipe_aggregates(r)
+    seconds, _ = timed(lambda: [ga.incremental_fitness(r) for r in with_aggregates], repeat)
+    results['fitness_incremental'] = rate(n, seconds)
+
+    fitness = np.array([ga.calculate_fitness(r) for r in recipes])
+    for scheme in selection.SCHEMES:
+        select_rng = selection.rng_for(seed)
+        seconds, _ = timed(lambda: selection.select_pairs(fitness, n, select_rng, scheme), repeat)
+        results[f'selection_{scheme}'] = rate(2 * n, seconds)
+    seconds, _ = timed(lambda: selection.top(fitness, n // 10), repeat)
+    results['elites'] = rate(n, seconds)
+
+    def crossover():
+        child_rng = random.Random(seed)
+        return [ga.crossover(recipes[i], recipes[j], rng=child_rng, name='') for i, j in pairs]
+    seconds, children = timed(crossover, repeat)
+    results['crossover'] = rate(n, seconds)
+
+    # Mutation and normalisation work in place: every repeat gets fresh
+    # copies of the children, made outside the timed call
+    def fresh_children():
+        return copy.deepcopy(children)
+
+    def mutate(batch):
+        mutation_rng = random.Random(seed)
+        for child in batch:
+            ga.mutation(child, rng=mutation_rng)
+        return batch
+    seconds, mutated = timed(mutate, repeat, setup=fresh_children)
+    results['mutation'] = rate(n, seconds)
+
+    seconds, _ = timed(lambda batch: [ga.normalise_recipe(child) for child in batch], repeat,
+                       setup=lambda: copy.deepcopy(mutated))
+    results['normalise'] = rate(n, seconds)
+    return results
+
+def bench_creativity(n, repeat, seed):
+    """Profile build time and batch creativity throughput on n recipes"""
+    recipes = sample_recipes(n, random.Random(seed))
+    seconds, profile = timed(lambda: creativity_evaluation.CorpusProfile(ga.kb.recipes), 1)
+    results = {'profile': {'seconds': seconds, 'corpus_recipes': len(ga.kb.recipes)}}
+    creativity_evaluation.evaluate_creativity_batch(recipes[:1], profile)  # build the corpus bitsets
+    seconds, _ = timed(lambda: creativity_evaluation.evaluate_creativity_batch(recipes, profile), repeat)
+    results['creativity_batch'] = rate(n, seconds)
+    return results
+
+def bench_evolve(population_size, generations, workers, seed):
+    """One generator.evolve run with cold caches"""
+    generator.fitness_cache.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds, _ = timed(lambda: generator.evolve(population_size, generations, workers, seed), 1)
+    stats = generator.fitness_cache_stats()
+    evaluations = population_size * (generations + 1)
+    # Without the cache (incremental scoring) every evaluation is computed
+    computed = evaluations if stats is None else stats['misses']
+    return {
+        'population_size': population_size,
+        'generations': generations,
+        'workers': workers,
+        'seconds': seconds,
+        'generations_per_second': generations / seconds,
+        'evaluations_per_second': evaluations / seconds,
+        'fitness_computed_per_second': computed / seconds,
+        'cache_hit_rate': None if stats is None else stats['hit_rate'],
+    }
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=knowledge_base.DATA_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_commit': commit,
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def run(scales=(1, 10), population_sizes=(50, 100), generation_counts=(10, 50), stage_size=1000,
+        workers=1, repeat=3, seed=0, data_dir=DATA_DIR):
+    """Run every benchmark and return the results as a JSON-serialisable dict"""
+    report = {
+        'environment': environment(),
+        'config': {
+            'scales': list(scales),
+            'population_sizes': list(population_sizes),
+            'generation_counts': list(generation_counts),
+            'stage_size': stage_size,
+            'workers': workers,
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'corpora': [],
+    }
+    original, original_env = ga.kb, os.environ.get(knowledge_base.PATH_ENV)
+    try:
+        for scale in scales:
+            path = corpus_path(scale, data_dir)
+            ga.use_knowledge_base(path)
+            start = time.perf_counter()
+            ga.kb.load()
+            corpus = {
+                'scale': scale,
+                'recipes': len(ga.kb.recipes),
+                'rows': ga.kb.recipes.num_rows,
+                'load_seconds': time.perf_counter() - start,
+                'stages': bench_stages(stage_size, repeat, seed),
+                'evolve': [bench_evolve(p, g, workers, seed)
+                           for p in population_sizes for g in generation_counts],
+            }
+            corpus['stages'].update(bench_creativity(stage_size, repeat, seed))
+            report['corpora'].append(corpus)
+            print(f"x{scale}: {corpus['recipes']} recipes, "
+                  f"fitness {corpus['stages']['fitness_batch']['per_second']:.0f}/s, "
+                  f"creativity {corpus['stages']['creativity_batch']['per_second']:.0f}/s", file=sys.stderr)
+    finally:
+        ga.use_knowledge_base(original)
+        if original_env is None:
+            os.environ.pop(knowledge_base.PATH_ENV, None)
+        else:
+            os.environ[knowledge_base.PATH_ENV] = original_env
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the GA stages")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--population-sizes', type=int, nargs='+', default=[50, 100])
+    parser.add_argument('--generations', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--stage-size', type=int, default=1000, help="recipes per stage benchmark")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help="stage timings keep the best of this many runs")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=DATA_DIR, help="where synthetic corpora are kept")
+    parser.add_argument('--output', help="JSON file for the results (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = run(args.scales, args.population_sizes, args.generations, args.stage_size,
+                 args.workers, args.repeat, args.seed, args.data_dir)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Checkpoints of generator.evolve runs.
+
+Every random draw of a run is derived from the run seed and the generation
+number, and so are the names of new recipes, so the seed and the next
+generation are the whole RNG state and name counter. A checkpoint holds
+them together with the population in its current order (recipes and
+fitness, in the pack_recipes format), the best/average fitness history, the
+fitness cache counters, the telemetry log position and the settings that
+shape the search. Resuming from it continues the run exactly as if it had
+not stopped.
+
+Layout: 8-byte magic, uint32 length of a JSON header, the header, then a
+zlib-compressed payload of the uint64 length of the packed population, the
+packed population and the float64 best and average fitness histories.
+Files are written under a temporary name and renamed, so a run killed while
+writing leaves the previous checkpoint intact.
+"""
+import json
+import os
+import struct
+import zlib
+import numpy as np
+from population import pack_recipes, unpack_recipes
+
+MAGIC = b'GA1CK\x00\x00\x01'
+VERSION = 1
+
+def save_checkpoint(path, state):
+    """
+    Write a checkpoint. state holds 'population' (recipe dicts),
+    'max_fitnesses' and 'avg_fitnesses'; all other entries must be
+    JSON-serialisable and are stored in the header.
+    """
+    header = {key: value for key, value in state.items()
+              if key not in ('population', 'max_fitnesses', 'avg_fitnesses')}
+    header['version'] = VERSION
+    header['history'] = len(state['max_fitnesses'])
+    header = json.dumps(header).encode('utf-8')
+    packed = pack_recipes(state['population'])
+    payload = b''.join([
+        struct.pack('<Q', len(packed)),
+        packed,
+        np.asarray(state['max_fitnesses'], dtype='<f8').tobytes(),
+        np.asarray(state['avg_fitnesses'], dtype='<f8').tobytes(),
+    ])
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        f.write(zlib.compress(payload, 1))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    """The state dict saved by save_checkpoint"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a checkpoint")
+    offset = len(MAGIC)
+    (header_size,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+    state = json.loads(data[offset:offset + header_size].decode('utf-8'))
+    if state.pop('version') != VERSION:
+        raise ValueError(f"{path}: unsupported checkpoint version")
+
+    payload = zlib.decompress(data[offset + header_size:])
+    (packed_size,) = struct.unpack_from('<Q', payload)
+    offset = 8 + packed_size
+    history = state.pop('history')
+    state['population'] = unpack_recipes(payload[8:offset])
+    state['max_fitnesses'] = np.frombuffer(payload, dtype='<f8', count=history, offset=offset).tolist()
+    state['avg_fitnesses'] = np.frombuffer(payload, dtype='<f8', count=history,
+                                           offset=offset + 8 * history).tolist()
+    return state
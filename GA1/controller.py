@@ -0,0 +1,112 @@
+"""
+Run controller: decides after every generation whether generator.evolve
+should stop, and adapts the mutation rate to the population's diversity.
+
+Stop reasons, checked in this order:
+    target_fitness     the best fitness reached target_fitness
+    stagnation         neither best nor average fitness improved by more than
+                       tolerance for stagnation_window generations
+    evaluation_budget  another generation would exceed max_evaluations, also
+                       checked before the first generation
+    time_budget        another generation (as long as the last one) would
+                       exceed time_budget seconds
+evolve itself stops with 'generations' when the generation limit is reached.
+
+With diversity_threshold set, the mutation rate is multiplied by
+mutation_boost (up to max_mutation_rate) after every generation whose share
+of distinct recipes is below the threshold, and divided by it (down to the
+base rate) otherwise. The adaptation depends only on the population, so a
+seeded run stays reproducible; the time budget is the only setting that
+makes where a run stops depend on the machine.
+"""
+
+class RunController:
+    """
+    Stopping rules and mutation rate of one run. Every limit left at None
+    is not checked. mutation_rate is the rate to breed the next generation
+    with.
+    """
+
+    def __init__(self, time_budget=None, max_evaluations=None, target_fitness=None,
+                 stagnation_window=None, tolerance=1e-3, mutation_rate=0.5,
+                 diversity_threshold=None, mutation_boost=1.5, max_mutation_rate=1.0):
+        self.time_budget = time_budget
+        self.max_evaluations = max_evaluations
+        self.target_fitness = target_fitness
+        self.stagnation_window = stagnation_window
+        self.tolerance = tolerance
+        self.base_mutation_rate = mutation_rate
+        self.diversity_threshold = diversity_threshold
+        self.mutation_boost = mutation_boost
+        self.max_mutation_rate = max_mutation_rate
+
+        self.mutation_rate = mutation_rate
+        self.best = float('-inf')
+        self.avg = float('-inf')
+        self.last_improvement = -1
+        self.last_evaluations = 0
+        self.last_elapsed = 0.0
+
+    @property
+    def needs_diversity(self):
+        return self.diversity_threshold is not None
+
+    def start(self, evaluations, elapsed):
+        """
+        Account for the work done before the first generation. A generation
+        evaluates as many recipes as the initial population did, so returns
+        'evaluation_budget' if the first one would already exceed it, else None.
+        """
+        self.last_evaluations = evaluations
+        self.last_elapsed = elapsed
+        if self.max_evaluations is not None and 2 * evaluations > self.max_evaluations:
+            return 'evaluation_budget'
+        return None
+
+    def update(self, gen, best, avg, evaluations, elapsed, diversity=None):
+        """
+        Take in the result of generation gen: its best and average fitness,
+        the fitness evaluations and seconds spent by the run so far and, for
+        the mutation rate adaptation, telemetry.population_diversity().
+        Returns a stop reason, or None to go on.
+        """
+        if best > self.best + self.tolerance or avg > self.avg + self.tolerance:
+            self.last_improvement = gen
+        self.best = max(self.best, best)
+        self.avg = max(self.avg, avg)
+        gen_evaluations = evaluations - self.last_evaluations
+        gen_time = elapsed - self.last_elapsed
+        self.last_evaluations = evaluations
+        self.last_elapsed = elapsed
+
+        if self.needs_diversity and diversity is not None:
+            if diversity['unique_recipes'] < self.diversity_threshold:
+                self.mutation_rate = min(self.max_mutation_rate, self.mutation_rate * self.mutation_boost)
+            else:
+                self.mutation_rate = max(self.base_mutation_rate, self.mutation_rate / self.mutation_boost)
+
+        if self.target_fitness is not None and best >= self.target_fitness:
+            return 'target_fitness'
+        if self.stagnation_window is not None and gen - self.last_improvement >= self.stagnation_window:
+            return 'stagnation'
+        if self.max_evaluations is not None and evaluations + gen_evaluations > self.max_evaluations:
+            return 'evaluation_budget'
+        if self.time_budget is not None and elapsed + gen_time > self.time_budget:
+            return 'time_budget'
+        return None
+
+    def state(self):
+        """What update() has learned so far, for checkpoints"""
+        return {
+            'mutation_rate': self.mutation_rate,
+            'best': self.best,
+            'avg': self.avg,
+            'last_improvement': self.last_improvement,
+            'last_evaluations': self.last_evaluations,
+            'last_elapsed': self.last_elapsed,
+        }
+
+    def load_state(self, state):
+        """Continue from state() of an earlier run"""
+        for key, value in state.items():
+            setattr(self, key, value)
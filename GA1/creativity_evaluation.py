@@ -1,12 +1,113 @@
+import hashlib
+import os
+import pickle
+import zlib
+import numpy as np
 import ga
-def evaluate_novelty(generated_recipe, original_recipes):
-    """Measure how different the recipe is from the training set"""
+import knowledge_base
+import population
+from fitness_cache import recipe_fingerprint
+
+class NoveltyIndex:
+    """
+    Nearest-neighbour index over the ingredient sets of a recipe corpus.
+
+    mode='exact' uses an ingredient inverted index, so a query only compares
+    against recipes sharing at least one ingredient and gives the same
+    similarities as a full scan. mode='minhash' adds MinHash signatures with
+    LSH banding (bands x rows_per_band hash functions); a query then only
+    compares against recipes colliding in some band, which is approximate
+    but scales to corpora far larger than the bundled one.
+    """
+
+    def __init__(self, recipes, mode='exact', bands=16, rows_per_band=4, seed=1):
+        if mode not in ('exact', 'minhash'):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.mode = mode
+        self.names = [r['name'] for r in recipes]
+        self.ingredient_sets = [frozenset(i['ingredient'] for i in r['ingredients']) for r in recipes]
+
+        postings = {}
+        for idx, ingredients in enumerate(self.ingredient_sets):
+            for ing in ingredients:
+                postings.setdefault(ing, []).append(idx)
+        self.postings = {ing: np.array(ids, dtype=np.int64) for ing, ids in postings.items()}
+        self.sizes = np.array([len(ingredients) for ingredients in self.ingredient_sets], dtype=np.int64)
+
+        if mode == 'minhash':
+            self.bands = bands
+            self.rows_per_band = rows_per_band
+            rng = np.random.default_rng(seed)
+            num_perm = bands * rows_per_band
+            self._prime = (1 << 61) - 1
+            self._a = rng.integers(1, 1 << 30, size=num_perm, dtype=np.uint64)
+            self._b = rng.integers(0, 1 << 30, size=num_perm, dtype=np.uint64)
+            self.buckets = [{} for _ in range(bands)]
+            for idx, ingredients in enumerate(self.ingredient_sets):
+                for band, key in enumerate(self._band_keys(ingredients)):
+                    self.buckets[band].setdefault(key, []).append(idx)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _signature(self, ingredients):
+        # Stable across processes, unlike hash() on str
+        ids = np.array([zlib.crc32(ing.encode('utf-8')) for ing in ingredients], dtype=np.uint64)
+        hashes = (self._a[:, None] * ids[None, :] + self._b[:, None]) % self._prime
+        return hashes.min(axis=1)
+
+    def _band_keys(self, ingredients):
+        if not ingredients:
+            return []
+        sig = self._signature(ingredients)
+        r = self.rows_per_band
+        return [sig[band * r:(band + 1) * r].tobytes() for band in range(self.bands)]
+
+    def candidates(self, ingredients):
+        """Indices of corpus recipes worth comparing against"""
+        found = set()
+        if self.mode == 'exact':
+            for ing in ingredients:
+                found.update(self.postings.get(ing, ()).tolist())
+        else:
+            for band, key in enumerate(self._band_keys(ingredients)):
+                found.update(self.buckets[band].get(key, ()))
+        return found
+
+    def nearest(self, generated_recipe):
+        """
+        Return (max_similarity, nearest_recipe_name) by Jaccard similarity of
+        ingredient sets, or (0, None) if no corpus recipe shares an ingredient.
+        Ties go to the recipe that comes first in the corpus.
+        """
+        gen_ingredients = set(i['ingredient'] for i in generated_recipe['ingredients'])
+        if self.mode == 'exact':
+            # Intersection sizes straight from the postings lists
+            hits = [self.postings[ing] for ing in gen_ingredients if ing in self.postings]
+            if not hits:
+                return 0, None
+            idx, intersection = np.unique(np.concatenate(hits), return_counts=True)
+        else:
+            idx = np.array(sorted(self.candidates(gen_ingredients)), dtype=np.int64)
+            if len(idx) == 0:
+                return 0, None
+            intersection = np.array([len(gen_ingredients & self.ingredient_sets[i]) for i in idx])
+            if not intersection.any():
+                return 0, None
+        similarity = intersection / (len(gen_ingredients) + self.sizes[idx] - intersection)
+        best = int(similarity.argmax())
+        return float(similarity[best]), self.names[idx[best]]
+
+def find_nearest_recipe(generated_recipe, original_recipes, index=None):
+    """Return (max_similarity, nearest_recipe_name) over the training set"""
+    if isinstance(original_recipes, CorpusProfile):
+        index = original_recipes.novelty_index
+    if index is not None:
+        return index.nearest(generated_recipe)
     
-    # Ingredient novelty
     gen_ingredients = set(i['ingredient'] for i in generated_recipe['ingredients'])
-    
-    # Find most similar recipe in original set
     max_similarity = 0
+    nearest = None
     for orig in original_recipes:
         orig_ingredients = set(i['ingredient'] for i in orig['ingredients'])
         
@@ -14,28 +115,50 @@ def evaluate_novelty(generated_recipe, original_recipes):
         intersection = len(gen_ingredients & orig_ingredients)
         union = len(gen_ingredients | orig_ingredients)
         similarity = intersection / union if union > 0 else 0
-        max_similarity = max(max_similarity, similarity)
+        if similarity > max_similarity:
+            max_similarity = similarity
+            nearest = orig['name']
+    return max_similarity, nearest
+
+def evaluate_novelty(generated_recipe, original_recipes, index=None):
+    """
+    Measure how different the recipe is from the training set.
+    original_recipes may be a CorpusProfile; otherwise pass a NoveltyIndex
+    built from original_recipes to avoid a full scan.
+    """
+    
+    # Ingredient novelty: distance to the most similar recipe in original set
+    max_similarity, _ = find_nearest_recipe(generated_recipe, original_recipes, index)
     
     novelty_score = 1 - max_similarity
     return novelty_score
 
+def ingredient_pairs(ingredients):
+    """All unordered pairs of an ingredient name list, as sorted tuples"""
+    pairs = set()
+    for i in range(len(ingredients)):
+        for j in range(i+1, len(ingredients)):
+            pairs.add(tuple(sorted([ingredients[i], ingredients[j]])))
+    return pairs
+
+def calculate_corpus_pairs(recipes):
+    """Set of every ingredient pair that appears together in some recipe"""
+    original_pairs = set()
+    for recipe in recipes:
+        original_pairs |= ingredient_pairs([i['ingredient'] for i in recipe['ingredients']])
+    return original_pairs
+
 def evaluate_combination_novelty(generated_recipe, original_recipes):
     """Check if ingredient combinations are novel"""
     
     # Extract all ingredient pairs from generated recipe
-    gen_ingredients = [i['ingredient'] for i in generated_recipe['ingredients']]
-    gen_pairs = set()
-    for i in range(len(gen_ingredients)):
-        for j in range(i+1, len(gen_ingredients)):
-            gen_pairs.add(tuple(sorted([gen_ingredients[i], gen_ingredients[j]])))
+    gen_pairs = ingredient_pairs([i['ingredient'] for i in generated_recipe['ingredients']])
     
     # Check how many pairs appear in original recipes
-    original_pairs = set()
-    for recipe in original_recipes:
-        orig_ingredients = [i['ingredient'] for i in recipe['ingredients']]
-        for i in range(len(orig_ingredients)):
-            for j in range(i+1, len(orig_ingredients)):
-                original_pairs.add(tuple(sorted([orig_ingredients[i], orig_ingredients[j]])))
+    if isinstance(original_recipes, CorpusProfile):
+        original_pairs = original_recipes.pairs
+    else:
+        original_pairs = calculate_corpus_pairs(original_recipes)
     
     novel_pairs = gen_pairs - original_pairs
     combination_novelty = len(novel_pairs) / len(gen_pairs) if gen_pairs else 0
@@ -75,7 +198,10 @@ def evaluate_typicality(generated_recipe, original_recipes):
         category_amounts[cat] = category_amounts.get(cat, 0) + ing['amount']
     
     # Compare to average proportions in original recipes
-    avg_proportions = calculate_average_proportions(original_recipes)
+    if isinstance(original_recipes, CorpusProfile):
+        avg_proportions = original_recipes.average_proportions
+    else:
+        avg_proportions = calculate_average_proportions(original_recipes)
     
     typicality = 0
     for cat, amount in category_amounts.items():
@@ -101,14 +227,15 @@ def calculate_average_proportions(recipes):
     
     return {cat: sum(amounts)/len(amounts) for cat, amounts in all_proportions.items() if amounts}
 
-def evaluate_creativity(recipe, original_recipes):
+def evaluate_creativity(recipe, original_recipes, index=None):
     """
     Combine novelty and value for overall creativity assessment
     Based on Boden's framework: Creative = Novel + Valuable
+    original_recipes may be a CorpusProfile, which skips all corpus work.
     """
     
     # Novelty components (how different/surprising)
-    ingredient_novelty = evaluate_novelty(recipe, original_recipes)
+    ingredient_novelty = evaluate_novelty(recipe, original_recipes, index)
     combination_novelty = evaluate_combination_novelty(recipe, original_recipes)
     novelty = (ingredient_novelty + combination_novelty) / 2
     
@@ -138,3 +265,216 @@ def evaluate_creativity(recipe, original_recipes):
         }
     }
 
+class CorpusProfile:
+    """
+    Corpus statistics used by the evaluate_* functions, computed once:
+    the set of ingredient pairs, the average category proportions and the
+    novelty index. Pass it wherever original_recipes is expected.
+    """
+
+    def __init__(self, recipes, novelty_mode='exact'):
+        self.pairs = calculate_corpus_pairs(recipes)
+        self.average_proportions = calculate_average_proportions(recipes)
+        self.novelty_index = NoveltyIndex(recipes, mode=novelty_mode)
+
+    def __len__(self):
+        return len(self.novelty_index)
+
+# Bump when CorpusProfile changes so stale cache files are not reused
+PROFILE_VERSION = 1
+
+def load_profile(path=None, recipes=None, cache_dir=None):
+    """
+    Return the CorpusProfile of a knowledge base file (.json or .kb), using a
+    cache file keyed by the hash of its contents. path defaults to the one
+    ga uses; recipes defaults to the file's recipes; cache_dir defaults to a
+    .cache folder next to the file. When recipes are given the profile is
+    built from them, so the key covers their names and ingredients too.
+    """
+    if path is None:
+        path = ga.kb.path
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    if recipes is not None:
+        for r in recipes:
+            sha.update(repr((r['name'], recipe_fingerprint(r))).encode('utf-8'))
+    digest = sha.hexdigest()[:16]
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), '.cache')
+    cache_path = os.path.join(cache_dir, f"corpus_profile_v{PROFILE_VERSION}_{digest}.pkl")
+
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+
+    if recipes is None:
+        recipes = knowledge_base.load_recipes(path)
+    profile = CorpusProfile(recipes)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(profile, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return profile
+
+
+def popcount(words):
+    """Number of set bits per element of an unsigned integer array"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    table = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    bytes_ = words.view(np.uint8).reshape(words.shape + (words.itemsize,))
+    return table[bytes_].sum(axis=-1, dtype=np.uint8)
+
+def pack_ingredient_sets(present):
+    """Pack a boolean (rows x vocabulary) matrix into uint64 bitsets (rows x words)"""
+    words = -(-present.shape[1] // 64)
+    padded = np.zeros((present.shape[0], words * 64), dtype=bool)
+    padded[:, :present.shape[1]] = present
+    return np.packbits(padded, axis=1, bitorder='little').view('<u8')
+
+def _corpus_arrays(profile):
+    """
+    Bitsets, set sizes, known-pair keys and average proportions of a
+    profile over the current ingredient vocabulary. Cached on the profile.
+    A pair of ingredient IDs i <= j is keyed i * vocabulary_size + j; the
+    keys of the corpus pairs are kept sorted, so memory grows with the
+    number of pairs rather than the square of the vocabulary.
+    """
+    vocabulary_size = len(ga.INGREDIENT_NAMES)
+    cached = getattr(profile, '_batch_arrays', None)
+    if cached is not None and cached['vocabulary_size'] == vocabulary_size:
+        return cached
+
+    index = profile.novelty_index
+    present = np.zeros((len(index), vocabulary_size), dtype=bool)
+    for row, ingredients in enumerate(index.ingredient_sets):
+        present[row, [ga.INGREDIENT_IDS[ing] for ing in ingredients if ing in ga.INGREDIENT_IDS]] = True
+
+    ids = ga.INGREDIENT_IDS
+    pair_ids = np.array([(ids[a], ids[b]) for a, b in profile.pairs if a in ids and b in ids],
+                        dtype=np.int64).reshape(-1, 2)
+    pair_ids.sort(axis=1)
+    known_pairs = np.unique(pair_ids[:, 0] * vocabulary_size + pair_ids[:, 1])
+
+    expected = np.full(len(ga.CATEGORY_NAMES), np.nan)
+    for cat, amount in profile.average_proportions.items():
+        expected[ga.CATEGORY_IDS[cat]] = amount
+
+    cached = {
+        'vocabulary_size': vocabulary_size,
+        'bitsets': pack_ingredient_sets(present),
+        'sizes': index.sizes,
+        'known_pairs': known_pairs,
+        'expected': expected,
+    }
+    profile._batch_arrays = cached
+    return cached
+
+def recipe_pair_keys(present, repeated):
+    """
+    (row, key) of every ingredient pair of every row of a boolean (rows x
+    vocabulary) matrix, keyed like _corpus_arrays: each pair of distinct
+    ingredients once, and (i, i) for the ingredients marked in repeated.
+    """
+    vocabulary_size = present.shape[1]
+    rows, cols = np.nonzero(present)
+    sizes = np.bincount(rows, minlength=present.shape[0])
+    # Pair every entry with the entries after it in its row
+    position = np.arange(len(rows)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    partners = sizes[rows] - position - 1
+    first = np.repeat(np.arange(len(rows)), partners)
+    second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(partners) - partners, partners)
+    self_rows, self_cols = np.nonzero(repeated)
+    return (np.concatenate([rows[first], self_rows]),
+            np.concatenate([cols[first] * vocabulary_size + cols[second], self_cols * (vocabulary_size + 1)]))
+
+def is_known(keys, known):
+    """Whether each key occurs in the sorted array known"""
+    if not len(known):
+        return np.zeros(len(keys), dtype=bool)
+    pos = np.minimum(np.searchsorted(known, keys), len(known) - 1)
+    return known[pos] == keys
+
+def evaluate_creativity_batch(recipes, corpus, chunk_bytes=1 << 25):
+    """
+    Score a whole population at once; same formulas as evaluate_creativity.
+
+    recipes is a list of recipe dicts or a population.Population, corpus a
+    list of recipes or a CorpusProfile. Ingredient sets are bit-packed over
+    the ingredient vocabulary so Jaccard similarities against the whole
+    corpus come from AND + popcount, processed in chunks of about
+    chunk_bytes. Returns a dict of arrays keyed like evaluate_creativity and
+    its components, plus 'nearest_recipe' names.
+    """
+    if not isinstance(corpus, CorpusProfile):
+        corpus = CorpusProfile(corpus)
+    pop = recipes if isinstance(recipes, population.Population) else population.Population.from_recipes(recipes)
+    arrays = _corpus_arrays(corpus)
+    vocabulary_size = arrays['vocabulary_size']
+    counts = pop.counts_matrix(vocabulary_size)
+    present = counts > 0
+    n = len(pop)
+
+    # Ingredient novelty: max Jaccard similarity against the corpus
+    bitsets = pack_ingredient_sets(present)
+    sizes = present.sum(axis=1)
+    corpus_bitsets = arrays['bitsets']
+    max_similarity = np.zeros(n)
+    nearest_idx = np.full(n, -1)
+    rows_per_chunk = max(1, chunk_bytes // max(1, corpus_bitsets.nbytes))
+    for start in range(0, n, rows_per_chunk):
+        chunk = bitsets[start:start + rows_per_chunk]
+        intersection = popcount(chunk[:, None, :] & corpus_bitsets[None, :, :]).sum(axis=2, dtype=np.int64)
+        union = sizes[start:start + rows_per_chunk, None] + arrays['sizes'][None, :] - intersection
+        similarity = np.divide(intersection, union, out=np.zeros(intersection.shape), where=union > 0)
+        if similarity.shape[1]:
+            best = similarity.argmax(axis=1)
+            best_similarity = similarity[np.arange(len(best)), best]
+            max_similarity[start:start + len(best)] = best_similarity
+            nearest_idx[start:start + len(best)] = np.where(best_similarity > 0, best, -1)
+    ingredient_novelty = 1 - max_similarity
+
+    # Combination novelty: share of ingredient pairs never seen in the corpus.
+    # An ingredient listed twice forms a pair with itself, as in ingredient_pairs.
+    repeated = counts > 1
+    rows, pair_keys = recipe_pair_keys(present, repeated)
+    novel = np.bincount(rows[~is_known(pair_keys, arrays['known_pairs'])], minlength=n)
+    total = sizes * (sizes - 1) / 2 + repeated.sum(axis=1)
+    combination_novelty = np.divide(novel, total, out=np.zeros(n), where=total > 0)
+    novelty = (ingredient_novelty + combination_novelty) / 2
+
+    # Value
+    components = population.fitness_components(pop)
+    value = (components['rating'] + components['balance'] + components['diversity']) / 3
+
+    # Typicality: closeness of each present category to the corpus average
+    cat_amounts, cat_counts = population.category_totals(pop)
+    cat_present = cat_counts > 0
+    expected = arrays['expected']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.minimum(cat_amounts, expected) / np.maximum(cat_amounts, expected)
+    ratio = np.where(cat_present & ~np.isnan(expected), ratio, 0.0)
+    num_categories = cat_present.sum(axis=1)
+    typicality = np.divide(ratio.sum(axis=1), num_categories, out=np.zeros(n), where=num_categories > 0)
+
+    typicality_penalty = np.where(typicality > 0.3, 1.0, 0.5)
+    creativity = (novelty + value) * typicality_penalty / 2
+
+    names = corpus.novelty_index.names
+    return {
+        'creativity': creativity,
+        'novelty': novelty,
+        'value': value,
+        'typicality': typicality,
+        'ingredient_novelty': ingredient_novelty,
+        'combination_novelty': combination_novelty,
+        'rating': components['rating'],
+        'balance': components['balance'],
+        'diversity': components['diversity'],
+        'validity': components['validity'].astype(np.float64),
+        'nearest_recipe': [names[i] if i >= 0 else None for i in nearest_idx],
+    }
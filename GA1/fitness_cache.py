@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from population import Population
+
+class LRUCache:
+    """Bounded mapping with least-recently-used eviction and hit/miss counters"""
+
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Look up key, counting a hit or a miss"""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+def recipe_fingerprint(recipe):
+    """
+    Key of a recipe: its (ingredient, amount, unit, rating) entries in list
+    order, amounts exact. Fitness is a float sum over the ingredients in that
+    order, so two orderings of one recipe can differ in the last bits; keying
+    them apart keeps a cached score equal to the score it stands for, and a
+    run independent of what each worker's cache happened to see first.
+    """
+    return tuple((ing['ingredient'], ing['amount'], ing['unit'], ing['rating'])
+                 for ing in recipe['ingredients'])
+
+def cached_scores(recipes, cache, score_batch):
+    """
+    Scores of recipes, taking known ones from cache and computing the rest
+    with a single score_batch(list_of_recipes) call.
+    """
+    keys = [recipe_fingerprint(r) for r in recipes]
+    scores = [cache.get(key) for key in keys]
+    missing = [i for i, score in enumerate(scores) if score is None]
+    if missing:
+        computed = score_batch([recipes[i] for i in missing])
+        for i, score in zip(missing, computed):
+            scores[i] = float(score)
+            cache.put(keys[i], scores[i])
+    return scores
+
+def cached_fitness(recipes, cache):
+    """Fitness of each recipe, evaluated in one batch for cache misses"""
+    return cached_scores(recipes, cache, lambda batch: Population.from_recipes(batch).fitness())
@@ -1,23 +1,83 @@
-import json
+import itertools
+import os
 import random
 import math
-import matplotlib.pyplot as plt
-recipe_number = 1
-# Load data
-with open('recipes_output.json', 'r') as f:
-    data = json.load(f)  
-recipes = data['recipes']
+import knowledge_base
+
+# Source of default recipe names. next() on itertools.count is atomic, and
+# parallel runs pass explicit names so workers never share a counter.
+recipe_numbers = itertools.count(1)
+
+# The knowledge base used by every function here. It is loaded on first use,
+# so importing this module reads no data; see use_knowledge_base().
+kb = knowledge_base.KnowledgeBase()
+
+def use_knowledge_base(source):
+    """
+    Switch to another knowledge base: a KnowledgeBase or the path of a .kb or
+    .json file. The file read is also exported to $GA1_KNOWLEDGE_BASE so that
+    worker processes started afterwards load the same file.
+    """
+    global kb
+    if isinstance(source, knowledge_base.KnowledgeBase):
+        kb = source
+        if kb.source_path is not None:
+            os.environ[knowledge_base.PATH_ENV] = kb.source_path
+    else:
+        path = os.path.abspath(source)
+        os.environ[knowledge_base.PATH_ENV] = path
+        kb = knowledge_base.KnowledgeBase(path)
+    return kb
+
+# Module attributes kept for existing callers, resolved from kb on access
+_KB_ATTRIBUTES = {
+    'recipes': 'recipes',
+    'DATA_PATH': 'path',
+    'INGREDIENT_CATEGORIES': 'categories',
+    'CATEGORY_NAMES': 'category_names',
+    'CATEGORY_IDS': 'category_ids',
+    'OTHER_CATEGORY_ID': 'other_category_id',
+    'INGREDIENT_NAMES': 'ingredient_names',
+    'INGREDIENT_IDS': 'ingredient_ids',
+    'INGREDIENT_CATEGORY_IDS': 'ingredient_category_ids',
+    'CATEGORY_INDEX': 'category_index',
+    'CATEGORY_MEMBERS': 'category_members',
+    'MEMBER_POOLS': 'member_pools',
+    'CATEGORY_POOLS': 'category_pools',
+}
+
+def __getattr__(name):
+    if name in _KB_ATTRIBUTES:
+        return getattr(kb, _KB_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Categorize ingredients by function
-INGREDIENT_CATEGORIES =  data['categories'][0]
-if 'other' not in INGREDIENT_CATEGORIES:
-    INGREDIENT_CATEGORIES['other'] = []
 def get_category(ingredient_name):
     """Get the category of an ingredient"""
-    for category, items in INGREDIENT_CATEGORIES.items():
-        if ingredient_name.lower() in items:
-            return category
-    return 'other'
+    # Known names are looked up as is, others lowercased
+    return kb.category_index.get(ingredient_name) or kb.category_index.get(ingredient_name.lower(), 'other')
+
+def get_category_id(ingredient_name):
+    """Get the integer category ID of an ingredient"""
+    cat_id = kb.category_id_index.get(ingredient_name)
+    if cat_id is None:
+        cat_id = kb.category_ids[get_category(ingredient_name)]
+    return cat_id
+
+def get_ingredient_id(ingredient_name):
+    """Get the integer ID of an ingredient, registering unseen ones"""
+    return kb.register_ingredient(ingredient_name, get_category(ingredient_name))
+
+# Categories every valid recipe must contain
+REQUIRED_CATEGORIES = {'flour', 'fat', 'sugar', 'eggs', 'leavening'}
+
+# Ideal ratios (approximate)
+IDEAL_RATIOS = {
+    'flour': 2.5, # tsp
+    'fat': 1.0, # tsp
+    'sugar': 1.0, # tsp
+    'eggs': 2.0,  # count
+    'leavening': 1.0,  # tsp
+}
 
 def validate_recipe(recipe):
     """Check if recipe has minimum required ingredients"""
@@ -25,8 +85,7 @@ def validate_recipe(recipe):
     for ing in recipe['ingredients']:
         categories.add(get_category(ing['ingredient']))
     
-    required = {'flour', 'fat', 'sugar', 'eggs', 'leavening'}
-    return required.issubset(categories)
+    return REQUIRED_CATEGORIES.issubset(categories)
 
 def calculate_balance_score(recipe):
     """Score recipe based on ingredient proportions"""
@@ -36,18 +95,9 @@ def calculate_balance_score(recipe):
         cat = get_category(ing['ingredient'])
         category_amounts[cat] = category_amounts.get(cat, 0) + ing['amount']
     
-    # Ideal ratios (approximate)
-    ideal_ratios = {
-        'flour': 2.5, # tsp
-        'fat': 1.0, # tsp
-        'sugar': 1.0, # tsp
-        'eggs': 2.0,  # count
-        'leavening': 1.0,  # tsp
-    }
-    
     # Calculate deviation from ideal ratios
     score = 1.0
-    for cat, ideal in ideal_ratios.items():
+    for cat, ideal in IDEAL_RATIOS.items():
         if cat in category_amounts:
             actual = category_amounts[cat]
             # Penalize deviation from ideal
@@ -86,9 +136,87 @@ def calculate_fitness(recipe):
     
     return avg_rating * balance * diversity * complexity * 10
 
-def crossover(r1, r2):
-    """Crossover that preserves recipe structure"""
-    global recipe_number
+# Cached aggregates, for incremental fitness only. recipe['aggregates'] is a
+# list, indexed by category ID, of (amount total, rating total, ingredient
+# count) tuples, so fitness can be scored in O(categories) and a mutation
+# updates it in O(1). Totals are fixed-point integers (units of 2**-40):
+# integer sums are exact, so the aggregates of a recipe do not depend on the
+# order of the updates that produced them. incremental_fitness adds them to a
+# recipe; crossover, mutation and normalise_recipe keep them in sync with
+# r['ingredients'] when the recipe has them and never add them otherwise.
+# Code that edits the ingredients itself should delete them.
+FIXED_SCALE = 2 ** 40
+_EMPTY = (0, 0, 0)
+
+def _fixed(value):
+    return round(value * FIXED_SCALE)
+
+def _aggregate_add(agg, ing, sign=1):
+    """Add (sign=1) or remove (sign=-1) one ingredient"""
+    cat_id = get_category_id(ing['ingredient'])
+    amount, rating, count = agg[cat_id]
+    agg[cat_id] = (amount + sign * _fixed(ing['amount']), rating + sign * _fixed(ing['rating']), count + sign)
+
+def recipe_aggregates(recipe):
+    """Compute recipe['aggregates'] from scratch and return it"""
+    agg = [_EMPTY] * len(kb.category_names)
+    for ing in recipe['ingredients']:
+        _aggregate_add(agg, ing)
+    recipe['aggregates'] = agg
+    return agg
+
+def fitness_from_aggregates(agg):
+    """calculate_fitness from cached aggregates, in O(categories)"""
+    ids = kb.category_ids
+    for cat in REQUIRED_CATEGORIES:
+        if not agg[ids[cat]][2]:
+            return 0.0
+    
+    num_ingredients = unique_cats = rating_total = 0
+    for _, rating, count in agg:
+        if count:
+            num_ingredients += count
+            unique_cats += 1
+            rating_total += rating
+    avg_rating = rating_total / FIXED_SCALE / num_ingredients
+    
+    balance = 1.0
+    for cat, ideal in IDEAL_RATIOS.items():
+        amount, _, count = agg[ids[cat]]
+        if count:
+            actual = amount / FIXED_SCALE
+            ratio = min(actual, ideal) / max(actual, ideal)
+            balance *= (0.5 + 0.5 * ratio)
+        else:
+            balance *= 0.5
+    
+    diversity = 1.0
+    if 8 <= num_ingredients <= 12:
+        diversity = 1.2
+    elif num_ingredients < 5:
+        diversity = 0.7
+    elif num_ingredients > 15:
+        diversity = 0.8
+    
+    complexity = unique_cats / num_ingredients
+    return avg_rating * balance * diversity * complexity * 10
+
+def incremental_fitness(recipe):
+    """Fitness from the recipe's cached aggregates, computing them if missing"""
+    agg = recipe.get('aggregates')
+    if agg is None:
+        agg = recipe_aggregates(recipe)
+    return fitness_from_aggregates(agg)
+
+def next_recipe_name():
+    """Name for a new recipe from the module-wide counter"""
+    return f"recipe {next(recipe_numbers)}"
+
+def crossover(r1, r2, rng=random, name=None):
+    """
+    Crossover that preserves recipe structure.
+    rng is any object with the random.Random API; name defaults to next_recipe_name().
+    """
     
     # Group ingredients by category
     def group_by_category(recipe):
@@ -103,70 +231,100 @@ def crossover(r1, r2):
     g1 = group_by_category(r1)
     g2 = group_by_category(r2)
     
+    # If both parents have aggregates, the child's are assembled per category from theirs
+    a1, a2 = r1.get('aggregates'), r2.get('aggregates')
+    agg = [_EMPTY] * len(a1) if a1 is not None and a2 is not None else None
+    ids = kb.category_ids
+    
     # Combine categories, randomly choosing from parent 1 or 2
     new_ingredients = []
-    all_cats = set(list(g1.keys()) + list(g2.keys()))
+    # Ordered union, so the sequence of random draws does not depend on string hashing
+    all_cats = dict.fromkeys(list(g1.keys()) + list(g2.keys()))
     
     for cat in all_cats:
         if cat in g1 and cat in g2:
             # Choose from either parent
-            source = g1 if random.random() < 0.5 else g2
-            new_ingredients.extend([ing.copy() for ing in source[cat]])
+            if rng.random() < 0.5:
+                source, source_agg = g1, a1
+            else:
+                source, source_agg = g2, a2
         elif cat in g1:
-            new_ingredients.extend([ing.copy() for ing in g1[cat]])
+            source, source_agg = g1, a1
         else:
-            new_ingredients.extend([ing.copy() for ing in g2[cat]])
-    
-    # Ensure we have at least some ingredients
-    if len(new_ingredients) == 0:
-        new_ingredients = [random.choice(r1['ingredients']).copy()]
+            source, source_agg = g2, a2
+        new_ingredients.extend([ing.copy() for ing in source[cat]])
+        if agg is not None:
+            agg[ids[cat]] = source_agg[ids[cat]]
     
     r = {
-        'name': f"recipe {recipe_number}",
-        'ingredients': new_ingredients
+        'name': name if name is not None else next_recipe_name(),
+        'ingredients': new_ingredients,
     }
-    recipe_number += 1
+    if agg is not None:
+        r['aggregates'] = agg
+    
+    # Ensure we have at least some ingredients
+    if len(new_ingredients) == 0:
+        r['ingredients'] = [rng.choice(r1['ingredients']).copy()]
+        if agg is not None:
+            recipe_aggregates(r)
     
     return r
 
-def mutation(recipe):
-    """Mutation that maintains recipe validity"""
-    mutation_type = random.randint(0, 4)
+def mutation(recipe, rng=random):
+    """
+    Mutation that maintains recipe validity.
+    Cached aggregates, if the recipe has them, are updated for the change.
+    """
+    mutation_type = rng.randint(0, 4)
+    agg = recipe.get('aggregates')
     
     # Adjust amount
     if mutation_type == 0 and len(recipe['ingredients']) > 0:
-        i = random.randint(0, len(recipe['ingredients'])-1)
-        recipe['ingredients'][i] = recipe['ingredients'][i].copy()
-        change = random.uniform(0.8, 1.2)
-        recipe['ingredients'][i]['amount'] = max(0.1, recipe['ingredients'][i]['amount'] * change)
+        i = rng.randint(0, len(recipe['ingredients'])-1)
+        old_ing = recipe['ingredients'][i]
+        recipe['ingredients'][i] = old_ing.copy()
+        change = rng.uniform(0.8, 1.2)
+        recipe['ingredients'][i]['amount'] = max(0.1, old_ing['amount'] * change)
+        if agg is not None:
+            cat_id = get_category_id(old_ing['ingredient'])
+            amount, rating, count = agg[cat_id]
+            amount += _fixed(recipe['ingredients'][i]['amount']) - _fixed(old_ing['amount'])
+            agg[cat_id] = (amount, rating, count)
     
     # Swap ingredient within same category
     elif mutation_type == 1 and len(recipe['ingredients']) > 0:
-        i = random.randint(0, len(recipe['ingredients'])-1)
+        i = rng.randint(0, len(recipe['ingredients'])-1)
         old_ing = recipe['ingredients'][i]
         cat = get_category(old_ing['ingredient'])
         
-        if cat in INGREDIENT_CATEGORIES:
-            same_category = INGREDIENT_CATEGORIES[cat]
+        if cat in kb.categories:
             # Find an ingredient from recipes in same category
-            candidates = [ing for r in recipes for ing in r['ingredients'] 
-                         if ing['ingredient'] in same_category]
-            if candidates:
-                new_ing = random.choice(candidates).copy()
+            candidates = kb.member_pools[cat]
+            if len(candidates):
+                new_ing = kb.recipes.ingredient(rng.choice(candidates))
                 new_ing['amount'] = old_ing['amount']
                 recipe['ingredients'][i] = new_ing
+                if agg is not None:
+                    _aggregate_add(agg, old_ing, -1)
+                    _aggregate_add(agg, new_ing)
     
     # Add ingredient from a missing category
     elif mutation_type == 2:
-        current_cats = {get_category(i['ingredient']) for i in recipe['ingredients']}
-        missing_cats = set(INGREDIENT_CATEGORIES.keys()) - current_cats
+        if agg is not None:
+            missing_cats = [cat for cat, (_, _, count) in zip(kb.category_names, agg) if not count]
+        else:
+            current_cats = {get_category(i['ingredient']) for i in recipe['ingredients']}
+            missing_cats = [cat for cat in kb.categories if cat not in current_cats]
         
         if missing_cats:
-            cat = random.choice(list(missing_cats))
-            candidates = [ing for r in recipes for ing in r['ingredients'] 
-                         if get_category(ing['ingredient']) == cat]
-            if candidates:
-                recipe['ingredients'].append(random.choice(candidates).copy())
+            cat = rng.choice(missing_cats)
+            candidates = kb.category_pools[cat]
+            if len(candidates):
+                new_ing = kb.recipes.ingredient(rng.choice(candidates))
+                recipe['ingredients'].append(new_ing)
+                if agg is not None:
+                    _aggregate_add(agg, new_ing)
     
     # Remove non-essential ingredient
     elif mutation_type == 3 and len(recipe['ingredients']) > 5:
@@ -176,40 +334,54 @@ def mutation(recipe):
             if get_category(ing['ingredient']) in ['addins', 'flavoring', 'liquid', 'other']
         ]
         if non_essential_idx:
-            recipe['ingredients'].pop(random.choice(non_essential_idx))
+            removed = recipe['ingredients'].pop(rng.choice(non_essential_idx))
+            if agg is not None:
+                _aggregate_add(agg, removed, -1)
     
     # Duplicate a good ingredient (for add-ins)
     elif mutation_type == 4:
         addins = [ing for ing in recipe['ingredients'] 
                  if get_category(ing['ingredient']) == 'addins']
         if addins:
-            recipe['ingredients'].append(random.choice(addins).copy())
+            new_ing = rng.choice(addins).copy()
+            recipe['ingredients'].append(new_ing)
+            if agg is not None:
+                _aggregate_add(agg, new_ing)
+
+# Convert to common unit (teaspoons) for scaling calculation
+TEASPOON_CONVERSIONS = {
+    'cup': 48,
+    'tablespoon': 3,
+    'teaspoon': 1,
+    'ounce': 6,  # approximate for dry ingredients
+    'egg': 12    # approximate volume of an egg
+}
 
 def normalise_recipe(r):
-    """Normalize recipe amounts"""
+    """
+    Normalize recipe amounts.
+    If r has aggregates, they are kept up to date: merged duplicates are
+    removed from them and the category amounts are re-summed while scaling.
+    """
+    agg = r.get('aggregates')
+    
     # First, combine duplicate ingredients
     unique_ingredients = {}
     for i in r['ingredients']:
         if i['ingredient'] in unique_ingredients:
             n = unique_ingredients[i['ingredient']]
             n['amount'] += i['amount']
+            if agg is not None:
+                # The duplicate's amount moves to n, its count and rating go
+                cat_id = get_category_id(i['ingredient'])
+                amount, rating, count = agg[cat_id]
+                agg[cat_id] = (amount, rating - _fixed(i['rating']), count - 1)
         else:
             unique_ingredients[i['ingredient']] = i.copy()
     r['ingredients'] = list(unique_ingredients.values())
     
-    # Convert to common unit (teaspoons) for scaling calculation
-    def to_teaspoons(amount, unit):
-        conversions = {
-            'cup': 48,
-            'tablespoon': 3,
-            'teaspoon': 1,
-            'ounce': 6,  # approximate for dry ingredients
-            'egg': 12    # approximate volume of an egg
-        }
-        return amount * conversions.get(unit, 1)
-    
     # Calculate total in teaspoons
-    total_tsp = sum(to_teaspoons(i['amount'], i['unit']) for i in r['ingredients'])
+    total_tsp = sum(i['amount'] * TEASPOON_CONVERSIONS.get(i['unit'], 1) for i in r['ingredients'])
     
     # Target: reasonable cookie batch (about 240 tsp total = 5 cups flour equivalent)
     target_tsp = 240
@@ -228,6 +400,12 @@ def normalise_recipe(r):
             i['amount'] = max(0.5, i['amount'])
         elif i['unit'] == 'egg':
             i['amount'] = max(1.0, round(i['amount']))  # Round eggs to whole numbers
+    
+    if agg is not None:
+        amounts = [0] * len(agg)
+        for i in r['ingredients']:
+            amounts[get_category_id(i['ingredient'])] += _fixed(i['amount'])
+        r['aggregates'] = [(amount, rating, count) for amount, (_, rating, count) in zip(amounts, agg)]
 
 
 
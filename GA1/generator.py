@@ -1,102 +1,511 @@
-import json
+import argparse
+import os
 import random
-import math
-import matplotlib.pyplot as plt
+import time
+from concurrent.futures import ProcessPoolExecutor
 import creativity_evaluation
 import ga
-# Initialize population
+import plots
+import selection
+from checkpoint import load_checkpoint, save_checkpoint
+from controller import RunController
+from fitness_cache import LRUCache, cached_fitness, cached_scores
+from telemetry import Telemetry, population_diversity
+
+# Experiment parameters
 population_size = 100
-recipe_number = 1
+generations = 200
+workers = 1        # > 1 creates and evaluates offspring in a process pool
+seed = None        # set for a reproducible run (independent of workers)
+chunk_size = 64    # offspring per task; fixed so results do not depend on workers
+track_creativity = False  # score every generation's population for creativity
+cache_size = 100_000      # fitness/creativity memo entries kept per process
+incremental_fitness = False # True scores from each recipe's cached aggregates, bypassing fitness_cache
+selection_scheme = 'tournament'  # 'tournament', 'truncation', 'rank' or 'sus' (see selection.py)
+selection_params = {}            # e.g. {'tournament_size': 10}, {'fraction': 0.5}, {'pressure': 1.5}
+elite_fraction = 0.1             # share of the population carried over unchanged
+mutation_rate = 0.5              # probability that a child is mutated
+checkpoint_interval = 10  # generations between checkpoints, when a checkpoint path is given
 
-population = random.choices(ga.recipes, k=population_size)
-for r in population:
-    r['fitness'] = ga.calculate_fitness(r)
-population = sorted(population, reverse=True, key=lambda r: r['fitness'])
+# Early stopping (see controller.py); None disables a rule
+time_budget = None          # seconds of wall-clock time
+evaluation_budget = None    # fitness evaluations, the initial population included
+target_fitness = None       # stop once the best recipe reaches this fitness
+stagnation_window = None    # generations without improvement of best or average fitness
+stagnation_tolerance = 1e-3 # smallest change counted as an improvement
+diversity_threshold = None  # raise the mutation rate while the share of distinct recipes is below this
 
-# Evolution
-max_fitnesses = []
-avg_fitnesses = []
-generations = 200
+# Memoised scores keyed by recipe fingerprint. Pool workers each fill their
+# own fitness cache; their hit/miss counts are added to this one.
+fitness_cache = LRUCache(cache_size)
+creativity_cache = LRUCache(cache_size)
 
-for gen in range(generations):
-    # Generate offspring
-    offspring = []
-    while len(offspring) < population_size:
-        # Tournament selection
-        tournament_size = 10
-        tournament = random.sample(population, tournament_size)
-        p1 = max(tournament, key=lambda r: r['fitness'])
-        tournament = random.sample(population, tournament_size)
-        p2 = max(tournament, key=lambda r: r['fitness'])
-        
-        # Crossover
-        child = ga.crossover(p1, p2)
+def evaluate_fitness(recipes, incremental=False):
+    """
+    Set r['fitness'] on every recipe. Incremental scoring reads the cached
+    aggregates of each recipe (ga.incremental_fitness), which is cheaper than
+    building a cache key, so it bypasses fitness_cache. Otherwise cache
+    misses are evaluated in one Population batch.
+    """
+    if incremental:
+        for r in recipes:
+            r['fitness'] = ga.incremental_fitness(r)
+        return
+    for r, fitness in zip(recipes, cached_fitness(recipes, fitness_cache)):
+        r['fitness'] = fitness
+
+def fitness_cache_stats():
+    """
+    fitness_cache.stats(), or None while incremental scoring bypasses the
+    cache: its counters then measure nothing.
+    """
+    return None if incremental_fitness else fitness_cache.stats()
+
+def initial_population(size, rng, initial=None):
+    """
+    Sample the starting population from the knowledge base. A warm start
+    passes the recipes of an earlier run as initial: they are re-scored, the
+    best size of them are kept and the rest is sampled.
+    """
+    population = [{key: value for key, value in r.items() if key != 'aggregates'} for r in initial or []]
+    evaluate_fitness(population, incremental_fitness)
+    population = sort_population(population)[:size]
+    samples = rng.choices(ga.kb.recipes, k=size - len(population))
+    evaluate_fitness(samples, incremental_fitness)
+    return sort_population(population + samples)
+
+def select_parents(population, count, rng, scheme=None, fitness=None, **params):
+    """
+    (p1, p2) index pairs into population, all drawn at once with a scheme of
+    selection.py (default: selection_scheme and selection_params).
+    rng is a numpy Generator.
+    """
+    if fitness is None:
+        fitness = selection.fitness_array(population)
+    if scheme is None:
+        scheme, params = selection_scheme, {**selection_params, **params}
+    return selection.select_pairs(fitness, count, rng, scheme, **params).tolist()
+
+def breed_offspring(parents, pairs, names, seeds, mutation_rate=0.5, incremental=False):
+    """
+    Create and evaluate one child per (p1, p2) pair of indices into parents.
+    Every child has its own RNG seeded from seeds, so the result does not
+    depend on which process runs it. Runs inside pool workers.
+    Returns (children, stats): seconds spent per stage and cache hits/misses.
+    """
+    clock = time.perf_counter
+    crossover_time = mutation_time = normalise_time = 0.0
+    children = []
+    for (i, j), name, child_seed in zip(pairs, names, seeds):
+        rng = random.Random(child_seed)
+        t0 = clock()
+        child = ga.crossover(parents[i], parents[j], rng=rng, name=name)
+        t1 = clock()
         
         # Mutation with probability
-        if random.random() < 0.5:
-            ga.mutation(child)
+        if rng.random() < mutation_rate:
+            ga.mutation(child, rng=rng)
+        t2 = clock()
         
         ga.normalise_recipe(child)
-        child['fitness'] = ga.calculate_fitness(child)
-        offspring.append(child)
+        t3 = clock()
+        children.append(child)
+        crossover_time += t1 - t0
+        mutation_time += t2 - t1
+        normalise_time += t3 - t2
     
-    # Elitism: keep top 10%
-    elite_size = population_size // 10
-    population = sorted(population, reverse=True, key=lambda r: r['fitness'])
-    population = population[:elite_size] + offspring[:(population_size - elite_size)]
-    population = sorted(population, reverse=True, key=lambda r: r['fitness'])
+    # Evaluate the whole chunk at once
+    hits, misses = fitness_cache.hits, fitness_cache.misses
+    t0 = clock()
+    evaluate_fitness(children, incremental)
+    stats = {
+        'crossover': crossover_time,
+        'mutation': mutation_time,
+        'normalise': normalise_time,
+        'fitness': clock() - t0,
+        'cache_hits': fitness_cache.hits - hits,
+        'cache_misses': fitness_cache.misses - misses,
+    }
+    return children, stats
+
+def make_offspring(population, count, gen, seed, executor=None, first_number=1, prefix="recipe ",
+                   stats=None, fitness=None, rate=None):
+    """
+    Generate count evaluated children, in executor if one is given.
+    Children are mutated with probability rate (default: mutation_rate).
+    Selection uses one RNG stream per generation and breeding one per child,
+    both derived from seed, and children are named <prefix><first_number + k>.
+    fitness is the population's fitness array, if already known.
+    If stats is a dict, seconds per stage are added to it (summed over
+    workers for the breeding stages).
+    """
+    if rate is None:
+        rate = mutation_rate
+    t0 = time.perf_counter()
+    pairs = select_parents(population, count, selection.rng_for(f"{seed}:{gen}:select"), fitness=fitness)
+    selection_time = time.perf_counter() - t0
+    
+    # Ship each chunk only the parents it uses
+    tasks = []
+    for start in range(0, count, chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        local = {}
+        for pair in chunk:
+            for idx in pair:
+                local.setdefault(idx, len(local))
+        tasks.append((
+            [population[idx] for idx in local],
+            [(local[p1], local[p2]) for p1, p2 in chunk],
+            [f"{prefix}{first_number + k}" for k in range(start, start + len(chunk))],
+            [f"{seed}:{gen}:{k}" for k in range(start, start + len(chunk))],
+            rate,
+            incremental_fitness,
+        ))
     
-    max_fitnesses.append(population[0]['fitness'])
-    avg_fitnesses.append(sum(r['fitness'] for r in population) / len(population))
+    if executor is None:
+        results = [breed_offspring(*task) for task in tasks]
+    else:
+        results = list(executor.map(breed_offspring, *zip(*tasks)))
+        # Worker caches are separate; fold their counters into ours
+        fitness_cache.hits += sum(chunk_stats['cache_hits'] for _, chunk_stats in results)
+        fitness_cache.misses += sum(chunk_stats['cache_misses'] for _, chunk_stats in results)
+    
+    if stats is not None:
+        stats['selection'] = stats.get('selection', 0.0) + selection_time
+        for _, chunk_stats in results:
+            for stage in ('crossover', 'mutation', 'normalise', 'fitness'):
+                stats[stage] = stats.get(stage, 0.0) + chunk_stats[stage]
+    return [child for children, _ in results for child in children]
+
+def _init_worker(path):
+    """Pool initializer: breed from the knowledge base file of the parent process"""
+    if ga.kb.source_path != path:
+        ga.use_knowledge_base(path)
+
+def start_pool(workers):
+    """
+    Process pool for make_offspring. Its workers load the knowledge base of
+    this process from its file; one whose recipes or categories were given
+    in memory cannot be shared that way and raises ValueError.
+    """
+    path = ga.kb.source_path
+    if path is None:
+        raise ValueError("Pool workers load the knowledge base from a file; "
+                         "this one was given its recipes or categories in memory")
+    return ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(path,))
+
+def next_generation(population, gen, seed, executor=None, prefix="recipe ", stats=None, rate=None):
+    """
+    Replace the population with its offspring, keeping the best elite_fraction.
+    The result holds the elites, best first, then the offspring in breeding
+    order; it is not sorted. stats and the mutation rate are passed on to
+    make_offspring.
+    """
+    population_size = len(population)
+    fitness = selection.fitness_array(population)
+    offspring = make_offspring(population, population_size, gen, seed, executor,
+                               first_number=gen * population_size + 1, prefix=prefix,
+                               stats=stats, fitness=fitness, rate=rate)
     
-    if gen % 20 == 0:
-        print(f"Generation {gen}: Best fitness = {population[0]['fitness']:.3f}, Avg = {avg_fitnesses[-1]:.3f}")
-
-# Plot results
-plt.figure(figsize=(10, 6))
-plt.plot(max_fitnesses, label="Best Fitness", linewidth=2)
-plt.plot(avg_fitnesses, label="Average Fitness", linewidth=2)
-plt.xlabel("Generation")
-plt.ylabel("Fitness")
-plt.title("Cookie Recipe Evolution")
-plt.legend()
-plt.grid(True, alpha=0.3)
-plt.show()
-
-print("\n" + "="*40)
-print("CREATIVITY EVALUATION")
-print("="*40)
-
-# Evaluate top 20 recipes
-for i, recipe in enumerate(population[:20]):
-    creativity = creativity_evaluation.evaluate_creativity(recipe, ga.recipes)
-    print(f"\nRecipe {i+1}: {recipe['name']}")
-    print(f"  Creativity Score: {creativity['creativity']:.3f}")
-    print(f"  Novelty: {creativity['novelty']:.3f}")
-    print(f"  Value: {creativity['value']:.3f}")
-    print(f"  Typicality: {creativity['typicality']:.3f}")
-    print(f"  Fitness: {recipe['fitness']:.3f}")
-
-# Plot creativity vs fitness
-creativities = [creativity_evaluation.evaluate_creativity(r, ga.recipes)['creativity'] for r in population[:40]]
-fitnesses = [r['fitness'] for r in population[:40]]
-
-plt.figure(figsize=(10, 6))
-plt.scatter(creativities, fitnesses, alpha=0.6)
-plt.xlabel("Creativity Score")
-plt.ylabel("Fitness Score")
-plt.title("Creativity vs Fitness in Generated Recipes")
-plt.grid(True, alpha=0.3)
-plt.show()
-
-# Print best recipe
-print("\n" + "="*40)
-print("BEST RECIPE:")
-print("="*40)
-best = population[0]
-print(f"Name: {best['name']}")
-print(f"Fitness: {best['fitness']:.3f}")
-print("\nIngredients:")
-for ing in sorted(best['ingredients'], key=lambda x: ga.get_category(x['ingredient'])):
-    cat = ga.get_category(ing['ingredient'])
-    print(f"  [{cat:12s}] {ing['amount']:6.2f} {ing['unit']:10s} {ing['ingredient']}")
\ No newline at end of file
+    # Elitism by partial selection, no full sort
+    t0 = time.perf_counter()
+    elite_size = int(population_size * elite_fraction)
+    elites = [population[i] for i in selection.top(fitness, elite_size)]
+    population = elites + offspring[:(population_size - elite_size)]
+    if stats is not None:
+        stats['sorting'] = stats.get('sorting', 0.0) + time.perf_counter() - t0
+    return population
+
+def sort_population(population):
+    """Population sorted best first (stable)"""
+    return sorted(population, reverse=True, key=lambda r: r['fitness'])
+
+def score_creativity(population, profile):
+    """Batch-score a population for creativity, stored as r['creativity']"""
+    def score_batch(recipes):
+        return creativity_evaluation.evaluate_creativity_batch(recipes, profile)['creativity']
+    
+    creativities = cached_scores(population, creativity_cache, score_batch)
+    for r, creativity in zip(population, creativities):
+        r['creativity'] = creativity
+    return creativities
+
+def run_settings():
+    """Parameters a resumed run must share with the run it continues"""
+    return {
+        'selection_scheme': selection_scheme,
+        'selection_params': selection_params,
+        'elite_fraction': elite_fraction,
+        'mutation_rate': mutation_rate,
+        'incremental_fitness': incremental_fitness,
+    }
+
+def evolve(population_size, generations, workers=1, seed=None, profile=None, telemetry=None,
+           checkpoint_path=None, resume=None, initial=None, controller=None):
+    """
+    Run the evolution and return (population, max_fitnesses, avg_fitnesses),
+    with the final population sorted best first.
+    The run stops after generations generations, or earlier when controller
+    (a controller.RunController) says so; it also sets the mutation rate.
+    The reason is printed and logged in the 'end' record.
+    A given seed produces the same run for any number of workers.
+    With a CorpusProfile, every generation is also scored for creativity.
+    telemetry is a telemetry.Telemetry that receives a record per generation
+    with stage timings, diversity and cache statistics.
+    With checkpoint_path, the run is saved there every checkpoint_interval
+    generations and at the end. resume is a loaded checkpoint to continue
+    (its seed and population size replace the arguments); initial is a list
+    of recipes to warm-start a new run from.
+    """
+    start_gen = 0
+    elapsed = 0.0
+    if resume is not None:
+        if resume['settings'] != run_settings():
+            raise ValueError(f"Checkpoint settings {resume['settings']} differ from {run_settings()}")
+        seed = resume['seed']
+        population = resume['population']
+        population_size = len(population)
+        start_gen = resume['generation']
+        elapsed = resume['elapsed']
+        fitness_cache.hits, fitness_cache.misses = resume['cache_hits'], resume['cache_misses']
+        if controller is not None and resume.get('controller'):
+            controller.load_state(resume['controller'])
+    elif seed is None:
+        seed = random.randrange(2**32)
+    if telemetry is not None:
+        extra = {}
+        if resume is not None:
+            extra['resumed_from'] = start_gen
+        elif initial is not None:
+            extra['warm_start'] = len(initial)
+        telemetry.record('start', population_size=population_size, generations=generations,
+                         workers=workers, seed=seed, **extra)
+    run_start = time.perf_counter() - elapsed
+    start_reason = None
+    if resume is None:
+        population = initial_population(population_size, random.Random(seed), initial)
+        if controller is not None:
+            start_reason = controller.start(population_size, time.perf_counter() - run_start)
+    
+    max_fitnesses = list(resume['max_fitnesses']) if resume is not None else []
+    avg_fitnesses = list(resume['avg_fitnesses']) if resume is not None else []
+    
+    def checkpoint(next_gen):
+        save_checkpoint(checkpoint_path, {
+            'population': population,
+            'max_fitnesses': max_fitnesses,
+            'avg_fitnesses': avg_fitnesses,
+            'generation': next_gen,
+            'seed': seed,
+            'settings': run_settings(),
+            'knowledge_base': ga.kb.path,
+            'elapsed': time.perf_counter() - run_start,
+            'cache_hits': fitness_cache.hits,
+            'cache_misses': fitness_cache.misses,
+            'log_path': telemetry.path if telemetry is not None else None,
+            'log_position': telemetry.tell() if telemetry is not None else None,
+            'controller': controller.state() if controller is not None else None,
+        })
+    
+    stop_reason = start_reason or 'generations'
+    if start_reason:
+        # Stopped before the first generation
+        generations = start_gen
+        if checkpoint_path:
+            checkpoint(start_gen)
+    executor = start_pool(workers) if workers > 1 and generations > start_gen else None
+    try:
+        for gen in range(start_gen, generations):
+            stats = {} if telemetry is not None else None
+            rate = controller.mutation_rate if controller is not None else mutation_rate
+            gen_start = time.perf_counter()
+            population = next_generation(population, gen, seed, executor, stats=stats, rate=rate)
+            
+            fitness = selection.fitness_array(population)
+            max_fitnesses.append(float(fitness.max()))
+            avg_fitnesses.append(sum(r['fitness'] for r in population) / len(population))
+            if profile is not None:
+                creativities = score_creativity(population, profile)
+            diversity = None
+            if telemetry is not None or (controller is not None and controller.needs_diversity):
+                diversity = population_diversity(population, fitness)
+            
+            if telemetry is not None:
+                record = {
+                    'gen': gen,
+                    'best': max_fitnesses[-1],
+                    'avg': avg_fitnesses[-1],
+                    'worst': float(fitness.min()),
+                    'time': time.perf_counter() - gen_start,
+                    'stages': stats,
+                    'diversity': diversity,
+                    'mutation_rate': rate,
+                    'cache': fitness_cache_stats(),
+                }
+                if profile is not None:
+                    record['avg_creativity'] = sum(creativities) / len(creativities)
+                telemetry.record('generation', **record)
+            
+            if gen % 20 == 0:
+                message = f"Generation {gen}: Best fitness = {max_fitnesses[-1]:.3f}, Avg = {avg_fitnesses[-1]:.3f}"
+                if profile is not None:
+                    message += f", Avg creativity = {sum(creativities) / len(creativities):.3f}"
+                print(message)
+            
+            reason = None
+            if controller is not None:
+                evaluations = population_size * (len(max_fitnesses) + 1)
+                reason = controller.update(gen, max_fitnesses[-1], avg_fitnesses[-1], evaluations,
+                                           time.perf_counter() - run_start, diversity)
+            if checkpoint_path and ((gen + 1) % checkpoint_interval == 0 or gen + 1 == generations or reason):
+                checkpoint(gen + 1)
+            if reason:
+                stop_reason = reason
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    stats = fitness_cache_stats()
+    if telemetry is not None:
+        telemetry.record('end', generations=len(max_fitnesses), time=time.perf_counter() - run_start,
+                         cache=stats, stop_reason=stop_reason)
+        telemetry.flush()
+    print(f"Stopped after {len(max_fitnesses)} generations: {stop_reason}")
+    if stats is None:
+        print("Fitness cache: bypassed (incremental fitness)")
+    else:
+        print(f"Fitness cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} saved)")
+    return sort_population(population), max_fitnesses, avg_fitnesses
+
+def run_report(population, profile, top=20, telemetry=None):
+    """Print the creativity of the top recipes and the best recipe"""
+    print("\n" + "="*40)
+    print("CREATIVITY EVALUATION")
+    print("="*40)
+
+    # Evaluate the top recipes, at least 40 for the plot, in one batch
+    scored = population[:max(top, 40)]
+    scores = creativity_evaluation.evaluate_creativity_batch(scored, profile)
+    for i, recipe in enumerate(population[:top]):
+        print(f"\nRecipe {i+1}: {recipe['name']}")
+        print(f"  Creativity Score: {scores['creativity'][i]:.3f}")
+        print(f"  Novelty: {scores['novelty'][i]:.3f}")
+        print(f"  Value: {scores['value'][i]:.3f}")
+        print(f"  Typicality: {scores['typicality'][i]:.3f}")
+        print(f"  Fitness: {recipe['fitness']:.3f}")
+
+    # Logged for the creativity vs fitness plot
+    if telemetry is not None:
+        telemetry.record('creativity', creativity=scores['creativity'].tolist(),
+                         fitness=[r['fitness'] for r in scored])
+
+    # Print best recipe
+    print("\n" + "="*40)
+    print("BEST RECIPE:")
+    print("="*40)
+    best = population[0]
+    print(f"Name: {best['name']}")
+    print(f"Fitness: {best['fitness']:.3f}")
+    print("\nIngredients:")
+    for ing in sorted(best['ingredients'], key=lambda x: ga.get_category(x['ingredient'])):
+        cat = ga.get_category(ing['ingredient'])
+        print(f"  [{cat:12s}] {ing['amount']:6.2f} {ing['unit']:10s} {ing['ingredient']}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Evolve cookie recipes")
+    parser.add_argument('--population-size', type=int, default=population_size)
+    parser.add_argument('--generations', type=int, default=generations)
+    parser.add_argument('--workers', type=int, default=workers)
+    parser.add_argument('--seed', type=int, default=seed, help="seed for a reproducible run")
+    parser.add_argument('--knowledge-base', metavar='PATH',
+                        help="recipes .kb or .json file (default: recipes_output.kb, else .json)")
+    parser.add_argument('--selection', choices=sorted(selection.SCHEMES), default=selection_scheme,
+                        help="parent selection scheme")
+    parser.add_argument('--track-creativity', action='store_true', default=track_creativity,
+                        help="score every generation for creativity")
+    parser.add_argument('--top', type=int, default=20, help="recipes to print creativity scores for")
+    parser.add_argument('--time-budget', type=float, default=time_budget, metavar='SECONDS',
+                        help="stop before the run takes longer than this")
+    parser.add_argument('--evaluation-budget', type=int, default=evaluation_budget, metavar='N',
+                        help="stop before more than N fitness evaluations")
+    parser.add_argument('--target-fitness', type=float, default=target_fitness,
+                        help="stop once the best recipe reaches this fitness")
+    parser.add_argument('--stagnation-window', type=int, default=stagnation_window, metavar='N',
+                        help="stop after N generations without improvement")
+    parser.add_argument('--diversity-threshold', type=float, default=diversity_threshold, metavar='SHARE',
+                        help="raise the mutation rate while the share of distinct recipes is below this")
+    parser.add_argument('--log', metavar='PATH', help="write per-generation telemetry to this JSONL file")
+    parser.add_argument('--checkpoint', metavar='PATH',
+                        help="save the run here every --checkpoint-interval generations")
+    parser.add_argument('--checkpoint-interval', type=int, default=checkpoint_interval, metavar='N')
+    start = parser.add_mutually_exclusive_group()
+    start.add_argument('--resume', metavar='PATH',
+                       help="continue the run saved in this checkpoint (and keep checkpointing to it)")
+    start.add_argument('--warm-start', metavar='PATH',
+                       help="start a new run from the population saved in this checkpoint")
+    parser.add_argument('--save-plots', metavar='DIR',
+                        help="after the run, draw the plots from the log into DIR (needs matplotlib)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    global selection_scheme, selection_params, elite_fraction, incremental_fitness, mutation_rate
+    global checkpoint_interval
+    if args.selection != selection_scheme:
+        # The configured parameters belong to the configured scheme
+        selection_scheme, selection_params = args.selection, {}
+    checkpoint_interval = args.checkpoint_interval
+    resume = initial = None
+    if args.resume:
+        # A resumed run keeps the settings and knowledge base it started with
+        resume = load_checkpoint(args.resume)
+        settings = resume['settings']
+        selection_scheme, selection_params = settings['selection_scheme'], settings['selection_params']
+        elite_fraction, incremental_fitness = settings['elite_fraction'], settings['incremental_fitness']
+        mutation_rate = settings['mutation_rate']
+        if not args.knowledge_base:
+            ga.use_knowledge_base(resume['knowledge_base'])
+        print(f"Resuming at generation {resume['generation']} from {args.resume}")
+    elif args.warm_start:
+        initial = load_checkpoint(args.warm_start)['population']
+    if args.knowledge_base:
+        ga.use_knowledge_base(args.knowledge_base)
+    controller = RunController(
+        time_budget=args.time_budget, max_evaluations=args.evaluation_budget,
+        target_fitness=args.target_fitness, stagnation_window=args.stagnation_window,
+        tolerance=stagnation_tolerance, mutation_rate=mutation_rate,
+        diversity_threshold=args.diversity_threshold)
+    # A knowledge base read from its file is keyed by the file alone: no need to hash every recipe
+    recipes = ga.kb.recipes if ga.kb.source_path is None else None
+    profile = creativity_evaluation.load_profile(ga.kb.path, recipes=recipes)
+    log_path = args.log
+    if log_path is None and args.save_plots:
+        os.makedirs(args.save_plots, exist_ok=True)
+        log_path = os.path.join(args.save_plots, 'run.jsonl')
+    telemetry = None
+    if log_path:
+        # Continue the log of a resumed run from where its checkpoint left it
+        truncate_at = None
+        if (resume is not None and resume['log_path'] and resume['log_position'] is not None
+                and os.path.abspath(resume['log_path']) == os.path.abspath(log_path)):
+            truncate_at = resume['log_position']
+        telemetry = Telemetry(log_path, truncate_at=truncate_at)
+    try:
+        population, _, _ = evolve(
+            args.population_size, args.generations, args.workers, args.seed,
+            profile if args.track_creativity else None, telemetry,
+            checkpoint_path=args.checkpoint or args.resume, resume=resume, initial=initial,
+            controller=controller)
+        run_report(population, profile, args.top, telemetry)
+    finally:
+        if telemetry is not None:
+            telemetry.close()
+    
+    # Plots are drawn from the log once the run is over
+    if args.save_plots:
+        plots.plot_log(log_path, args.save_plots)
+        print(f"\nPlots saved to: {args.save_plots}")
+
+if __name__ == "__main__":
+    main()
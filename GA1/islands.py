@@ -0,0 +1,141 @@
+import queue
+import random
+import multiprocessing as mp
+import generator
+import selection
+from population import pack_recipes, unpack_recipes
+
+# Experiment parameters
+num_islands = 4
+island_size = 100
+generations = 200
+migration_interval = 10   # generations between migrations
+migrants = 2              # best individuals each island sends per migration
+topology = 'ring'         # 'ring', 'fully_connected', 'random' or a dict {island: [destinations]}
+seed = None
+
+def migration_targets(topology, n, migration, seed):
+    """
+    Destinations of every island for one migration, as {island: [islands]}.
+    'random' draws a fresh ring order for every migration from the run seed,
+    so every island derives the same topology without talking to the others.
+    """
+    if isinstance(topology, dict):
+        return {i: list(topology.get(i, [])) for i in range(n)}
+    if n < 2:
+        return {i: [] for i in range(n)}
+    if topology == 'ring':
+        return {i: [(i + 1) % n] for i in range(n)}
+    if topology == 'fully_connected':
+        return {i: [j for j in range(n) if j != i] for i in range(n)}
+    if topology == 'random':
+        order = list(range(n))
+        random.Random(f"{seed}:migration:{migration}").shuffle(order)
+        return {order[k]: [order[(k + 1) % n]] for k in range(n)}
+    raise ValueError(f"Unknown topology: {topology}")
+
+def run_island(island, config, inboxes, results):
+    """
+    Evolve one island. Every migration_interval generations it sends its best
+    individuals to its destinations and waits for the migrants addressed to
+    it, which replace its worst individuals. Runs in its own process.
+    """
+    n = len(inboxes)
+    island_seed = f"{config['seed']}:island{island}"
+    prefix = f"recipe {island}."
+    population = generator.initial_population(config['island_size'], random.Random(island_seed))
+
+    max_fitnesses = []
+    avg_fitnesses = []
+    pending = {}  # migration number -> payloads that arrived early
+    for gen in range(config['generations']):
+        population = generator.next_generation(population, gen, island_seed, prefix=prefix)
+
+        if config['migration_interval'] and (gen + 1) % config['migration_interval'] == 0:
+            migration = (gen + 1) // config['migration_interval']
+            targets = migration_targets(config['topology'], n, migration, config['seed'])
+            fitness = selection.fitness_array(population)
+            payload = pack_recipes([population[i] for i in selection.top(fitness, config['migrants'])])
+            for dest in targets[island]:
+                inboxes[dest].put((migration, island, payload))
+
+            expected = sum(island in dests for dests in targets.values())
+            arrived = pending.pop(migration, [])
+            while len(arrived) < expected:
+                msg_migration, source, data = inboxes[island].get()
+                if msg_migration == migration:
+                    arrived.append((source, data))
+                else:
+                    pending.setdefault(msg_migration, []).append((source, data))
+
+            # Deterministic order regardless of arrival order
+            immigrants = [r for _, data in sorted(arrived) for r in unpack_recipes(data)]
+            if immigrants:
+                immigrants = immigrants[:len(population)]
+                for worst, immigrant in zip(selection.bottom(fitness, len(immigrants)), immigrants):
+                    population[worst] = immigrant
+
+        max_fitnesses.append(max(r['fitness'] for r in population))
+        avg_fitnesses.append(sum(r['fitness'] for r in population) / len(population))
+
+    results.put((island, pack_recipes(generator.sort_population(population)), max_fitnesses, avg_fitnesses))
+
+def run_islands(num_islands, island_size, generations, migration_interval=10, migrants=2,
+                topology='ring', seed=None):
+    """
+    Run an island-model evolution with one process per island.
+    Returns (populations, max_fitnesses, avg_fitnesses), each indexed by island.
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+    config = {
+        'seed': seed,
+        'island_size': island_size,
+        'generations': generations,
+        'migration_interval': migration_interval,
+        'migrants': migrants,
+        'topology': topology,
+    }
+    inboxes = [mp.Queue() for _ in range(num_islands)]
+    results = mp.Queue()
+    processes = [
+        mp.Process(target=run_island, args=(i, config, inboxes, results))
+        for i in range(num_islands)
+    ]
+    for p in processes:
+        p.start()
+
+    # Drain results before joining, a process cannot exit with queued data
+    populations = [None] * num_islands
+    max_fitnesses = [None] * num_islands
+    avg_fitnesses = [None] * num_islands
+    for _ in range(num_islands):
+        while True:
+            try:
+                island, data, island_max, island_avg = results.get(timeout=1)
+                break
+            except queue.Empty:
+                failed = [p.name for p in processes if p.exitcode not in (None, 0)]
+                if failed:
+                    for p in processes:
+                        p.terminate()
+                    raise RuntimeError(f"Island process failed: {', '.join(failed)}")
+        populations[island] = unpack_recipes(data)
+        max_fitnesses[island] = island_max
+        avg_fitnesses[island] = island_avg
+    for p in processes:
+        p.join()
+
+    return populations, max_fitnesses, avg_fitnesses
+
+def main():
+    populations, max_fitnesses, _ = run_islands(num_islands, island_size, generations,
+                                                migration_interval, migrants, topology, seed)
+    for island, population in enumerate(populations):
+        print(f"Island {island}: Best fitness = {max_fitnesses[island][-1]:.3f} ({population[0]['name']})")
+
+    best = max((p[0] for p in populations), key=lambda r: r['fitness'])
+    print(f"\nBest overall: {best['name']} with fitness {best['fitness']:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,603 @@
+"""
+Compact binary knowledge base.
+
+A .kb file holds the recipes as columns, grouped by recipe:
+
+    recipe_offsets  uint64  first row of every recipe, plus the total row count
+    recipe_ids      uint32  recipe of every row
+    ingredient_ids  uint32  index into the ingredient string table
+    amounts         float64
+    unit_ids        uint16  index into the unit string table
+    ratings         float64
+
+the row index of every ingredient, for mutation candidate pools:
+
+    ingredient_rows         uint32/uint64  row numbers grouped by ingredient, in row order
+    ingredient_row_offsets  uint64         first entry of every ingredient, plus the row count
+
+plus string tables (utf-8 blob + uint64 offsets) for recipe names,
+ingredient names and units. The file starts with an 8-byte magic, the
+uint64 length of a JSON header (column layout, categories) and the header
+itself; the columns follow at 64-byte aligned offsets and are opened with
+np.memmap, so only the pages that are touched are ever read.
+
+KnowledgeBase wraps a file with the lookup tables the GA needs and loads
+nothing until one of them is first used.
+"""
+import json
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+import numpy as np
+
+MAGIC = b'GA1KB\x00\x00\x01'
+VERSION = 1
+ALIGNMENT = 64
+CHUNK_ROWS = 1 << 16
+
+ROW_COLUMNS = [
+    ('recipe_ids', '<u4', 'I'),
+    ('ingredient_ids', '<u4', 'I'),
+    ('amounts', '<f8', 'd'),
+    ('unit_ids', '<u2', 'H'),
+    ('ratings', '<f8', 'd'),
+]
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def _string_table(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def _decode_strings(blob, offsets):
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(bounds) - 1)]
+
+def _first_use_order(column, size):
+    """IDs in column (size distinct values) in order of first appearance, read chunk by chunk"""
+    seen = np.zeros(size, dtype=bool)
+    order = []
+    for start in range(0, len(column), CHUNK_ROWS):
+        chunk = np.asarray(column[start:start + CHUNK_ROWS])
+        chunk = chunk[~seen[chunk]]
+        if len(chunk):
+            ids, first = np.unique(chunk, return_index=True)
+            new = ids[np.argsort(first)]
+            seen[new] = True
+            order.extend(new.tolist())
+    return np.asarray(order, dtype=np.int64)
+
+
+def _group_rows(column, size, out=None):
+    """
+    Row numbers of column (values below size) grouped by value, in row
+    order within a group, and the offsets of the groups: a counting sort
+    done chunk by chunk. Rows are written to out if given.
+    """
+    counts = np.zeros(size, dtype=np.int64)
+    for start in range(0, len(column), CHUNK_ROWS):
+        counts += np.bincount(np.asarray(column[start:start + CHUNK_ROWS]), minlength=size)
+    offsets = np.zeros(size + 1, dtype='<u8')
+    np.cumsum(counts, out=offsets[1:])
+    if out is None:
+        out = np.empty(len(column), dtype=np.uint32 if len(column) < 2**32 else np.uint64)
+    cursor = offsets[:-1].astype(np.int64)
+    for start in range(0, len(column), CHUNK_ROWS):
+        chunk = np.asarray(column[start:start + CHUNK_ROWS], dtype=np.int64)
+        order = np.argsort(chunk, kind='stable')
+        values = chunk[order]
+        unique, first, group_sizes = np.unique(values, return_index=True, return_counts=True)
+        rank = np.arange(len(values)) - np.repeat(first, group_sizes)
+        out[cursor[values] + rank] = start + order
+        cursor[unique] += group_sizes
+    return out, offsets
+
+
+def write_kb(path, rows, categories=None):
+    """
+    Write rows of (recipe_name, ingredient, amount, unit, rating) to a .kb file.
+
+    rows is consumed as a stream: rows are spooled to temporary column files
+    and scattered into recipe order on disk, so memory use grows with the
+    number of distinct recipes and ingredients, not with the number of rows.
+    Recipes keep the order of their first row, and rows keep their order
+    within a recipe.
+    """
+    recipe_ids, ingredient_ids, unit_ids = {}, {}, {}
+    recipe_counts = array('Q')
+    num_rows = 0
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        spools = {name: open(os.path.join(tmp, name), 'wb') for name, _, _ in ROW_COLUMNS}
+        buffers = {name: array(code) for name, _, code in ROW_COLUMNS}
+
+        def flush():
+            for name, buffer in buffers.items():
+                buffer.tofile(spools[name])
+                del buffer[:]
+
+        for recipe_name, ingredient, amount, unit, rating in rows:
+            recipe_id = recipe_ids.setdefault(recipe_name, len(recipe_ids))
+            if recipe_id == len(recipe_counts):
+                recipe_counts.append(0)
+            recipe_counts[recipe_id] += 1
+            buffers['recipe_ids'].append(recipe_id)
+            buffers['ingredient_ids'].append(ingredient_ids.setdefault(ingredient, len(ingredient_ids)))
+            buffers['amounts'].append(amount)
+            buffers['unit_ids'].append(unit_ids.setdefault(unit, len(unit_ids)))
+            buffers['ratings'].append(rating)
+            num_rows += 1
+            if len(buffers['recipe_ids']) >= CHUNK_ROWS:
+                flush()
+        flush()
+        for spool in spools.values():
+            spool.close()
+
+        counts = np.frombuffer(recipe_counts, dtype=np.uint64) if recipe_counts else np.zeros(0, np.uint64)
+        recipe_offsets = np.zeros(len(counts) + 1, dtype='<u8')
+        np.cumsum(counts, out=recipe_offsets[1:])
+
+        tables = {
+            'recipe_names': _string_table(recipe_ids),
+            'ingredient_names': _string_table(ingredient_ids),
+            'unit_names': _string_table(unit_ids),
+        }
+
+        # Column layout, relative to the aligned start of the data section
+        columns = {}
+        position = 0
+        def reserve(name, dtype, count):
+            nonlocal position
+            columns[name] = {'dtype': dtype, 'offset': position, 'count': int(count)}
+            position = _align(position + np.dtype(dtype).itemsize * int(count))
+        reserve('recipe_offsets', '<u8', len(recipe_offsets))
+        for name, dtype, _ in ROW_COLUMNS:
+            reserve(name, dtype, num_rows)
+        reserve('ingredient_rows', '<u4' if num_rows < 2**32 else '<u8', num_rows)
+        reserve('ingredient_row_offsets', '<u8', len(ingredient_ids) + 1)
+        for name, (blob, offsets) in tables.items():
+            reserve(f'{name}_blob', '|u1', len(blob))
+            reserve(f'{name}_offsets', '<u8', len(offsets))
+
+        header = json.dumps({
+            'version': VERSION,
+            'num_recipes': len(recipe_ids),
+            'num_rows': num_rows,
+            'categories': categories or {},
+            'columns': columns,
+        }).encode('utf-8')
+        data_start = _align(len(MAGIC) + 8 + len(header))
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            f.truncate(data_start + position)
+
+        def output(name):
+            col = columns[name]
+            if col['count'] == 0:
+                return None
+            return np.memmap(tmp_path, dtype=col['dtype'], mode='r+',
+                             offset=data_start + col['offset'], shape=(col['count'],))
+
+        # Scatter spooled rows to their recipe's slot, one chunk at a time
+        if num_rows:
+            outputs = {name: output(name) for name, _, _ in ROW_COLUMNS}
+            cursor = recipe_offsets[:-1].astype(np.int64)
+            spooled = {
+                name: np.memmap(os.path.join(tmp, name), dtype=dtype, mode='r', shape=(num_rows,))
+                for name, dtype, _ in ROW_COLUMNS
+            }
+            for start in range(0, num_rows, CHUNK_ROWS):
+                chunk_ids = np.asarray(spooled['recipe_ids'][start:start + CHUNK_ROWS], dtype=np.int64)
+                order = np.argsort(chunk_ids, kind='stable')
+                sorted_ids = chunk_ids[order]
+                unique, first, group_sizes = np.unique(sorted_ids, return_index=True, return_counts=True)
+                rank = np.arange(len(sorted_ids)) - np.repeat(first, group_sizes)
+                positions = cursor[sorted_ids] + rank
+                cursor[unique] += group_sizes
+                for name, _, _ in ROW_COLUMNS:
+                    outputs[name][positions] = np.asarray(spooled[name][start:start + CHUNK_ROWS])[order]
+            # Number ingredients and units in order of first use in recipe
+            # order, as RecipeTable.from_recipes does for the same recipes
+            for column, table, names in (('ingredient_ids', 'ingredient_names', ingredient_ids),
+                                         ('unit_ids', 'unit_names', unit_ids)):
+                order = _first_use_order(outputs[column], len(names))
+                remap = np.empty(len(names), dtype=outputs[column].dtype)
+                remap[order] = np.arange(len(names))
+                for start in range(0, num_rows, CHUNK_ROWS):
+                    chunk = outputs[column][start:start + CHUNK_ROWS]
+                    outputs[column][start:start + CHUNK_ROWS] = remap[chunk]
+                names = list(names)
+                tables[table] = _string_table([names[i] for i in order])
+            outputs['ingredient_rows'] = output('ingredient_rows')
+            _, row_offsets = _group_rows(outputs['ingredient_ids'], len(ingredient_ids),
+                                         out=outputs['ingredient_rows'])
+            outputs['ingredient_row_offsets'] = output('ingredient_row_offsets')
+            outputs['ingredient_row_offsets'][:] = row_offsets
+            for mm in outputs.values():
+                mm.flush()
+            del outputs, spooled
+
+        out = output('recipe_offsets')
+        out[:] = recipe_offsets
+        out.flush()
+        for name, (blob, offsets) in tables.items():
+            for suffix, values in (('blob', blob), ('offsets', offsets)):
+                out = output(f'{name}_{suffix}')
+                if out is not None:
+                    out[:] = values
+                    out.flush()
+        del out
+
+    os.replace(tmp_path, path)
+    return open_kb(path)
+
+
+class RecipeTable(Sequence):
+    """
+    Read-only sequence of recipe dicts backed by columnar arrays.
+
+    Recipes are materialised on access, so the returned dicts are fresh
+    copies; the columns themselves may be memory-mapped.
+    """
+
+    def __init__(self, columns, recipe_names, ingredient_names, unit_names, categories):
+        self.recipe_offsets = columns['recipe_offsets']
+        self.recipe_ids = columns['recipe_ids']
+        self.ingredient_ids = columns['ingredient_ids']
+        self.amounts = columns['amounts']
+        self.unit_ids = columns['unit_ids']
+        self.ratings = columns['ratings']
+        self._recipe_names = recipe_names  # (blob, offsets)
+        self.ingredient_names = ingredient_names
+        self.unit_names = unit_names
+        self.categories = categories
+        if columns.get('ingredient_rows') is None:
+            # Knowledge bases written without the row index
+            columns['ingredient_rows'], columns['ingredient_row_offsets'] = _group_rows(
+                self.ingredient_ids, len(ingredient_names))
+        self.ingredient_rows = columns['ingredient_rows']
+        self.ingredient_row_offsets = columns['ingredient_row_offsets']
+
+    def __len__(self):
+        return len(self.recipe_offsets) - 1
+
+    @property
+    def num_rows(self):
+        return len(self.ingredient_ids)
+
+    def recipe_name(self, i):
+        blob, offsets = self._recipe_names
+        return blob[int(offsets[i]):int(offsets[i + 1])].tobytes().decode('utf-8')
+
+    def ingredient(self, row):
+        """Ingredient dict of one row"""
+        row = int(row)
+        return {
+            'ingredient': self.ingredient_names[self.ingredient_ids[row]],
+            'amount': float(self.amounts[row]),
+            'unit': self.unit_names[self.unit_ids[row]],
+            'rating': float(self.ratings[row]),
+        }
+
+    def _recipe(self, i):
+        start, end = int(self.recipe_offsets[i]), int(self.recipe_offsets[i + 1])
+        ingredient_names, unit_names = self.ingredient_names, self.unit_names
+        return {
+            'name': self.recipe_name(i),
+            'ingredients': [
+                {'ingredient': ingredient_names[ing], 'amount': amount,
+                 'unit': unit_names[unit], 'rating': rating}
+                for ing, amount, unit, rating in zip(
+                    self.ingredient_ids[start:end].tolist(), self.amounts[start:end].tolist(),
+                    self.unit_ids[start:end].tolist(), self.ratings[start:end].tolist())
+            ],
+        }
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._recipe(j) for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('recipe index out of range')
+        return self._recipe(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._recipe(i)
+
+    @classmethod
+    def from_recipes(cls, recipes, categories=None):
+        """Build an in-memory table from a list of recipe dicts"""
+        ingredient_ids, unit_ids = {}, {}
+        offsets, ingredients, amounts, units, ratings, owners = [0], [], [], [], [], []
+        for recipe_id, r in enumerate(recipes):
+            for ing in r['ingredients']:
+                owners.append(recipe_id)
+                ingredients.append(ingredient_ids.setdefault(ing['ingredient'], len(ingredient_ids)))
+                amounts.append(ing['amount'])
+                units.append(unit_ids.setdefault(ing['unit'], len(unit_ids)))
+                ratings.append(ing['rating'])
+            offsets.append(len(ingredients))
+        columns = {
+            'recipe_offsets': np.array(offsets, dtype='<u8'),
+            'recipe_ids': np.array(owners, dtype='<u4'),
+            'ingredient_ids': np.array(ingredients, dtype='<u4'),
+            'amounts': np.array(amounts, dtype='<f8'),
+            'unit_ids': np.array(units, dtype='<u2'),
+            'ratings': np.array(ratings, dtype='<f8'),
+        }
+        return cls(columns, _string_table([r['name'] for r in recipes]),
+                   list(ingredient_ids), list(unit_ids), categories or {})
+
+
+class RowPool(Sequence):
+    """
+    Recipe rows of a set of ingredients, as a sequence: pool[k] is the k-th
+    row, ingredient by ingredient, each in row order. Only the ingredients
+    and their cumulative row counts are held, O(vocabulary); rows are looked
+    up in the table's ingredient row index, which may be memory-mapped.
+    A uniform pick is an occurrence, so it is weighted by usage.
+    """
+
+    def __init__(self, table, ingredients):
+        starts = table.ingredient_row_offsets
+        # A plain ndarray view of a memmap: same pages, faster scalar indexing
+        self._rows = np.asarray(table.ingredient_rows)
+        self._starts, self._ends = [], []
+        total = 0
+        for ing in ingredients:
+            start, end = int(starts[ing]), int(starts[ing + 1])
+            if end > start:
+                self._starts.append(start)
+                total += end - start
+                self._ends.append(total)
+        self._len = total
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, k):
+        if not -self._len <= k < self._len:
+            raise IndexError('pool index out of range')
+        if k < 0:
+            k += self._len
+        i = bisect_right(self._ends, k)
+        before = self._ends[i - 1] if i else 0
+        return int(self._rows[self._starts[i] + k - before])
+
+
+def open_kb(path):
+    """Memory-map a .kb file as a RecipeTable"""
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a recipe knowledge base")
+        (header_size,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size).decode('utf-8'))
+    if header['version'] != VERSION:
+        raise ValueError(f"Unsupported knowledge base version {header['version']} in {path}")
+    data_start = _align(len(MAGIC) + 8 + header_size)
+
+    def column(name):
+        col = header['columns'][name]
+        if col['count'] == 0:
+            return np.zeros(0, dtype=col['dtype'])
+        return np.memmap(path, dtype=col['dtype'], mode='r',
+                         offset=data_start + col['offset'], shape=(col['count'],))
+
+    columns = {name: column(name) for name in ['recipe_offsets'] + [c[0] for c in ROW_COLUMNS]}
+    if 'ingredient_rows' in header['columns']:
+        columns['ingredient_rows'] = column('ingredient_rows')
+        columns['ingredient_row_offsets'] = column('ingredient_row_offsets')
+    return RecipeTable(
+        columns,
+        (column('recipe_names_blob'), column('recipe_names_offsets')),
+        _decode_strings(column('ingredient_names_blob'), column('ingredient_names_offsets')),
+        _decode_strings(column('unit_names_blob'), column('unit_names_offsets')),
+        header['categories'],
+    )
+
+def load_recipes(path):
+    """Open a knowledge base: a .kb file is memory-mapped, a JSON file converted in memory"""
+    if path.endswith('.kb'):
+        return open_kb(path)
+    with open(path, 'r') as f:
+        data = json.load(f)
+    categories = data['categories'][0] if data.get('categories') else {}
+    return RecipeTable.from_recipes(data['recipes'], categories)
+
+
+# Data files are looked up next to this module, not in the working directory
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+# Overrides the default knowledge base file; inherited by worker processes
+PATH_ENV = 'GA1_KNOWLEDGE_BASE'
+
+def default_path():
+    """$GA1_KNOWLEDGE_BASE, else recipes_output.kb if built, else recipes_output.json"""
+    if os.environ.get(PATH_ENV):
+        return os.environ[PATH_ENV]
+    kb_path = os.path.join(DATA_DIR, 'recipes_output.kb')
+    return kb_path if os.path.exists(kb_path) else os.path.join(DATA_DIR, 'recipes_output.json')
+
+
+def _add_ingredient(tables, name, cat):
+    """Append an unseen ingredient to the vocabulary tables under cat"""
+    cat_id = tables['category_ids'][cat]
+    tables['ingredient_ids'][name] = len(tables['ingredient_names'])
+    tables['ingredient_names'].append(name)
+    tables['ingredient_category_ids'].append(cat_id)
+    tables['category_index'][name] = cat
+    tables['category_id_index'][name] = cat_id
+
+def _add_unit(tables, unit):
+    tables['unit_ids'][unit] = len(tables['unit_names'])
+    tables['unit_names'].append(unit)
+
+
+class KnowledgeBase:
+    """
+    Recipes, ingredient categories and the lookup tables derived from them.
+
+    Creating one is free: the file is read and every table built on first
+    access to any of them, after which they are plain attributes.
+
+        recipes                  RecipeTable
+        categories               {category: [ingredients]}, including 'other'
+        category_names, category_ids, other_category_id
+        ingredient_names, ingredient_ids
+        ingredient_category_ids  ingredient ID -> category ID
+        category_index           ingredient name -> category name
+        category_id_index        ingredient name -> category ID
+        category_members         {category: frozenset of listed ingredients}
+        member_pools             {category: RowPool of its listed ingredients}
+        category_pools           {category: RowPool of the ingredients that fall in it}
+        unit_names, unit_ids
+
+    The ingredient and unit tables grow as unseen names are registered.
+    """
+
+    _TABLES = frozenset([
+        'recipes', 'categories', 'category_names', 'category_ids', 'other_category_id',
+        'ingredient_names', 'ingredient_ids', 'ingredient_category_ids', 'category_index',
+        'category_id_index', 'category_members', 'member_pools', 'category_pools', 'unit_names', 'unit_ids',
+    ])
+
+    def __init__(self, path=None, recipes=None, categories=None):
+        """
+        path defaults to default_path() at load time. recipes (a RecipeTable
+        or a list of recipe dicts) and categories replace the file's contents.
+        """
+        self._path = path
+        self._source = (recipes, categories)
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self._path if self._path is not None else default_path()
+
+    @property
+    def source_path(self):
+        """Absolute path of the file everything is read from, or None if recipes or categories were given"""
+        recipes, categories = self._source
+        if recipes is not None or categories is not None:
+            return None
+        return os.path.abspath(self.path)
+
+    @property
+    def loaded(self):
+        return 'recipes' in self.__dict__
+
+    def __getattr__(self, name):
+        # Only reached for attributes that are not set yet
+        if name not in KnowledgeBase._TABLES:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        self.load()
+        return self.__dict__[name]
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"KnowledgeBase({self.path!r}, {state})"
+
+    def __getstate__(self):
+        # Ship the source, not the tables; the receiver loads on first use
+        return {'_path': self.path, '_source': self._source}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read the file and build every table, if not done yet. Returns self."""
+        with self._lock:
+            if not self.loaded:
+                self._build()
+        return self
+
+    def _build(self):
+        recipes, categories = self._source
+        if recipes is None:
+            recipes = load_recipes(self.path)
+        elif not isinstance(recipes, RecipeTable):
+            recipes = RecipeTable.from_recipes(recipes, categories)
+        if categories is None:
+            categories = recipes.categories
+        categories = {cat: list(items) for cat, items in categories.items()}
+        if 'other' not in categories:
+            categories['other'] = []
+
+        # Built aside and published at once: attributes already set bypass
+        # __getattr__ and the lock, so other threads must not see a partial set
+        tables = {
+            'categories': categories,
+            'category_names': list(categories),
+            'category_ids': {cat: i for i, cat in enumerate(categories)},
+            'category_members': {cat: frozenset(items) for cat, items in categories.items()},
+            'ingredient_names': [],
+            'ingredient_ids': {},
+            'ingredient_category_ids': [],
+            'category_index': {},
+            'category_id_index': {},
+            'unit_names': [],
+            'unit_ids': {},
+        }
+        tables['other_category_id'] = tables['category_ids']['other']
+
+        # The first category listing an ingredient wins, as in a linear scan
+        category_index, ingredient_ids = tables['category_index'], tables['ingredient_ids']
+        for cat, items in categories.items():
+            for name in items:
+                if name not in ingredient_ids:
+                    _add_ingredient(tables, name, cat)
+        for name in recipes.ingredient_names:
+            if name not in ingredient_ids:
+                _add_ingredient(tables, name, category_index.get(name.lower(), 'other'))
+        for unit in recipes.unit_names:
+            if unit not in tables['unit_ids']:
+                _add_unit(tables, unit)
+
+        # Mutation candidate pools: the recipe rows of their ingredients, so a
+        # uniform pick is weighted by usage, kept as per-ingredient row counts
+        table_names = recipes.ingredient_names
+        table_categories = [category_index.get(name.lower(), 'other') for name in table_names]
+        tables['category_pools'] = {
+            cat: RowPool(recipes, [i for i, c in enumerate(table_categories) if c == cat])
+            for cat in categories
+        }
+        tables['member_pools'] = {
+            cat: RowPool(recipes, [i for i, name in enumerate(table_names) if name in members])
+            for cat, members in tables['category_members'].items()
+        }
+        tables['recipes'] = recipes
+        self.__dict__.update(tables)
+
+    def get_category(self, ingredient_name):
+        return self.category_index.get(ingredient_name.lower(), 'other')
+
+    def register_ingredient(self, name, cat):
+        """ID of an ingredient, adding it to the vocabulary under cat if unseen"""
+        ids = self.ingredient_ids  # loads the tables if needed
+        if name not in ids:
+            _add_ingredient(self.__dict__, name, cat)
+        return ids[name]
+
+    def register_unit(self, unit):
+        """ID of a unit, registering it if unseen"""
+        ids = self.unit_ids
+        if unit not in ids:
+            _add_unit(self.__dict__, unit)
+        return ids[unit]
@@ -0,0 +1,112 @@
+"""
+Optional plots of a run, drawn offline from its telemetry log. matplotlib is
+only imported when a plot is drawn, so runs and pool workers never load it.
+
+    python plots.py run.jsonl                  # show the plots
+    python plots.py run.jsonl --output-dir DIR # save them as PNG files
+"""
+import argparse
+import os
+from telemetry import read_log
+
+STAGES = ['selection', 'crossover', 'mutation', 'normalise', 'fitness', 'sorting']
+
+def _pyplot(headless=False):
+    try:
+        import matplotlib
+        if headless:
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError as e:
+        raise ImportError("Plotting needs matplotlib: pip install matplotlib") from e
+    return plt
+
+def _finish(plt, fig, path):
+    """Show the figure, or save it to path and close it"""
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path)
+        plt.close(fig)
+
+def plot_fitness(max_fitnesses, avg_fitnesses, path=None):
+    """Best and average fitness per generation"""
+    plt = _pyplot(path is not None)
+    fig = plt.figure(figsize=(10, 6))
+    plt.plot(max_fitnesses, label="Best Fitness", linewidth=2)
+    plt.plot(avg_fitnesses, label="Average Fitness", linewidth=2)
+    plt.xlabel("Generation")
+    plt.ylabel("Fitness")
+    plt.title("Cookie Recipe Evolution")
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    _finish(plt, fig, path)
+
+def plot_creativity_vs_fitness(creativities, fitnesses, path=None):
+    """Scatter of creativity against fitness"""
+    plt = _pyplot(path is not None)
+    fig = plt.figure(figsize=(10, 6))
+    plt.scatter(creativities, fitnesses, alpha=0.6)
+    plt.xlabel("Creativity Score")
+    plt.ylabel("Fitness Score")
+    plt.title("Creativity vs Fitness in Generated Recipes")
+    plt.grid(True, alpha=0.3)
+    _finish(plt, fig, path)
+
+def plot_stage_times(generations, path=None):
+    """Stacked milliseconds per stage for every generation record"""
+    plt = _pyplot(path is not None)
+    fig = plt.figure(figsize=(10, 6))
+    gens = [r['gen'] for r in generations]
+    times = [[r['stages'].get(stage, 0.0) * 1000 for r in generations] for stage in STAGES]
+    plt.stackplot(gens, times, labels=STAGES)
+    plt.xlabel("Generation")
+    plt.ylabel("Time (ms)")
+    plt.title("Time per Stage")
+    plt.legend(loc='upper left')
+    plt.grid(True, alpha=0.3)
+    _finish(plt, fig, path)
+
+def plot_diversity(generations, path=None):
+    """Share of distinct recipes and fitness cache hit rate per generation"""
+    plt = _pyplot(path is not None)
+    fig = plt.figure(figsize=(10, 6))
+    gens = [r['gen'] for r in generations]
+    plt.plot(gens, [r['diversity']['unique_recipes'] for r in generations], label="Distinct recipes")
+    cached = [r for r in generations if r.get('cache')]
+    if cached:  # None when incremental scoring bypasses the cache
+        plt.plot([r['gen'] for r in cached], [r['cache']['hit_rate'] for r in cached],
+                 label="Fitness cache hit rate")
+    plt.xlabel("Generation")
+    plt.ylabel("Share")
+    plt.ylim(0, 1.05)
+    plt.title("Population Diversity")
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    _finish(plt, fig, path)
+
+def plot_log(log_path, output_dir=None):
+    """Draw every plot of a telemetry log; saved as PNG files if output_dir is given"""
+    def path(name):
+        return os.path.join(output_dir, name) if output_dir else None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    records = read_log(log_path)
+    generations = [r for r in records if r['event'] == 'generation']
+    if generations:
+        plot_fitness([r['best'] for r in generations], [r['avg'] for r in generations], path('fitness.png'))
+        plot_stage_times(generations, path('stage_times.png'))
+        plot_diversity(generations, path('diversity.png'))
+    for r in records:
+        if r['event'] == 'creativity':
+            plot_creativity_vs_fitness(r['creativity'], r['fitness'], path('creativity_vs_fitness.png'))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plot a run from its telemetry log")
+    parser.add_argument('log', help="JSONL log written by generator.py --log")
+    parser.add_argument('--output-dir', help="save PNG files here instead of showing the plots")
+    args = parser.parse_args(argv)
+    plot_log(args.log, args.output_dir)
+
+if __name__ == "__main__":
+    main()
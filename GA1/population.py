@@ -0,0 +1,276 @@
+import json
+import struct
+from operator import itemgetter
+import numpy as np
+import ga
+
+def get_unit_id(unit):
+    """Get the integer code of a unit, registering unseen ones"""
+    return ga.kb.register_unit(unit)
+
+def __getattr__(name):
+    # Unit codes shared by every encoded population, kept by the knowledge base
+    if name == 'UNIT_NAMES':
+        return ga.kb.unit_names
+    if name == 'UNIT_IDS':
+        return ga.kb.unit_ids
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class Population:
+    """
+    Array representation of a population of recipes.
+
+    Ingredients are stored as flat columns grouped by recipe, the layout of
+    knowledge_base.RecipeTable: recipe i owns entries offsets[i] to
+    offsets[i + 1] of ingredient_ids (IDs in the ga vocabulary), amounts,
+    ratings and unit_ids, in the order of its ingredient list. Memory grows
+    with the number of ingredients, not with recipes x vocabulary, and every
+    recipe is reduced in its own order, so the batch fitness is exactly
+    ga.calculate_fitness.
+
+    The GA operators work on recipe dicts; from_recipes and to_recipes
+    convert between the two views, and concat joins populations encoded
+    separately, so only new recipes ever need encoding.
+    """
+
+    def __init__(self, names, offsets, ingredient_ids, amounts, ratings, unit_ids):
+        self.names = names
+        self.offsets = offsets                # int64, n + 1 entries
+        self.ingredient_ids = ingredient_ids  # int64 ingredient IDs
+        self.amounts = amounts                # float64
+        self.ratings = ratings                # float64
+        self.unit_ids = unit_ids              # int64 unit IDs
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def lengths(self):
+        """Number of ingredients of every recipe"""
+        return np.diff(self.offsets)
+
+    @property
+    def recipe_index(self):
+        """Recipe of every ingredient entry"""
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    @property
+    def nbytes(self):
+        """Bytes of the arrays (names excluded)"""
+        return sum(a.nbytes for a in (self.offsets, self.ingredient_ids, self.amounts,
+                                      self.ratings, self.unit_ids))
+
+    def __getitem__(self, idx):
+        """Select a sub-population by index array, slice or boolean mask"""
+        rows = np.arange(len(self))[idx]
+        starts, lengths = self.offsets[rows], self.lengths[rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        entries = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return Population([self.names[i] for i in rows.tolist()], offsets, self.ingredient_ids[entries],
+                          self.amounts[entries], self.ratings[entries], self.unit_ids[entries])
+
+    @classmethod
+    def concat(cls, populations):
+        """One population holding the recipes of all of them, in order"""
+        populations = list(populations)
+        if not populations:
+            return cls.from_recipes([])
+        lengths = np.concatenate([p.lengths for p in populations])
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls([name for p in populations for name in p.names], offsets,
+                   *(np.concatenate([getattr(p, column) for p in populations])
+                     for column in ('ingredient_ids', 'amounts', 'ratings', 'unit_ids')))
+
+    @classmethod
+    def from_recipes(cls, recipes):
+        """Encode a list of recipe dicts"""
+        ingredients = [ing for r in recipes for ing in r['ingredients']]
+        offsets = np.zeros(len(recipes) + 1, dtype=np.int64)
+        np.cumsum([len(r['ingredients']) for r in recipes], out=offsets[1:])
+        names = list(map(itemgetter('ingredient'), ingredients))
+        units = list(map(itemgetter('unit'), ingredients))
+        try:
+            ids = list(map(ga.kb.ingredient_ids.__getitem__, names))
+        except KeyError:
+            ids = [ga.get_ingredient_id(name) for name in names]  # registers unseen ones
+        try:
+            unit_ids = list(map(ga.kb.unit_ids.__getitem__, units))
+        except KeyError:
+            unit_ids = [get_unit_id(unit) for unit in units]
+        return cls(
+            [r.get('name', '') for r in recipes],
+            offsets,
+            np.array(ids, dtype=np.int64),
+            np.fromiter(map(itemgetter('amount'), ingredients), dtype=np.float64, count=len(ingredients)),
+            np.fromiter(map(itemgetter('rating'), ingredients), dtype=np.float64, count=len(ingredients)),
+            np.array(unit_ids, dtype=np.int64),
+        )
+
+    def to_recipes(self):
+        """Decode back to recipe dicts"""
+        ingredient_names, unit_names = ga.kb.ingredient_names, ga.kb.unit_names
+        entries = [
+            {'ingredient': ingredient_names[ing], 'amount': amount, 'unit': unit_names[unit], 'rating': rating}
+            for ing, amount, unit, rating in zip(self.ingredient_ids.tolist(), self.amounts.tolist(),
+                                                 self.unit_ids.tolist(), self.ratings.tolist())
+        ]
+        bounds = self.offsets.tolist()
+        return [{'name': name, 'ingredients': entries[bounds[i]:bounds[i + 1]]}
+                for i, name in enumerate(self.names)]
+
+    def counts_matrix(self, vocabulary_size=None):
+        """
+        Dense (recipes x vocabulary) uint16 occurrence counts; ingredient IDs
+        at or beyond vocabulary_size (default: the whole vocabulary) are left out.
+        """
+        if vocabulary_size is None:
+            vocabulary_size = len(ga.INGREDIENT_NAMES)
+        keep = self.ingredient_ids < vocabulary_size
+        flat = self.recipe_index[keep] * vocabulary_size + self.ingredient_ids[keep]
+        counts = np.bincount(flat, minlength=len(self) * vocabulary_size)
+        return counts.astype(np.uint16).reshape(len(self), vocabulary_size)
+
+    def fitness(self):
+        return calculate_fitness(self)
+
+
+def category_totals(pop):
+    """
+    Per-recipe category amount totals and ingredient counts (rows x categories).
+    Each recipe's amounts are summed in the order of its ingredient list, as
+    ga.calculate_balance_score sums them, so a recipe's totals do not depend
+    on which other recipes share the batch.
+    """
+    num_categories = len(ga.CATEGORY_NAMES)
+    category_ids = np.asarray(ga.INGREDIENT_CATEGORY_IDS, dtype=np.int64)[pop.ingredient_ids]
+    keys = pop.recipe_index * num_categories + category_ids
+    size = len(pop) * num_categories
+    amounts = np.bincount(keys, weights=pop.amounts, minlength=size).reshape(len(pop), num_categories)
+    counts = np.bincount(keys, minlength=size).reshape(len(pop), num_categories)
+    return amounts, counts
+
+def calculate_diversity(num_ingredients):
+    """Vectorized diversity bonus of ga.calculate_fitness"""
+    return np.select(
+        [(num_ingredients >= 8) & (num_ingredients <= 12), num_ingredients < 5, num_ingredients > 15],
+        [1.2, 0.7, 0.8],
+        default=1.0,
+    )
+
+def fitness_components(pop):
+    """
+    Compute every term of ga.calculate_fitness for the whole population.
+    Returns a dict of 1-D arrays: validity, rating, balance, diversity and complexity.
+    """
+    cat_amounts, cat_counts = category_totals(pop)
+    present = cat_counts > 0
+    num_ingredients = pop.lengths
+    safe_num = np.maximum(num_ingredients, 1)
+
+    required = [ga.CATEGORY_IDS[cat] for cat in ga.REQUIRED_CATEGORIES]
+    validity = present[:, required].all(axis=1) & (num_ingredients > 0)
+
+    rating = np.bincount(pop.recipe_index, weights=pop.ratings, minlength=len(pop)) / safe_num
+
+    balance = np.ones(len(pop))
+    for cat, ideal in ga.IDEAL_RATIOS.items():
+        actual = cat_amounts[:, ga.CATEGORY_IDS[cat]]
+        ratio = np.minimum(actual, ideal) / np.maximum(actual, ideal)
+        balance *= np.where(present[:, ga.CATEGORY_IDS[cat]], 0.5 + 0.5 * ratio, 0.5)
+
+    diversity = calculate_diversity(num_ingredients)
+    complexity = present.sum(axis=1) / safe_num
+
+    return {
+        'validity': validity,
+        'rating': rating,
+        'balance': balance,
+        'diversity': diversity,
+        'complexity': complexity,
+    }
+
+def calculate_fitness(pop):
+    """Batch version of ga.calculate_fitness, returns a fitness array"""
+    c = fitness_components(pop)
+    fitness = c['rating'] * c['balance'] * c['diversity'] * c['complexity'] * 10
+    return np.where(c['validity'], fitness, 0.0)
+
+
+def pack_recipes(recipes):
+    """
+    Serialize recipe dicts (with their fitness, if set) to compact bytes.
+    Layout: uint32 header length, JSON header with names and local string
+    tables, then little-endian columns for lengths, fitness, ingredient
+    indices, unit indices, amounts and ratings.
+    """
+    ingredient_table = {}
+    unit_table = {}
+    lengths, fitness, ids, units, amounts, ratings = [], [], [], [], [], []
+    for r in recipes:
+        lengths.append(len(r['ingredients']))
+        fitness.append(r.get('fitness', np.nan))
+        for ing in r['ingredients']:
+            ids.append(ingredient_table.setdefault(ing['ingredient'], len(ingredient_table)))
+            units.append(unit_table.setdefault(ing['unit'], len(unit_table)))
+            amounts.append(ing['amount'])
+            ratings.append(ing['rating'])
+
+    header = json.dumps({
+        'names': [r.get('name', '') for r in recipes],
+        'ingredients': list(ingredient_table),
+        'units': list(unit_table),
+    }).encode('utf-8')
+    columns = [
+        np.asarray(lengths, dtype='<u4'),
+        np.asarray(fitness, dtype='<f8'),
+        np.asarray(ids, dtype='<u4'),
+        np.asarray(units, dtype='<u2'),
+        np.asarray(amounts, dtype='<f8'),
+        np.asarray(ratings, dtype='<f8'),
+    ]
+    return struct.pack('<I', len(header)) + header + b''.join(c.tobytes() for c in columns)
+
+def unpack_recipes(data):
+    """Inverse of pack_recipes"""
+    (header_size,) = struct.unpack_from('<I', data)
+    header = json.loads(data[4:4 + header_size].decode('utf-8'))
+    offset = 4 + header_size
+
+    def column(dtype, count):
+        nonlocal offset
+        values = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += values.nbytes
+        return values
+
+    n = len(header['names'])
+    lengths = column('<u4', n)
+    fitness = column('<f8', n)
+    m = int(lengths.sum())
+    ids = column('<u4', m).tolist()
+    units = column('<u2', m).tolist()
+    amounts = column('<f8', m).tolist()
+    ratings = column('<f8', m).tolist()
+
+    recipes = []
+    pos = 0
+    for name, length, fit in zip(header['names'], lengths.tolist(), fitness.tolist()):
+        recipe = {
+            'name': name,
+            'ingredients': [
+                {
+                    'ingredient': header['ingredients'][ids[k]],
+                    'amount': amounts[k],
+                    'unit': header['units'][units[k]],
+                    'rating': ratings[k],
+                }
+                for k in range(pos, pos + length)
+            ],
+        }
+        if fit == fit:  # not NaN
+            recipe['fitness'] = fit
+        recipes.append(recipe)
+        pos += length
+    return recipes
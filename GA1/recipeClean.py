@@ -1,21 +1,16 @@
 import csv
 import json
+import os
 from collections import defaultdict
+import knowledge_base
 
-def transform_csv_to_json(csv_file_path, output_json_path):
-    recipes_dict = defaultdict(lambda: {
-        'name': '',
-        'ingredients': []
-    })
-    
+def read_csv_rows(csv_file_path):
+    """Stream (recipe_name, ingredient, amount, unit, rating) rows from the cleaned CSV"""
     with open(csv_file_path, 'r', encoding='iso-8859-1') as csvfile:
         reader = csv.DictReader(csvfile)
         
         for row in reader:
             recipe_name = row['Recipe_Index'].strip()
-
-            if not recipes_dict[recipe_name]['name']:
-                recipes_dict[recipe_name]['name'] = recipe_name
             
             # Convert amount to float
             try:
@@ -29,25 +24,19 @@ def transform_csv_to_json(csv_file_path, output_json_path):
             except ValueError:
                 rating = 0.5
 
-            ingredient_data = {
-                'ingredient': row['Ingredient'].strip().lower() if row['Ingredient'] else "",
-                'amount': amount,
-                'unit': row['Unit'].strip() if row['Unit'] else "",
-                'rating': rating
-            }
-            
-            recipes_dict[recipe_name]['ingredients'].append(ingredient_data)
+            ingredient = row['Ingredient'].strip().lower() if row['Ingredient'] else ""
+            unit = row['Unit'].strip() if row['Unit'] else ""
+            yield recipe_name, ingredient, amount, unit, rating
 
-    recipes_list = [recipe_data for recipe_data in recipes_dict.values()]
-    
-    output_data = {
-        'recipes': recipes_list
-    }
-    
+def write_recipes_json(recipes, output_json_path, categories=None):
+    """Write recipes (any iterable of recipe dicts) in the recipes_output.json layout, one recipe at a time"""
+    count = 0
     with open(output_json_path, 'w', encoding='utf-8') as jsonfile:
         jsonfile.write('{\n  "recipes": [\n')
         
-        for i, recipe in enumerate(recipes_list):
+        for i, recipe in enumerate(recipes):
+            if i:
+                jsonfile.write(',\n')
             jsonfile.write('    {\n')
             jsonfile.write(f'      "name": "{recipe["name"]}",\n')
             jsonfile.write('      "ingredients": [\n')
@@ -56,26 +45,90 @@ def transform_csv_to_json(csv_file_path, output_json_path):
                 comma = ',' if j < len(recipe['ingredients']) - 1 else ''
                 jsonfile.write(f'        {{ "ingredient": "{ing["ingredient"]}",  "amount": {ing["amount"]},  "unit": "{ing["unit"]}",  "rating": {ing["rating"]} }}{comma}\n')
             
-            recipe_comma = ',' if i < len(recipes_list) - 1 else ''
             jsonfile.write(f'      ]\n')
-            jsonfile.write(f'    }}{recipe_comma}\n')
+            jsonfile.write(f'    }}')
+            count += 1
         
+        if count:
+            jsonfile.write('\n')
+        if categories:
+            jsonfile.write('  ],\n  "categories":\n  [\n    {\n')
+            for k, (cat, items) in enumerate(categories.items()):
+                jsonfile.write(f'      "{cat}": [\n')
+                for j, item in enumerate(items):
+                    comma = ',' if j < len(items) - 1 else ''
+                    jsonfile.write(f'        "{item}"{comma}\n')
+                cat_comma = ',' if k < len(categories) - 1 else ''
+                jsonfile.write(f'      ]{cat_comma}\n')
+            jsonfile.write('    }\n')
         jsonfile.write('  ]\n')
         jsonfile.write('}\n')
+    return count
+
+def transform_csv_to_json(csv_file_path, output_json_path, categories=None):
+    recipes_dict = defaultdict(lambda: {
+        'name': '',
+        'ingredients': []
+    })
+    
+    for recipe_name, ingredient, amount, unit, rating in read_csv_rows(csv_file_path):
+        if not recipes_dict[recipe_name]['name']:
+            recipes_dict[recipe_name]['name'] = recipe_name
+        
+        ingredient_data = {
+            'ingredient': ingredient,
+            'amount': amount,
+            'unit': unit,
+            'rating': rating
+        }
+        
+        recipes_dict[recipe_name]['ingredients'].append(ingredient_data)
+
+    recipes_list = [recipe_data for recipe_data in recipes_dict.values()]
+    
+    output_data = {
+        'recipes': recipes_list
+    }
+    
+    write_recipes_json(recipes_list, output_json_path, categories)
     
     print(f"Successfully transformed {len(recipes_list)} recipes")
     print(f"Output saved to: {output_json_path}")
     
     return output_data
 
+def transform_csv_to_kb(csv_file_path, output_kb_path, categories=None):
+    """
+    Convert the CSV to a binary knowledge base without holding it in memory:
+    rows are streamed from the CSV straight into knowledge_base.write_kb.
+    Returns the memory-mapped RecipeTable.
+    """
+    recipes = knowledge_base.write_kb(output_kb_path, read_csv_rows(csv_file_path), categories)
+    
+    print(f"Successfully transformed {len(recipes)} recipes ({recipes.num_rows} ingredient rows)")
+    print(f"Output saved to: {output_kb_path}")
+    
+    return recipes
+
 
 if __name__ == "__main__":
 
     csv_file = "2_Scaled_Units_Cleaned.csv"
     output_file = "recipes_output.json"
+    kb_file = "recipes_output.kb"
+    
+    # The ingredient categories are curated by hand in the JSON file, keep them
+    categories = {}
+    if os.path.exists(output_file):
+        with open(output_file, 'r') as f:
+            existing = json.load(f).get('categories')
+        categories = existing[0] if existing else {}
     
-    result = transform_csv_to_json(csv_file, output_file)
+    recipes = transform_csv_to_kb(csv_file, kb_file, categories)
+    # The JSON copy is written from the knowledge base, one recipe at a time
+    write_recipes_json(recipes, output_file, categories)
+    print(f"Output saved to: {output_file}")
     
-    if result['recipes']:
+    if len(recipes):
         print("\nSample - First recipe:")
-        print(json.dumps(result['recipes'][0], indent=2))
\ No newline at end of file
+        print(json.dumps(recipes[0], indent=2))
@@ -0,0 +1,137 @@
+"""
+Parent and survivor selection on fitness arrays.
+
+Every scheme draws all the parents of a generation at once and returns a
+(count, 2) array of indices into the fitness array. rng is a
+numpy.random.Generator; rng_for() derives one from a string key so runs stay
+reproducible from the run seed.
+
+    tournament   best of tournament_size distinct individuals drawn uniformly
+    truncation   uniform among the best fraction of the population
+    rank         linear ranking: selection pressure from 1 (uniform) to 2
+    sus          stochastic universal sampling, proportional to fitness
+"""
+import hashlib
+import numpy as np
+
+def rng_for(key):
+    """numpy Generator seeded from a string key"""
+    digest = hashlib.sha256(str(key).encode('utf-8')).digest()
+    return np.random.default_rng(int.from_bytes(digest[:8], 'little'))
+
+def fitness_array(population):
+    """Fitness of each recipe dict as a float64 array"""
+    return np.fromiter((r['fitness'] for r in population), dtype=np.float64, count=len(population))
+
+def top(fitness, k):
+    """
+    Indices of the k fittest, best first, by partial selection: O(n + k log k).
+    Ties are broken by lower index, as a stable sort would.
+    """
+    n = len(fitness)
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-fitness, k - 1)[:k]
+        # Equal fitness at the cut: keep the lowest indices
+        threshold = fitness[candidates].min()
+        above = np.flatnonzero(fitness > threshold)
+        tied = np.flatnonzero(fitness == threshold)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -fitness[candidates]))
+    return candidates[order]
+
+def bottom(fitness, k):
+    """Indices of the k least fit, worst first (ties: higher index first)"""
+    n = len(fitness)
+    return (n - 1 - top(-fitness[::-1], k)).astype(np.int64)
+
+def _distinct_draws(n, shape, k, rng, chunk_keys=1 << 20):
+    """
+    Array of shape + (k,) indices below n, each row k distinct uniform draws
+    as random.sample makes them. Small tournaments draw with replacement and
+    redraw the rows that repeat an index; large ones take the k smallest of
+    n random keys per row, drawn chunk_keys keys at a time so memory does
+    not grow with rows * n.
+    """
+    if k > n:
+        raise ValueError(f"Tournament of {k} from a population of {n}")
+    rows = int(np.prod(shape))
+    if k * k > n:
+        draws = np.empty((rows, k), dtype=np.int64)
+        chunk = max(1, chunk_keys // n)
+        for start in range(0, rows, chunk):
+            keys = rng.random((min(chunk, rows - start), n))
+            picked = np.argpartition(keys, k - 1, axis=1)[:, :k] if k < n else np.argsort(keys, axis=1)
+            # argpartition leaves the k in no particular order: shuffle them
+            order = np.argsort(np.take_along_axis(keys, picked, axis=1), axis=1)
+            draws[start:start + len(keys)] = np.take_along_axis(picked, order, axis=1)
+        return draws.reshape(*shape, k)
+    draws = rng.integers(0, n, size=(rows, k))
+    while True:
+        ordered = np.sort(draws, axis=1)
+        repeated = np.flatnonzero((ordered[:, 1:] == ordered[:, :-1]).any(axis=1))
+        if not len(repeated):
+            return draws.reshape(*shape, k)
+        draws[repeated] = rng.integers(0, n, size=(len(repeated), k))
+
+def tournament(fitness, count, rng, tournament_size=10):
+    """Each parent is the fittest of tournament_size distinct individuals"""
+    entrants = _distinct_draws(len(fitness), (count, 2), tournament_size, rng)
+    winners = fitness[entrants].argmax(axis=2)
+    return np.take_along_axis(entrants, winners[..., None], axis=2)[..., 0]
+
+def truncation(fitness, count, rng, fraction=0.5):
+    """Parents drawn uniformly from the best fraction of the population"""
+    pool = top(fitness, max(1, int(round(len(fitness) * fraction))))
+    return pool[rng.integers(0, len(pool), size=(count, 2))]
+
+def rank(fitness, count, rng, pressure=1.5):
+    """
+    Linear ranking: the best individual is pressure times as likely to be
+    drawn as the average one, the worst 2 - pressure times.
+    """
+    n = len(fitness)
+    if n == 1:
+        return np.zeros((count, 2), dtype=np.int64)
+    order = np.lexsort((np.arange(n), fitness))  # worst first
+    ranks = np.empty(n)
+    ranks[order] = np.arange(n)
+    p = (2 - pressure + 2 * (pressure - 1) * ranks / (n - 1)) / n
+    return rng.choice(n, size=(count, 2), p=p / p.sum())
+
+def sus(fitness, count, rng):
+    """
+    Stochastic universal sampling: 2 * count equally spaced pointers over
+    the cumulative fitness, one random offset, then shuffled into pairs.
+    Falls back to uniform weights if no fitness is positive.
+    """
+    weights = np.clip(fitness, 0, None)
+    total = weights.sum()
+    if total <= 0:
+        weights = np.ones(len(fitness))
+        total = len(fitness)
+    draws = 2 * count
+    step = total / draws
+    pointers = rng.uniform(0, step) + step * np.arange(draws)
+    chosen = np.searchsorted(np.cumsum(weights), pointers, side='right')
+    chosen = np.minimum(chosen, len(fitness) - 1)
+    return rng.permutation(chosen).reshape(count, 2)
+
+SCHEMES = {
+    'tournament': tournament,
+    'truncation': truncation,
+    'rank': rank,
+    'sus': sus,
+}
+
+def select_pairs(fitness, count, rng, scheme='tournament', **params):
+    """(count, 2) parent indices drawn with the named scheme"""
+    try:
+        select = SCHEMES[scheme]
+    except KeyError:
+        raise ValueError(f"Unknown selection scheme: {scheme}") from None
+    return select(np.asarray(fitness, dtype=np.float64), count, rng, **params)
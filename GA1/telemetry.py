@@ -0,0 +1,100 @@
+"""
+Run telemetry: one JSON record per event, streamed to a JSONL file and/or
+passed to a callback.
+
+generator.evolve emits
+    {'event': 'start', 'population_size', 'generations', 'workers', 'seed'
+     [, 'resumed_from' or 'warm_start']}
+    {'event': 'generation', 'gen', 'best', 'avg', 'worst', 'time', 'stages',
+     'diversity', 'mutation_rate', 'cache'[, 'avg_creativity']}   once per generation
+    {'event': 'end', 'generations', 'time', 'cache', 'stop_reason'}
+where 'stages' holds the seconds spent in selection, crossover, mutation,
+normalise, fitness and sorting. Breeding stages run in pool workers are
+summed over workers, so with workers > 1 they can exceed 'time'.
+'cache' is fitness_cache.stats(), or None when incremental fitness scoring
+bypasses the cache.
+"""
+import json
+import numpy as np
+
+class Telemetry:
+    """
+    Sink for run records. path is a JSONL file (truncated unless append is
+    set) and callback any callable taking the record dict; either may be None.
+    truncate_at continues an existing log from a position returned by tell(),
+    dropping whatever was written after it.
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, path=None, callback=None, append=False, truncate_at=None):
+        self.path = path
+        self.callback = callback
+        self._file = None
+        if path and truncate_at is not None:
+            self._file = open(path, 'r+', encoding='utf-8')
+            self._file.seek(truncate_at)
+            self._file.truncate()
+        elif path:
+            self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def record(self, event, **fields):
+        """Emit one record; returns it"""
+        record = {'event': event, **fields}
+        if self._file is not None:
+            self._file.write(json.dumps(record) + '\n')
+        if self.callback is not None:
+            self.callback(record)
+        return record
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def tell(self):
+        """Current length of the log file (None without one), after flushing"""
+        if self._file is None:
+            return None
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_log(path, event=None):
+    """Records of a JSONL log, optionally only those of one event type"""
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if event is None or record.get('event') == event:
+                    records.append(record)
+    return records
+
+def population_diversity(population, fitness=None):
+    """
+    Cheap diversity measures of a population of recipe dicts:
+    share of distinct recipes, number of distinct ingredients in use and
+    the standard deviation of fitness (fitness is the population's fitness
+    array, if already known).
+    Recipes are told apart by their ingredients with amounts and units,
+    in any order.
+    """
+    n = len(population)
+    if n == 0:
+        return {'unique_recipes': 0.0, 'distinct_ingredients': 0, 'fitness_std': 0.0}
+    unique = len({frozenset((ing['ingredient'], ing['amount'], ing['unit']) for ing in r['ingredients'])
+                  for r in population})
+    ingredients = {ing['ingredient'] for r in population for ing in r['ingredients']}
+    if fitness is None:
+        fitness = [r.get('fitness', 0.0) for r in population]
+    std = float(np.std(fitness))
+    return {'unique_recipes': unique / n, 'distinct_ingredients': len(ingredients), 'fitness_std': std}
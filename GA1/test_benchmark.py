@@ -0,0 +1,46 @@
+import csv
+import json
+import os
+import benchmark
+import ga
+import knowledge_base
+
+def tiny_csv(path, recipes=12):
+    """The first recipes of the bundled corpus"""
+    with open(benchmark.SOURCE_CSV, 'r', encoding='iso-8859-1') as f:
+        rows = list(csv.DictReader(f))
+    keep = list(dict.fromkeys(row['Recipe_Index'] for row in rows))[:recipes]
+    with open(path, 'w', encoding='iso-8859-1', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=benchmark.CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows({field: row[field] for field in benchmark.CSV_FIELDS}
+                         for row in rows if row['Recipe_Index'] in keep)
+    return path
+
+def test_benchmark_smoke_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, 'SOURCE_CSV', tiny_csv(str(tmp_path / 'tiny.csv')))
+    original, original_env = ga.kb, os.environ.get(knowledge_base.PATH_ENV)
+    output = tmp_path / 'bench.json'
+    benchmark.main(['--scales', '1', '2', '--population-sizes', '10', '--generations', '2', '--stage-size', '20',
+                    '--repeat', '1', '--data-dir', str(tmp_path / 'data'), '--output', str(output)])
+    # The knowledge base in use is put back
+    assert ga.kb is original
+    assert os.environ.get(knowledge_base.PATH_ENV) == original_env
+
+    report = json.loads(output.read_text())
+    assert report['config']['scales'] == [1, 2]
+    assert set(report['environment']) >= {'timestamp', 'python', 'numpy', 'cpu_count'}
+    small, doubled = report['corpora']
+    assert (small['scale'], small['recipes']) == (1, 12)
+    assert (doubled['scale'], doubled['recipes']) == (2, 24)
+    for corpus in report['corpora']:
+        stages = corpus['stages']
+        for name in ('fitness_batch', 'fitness_encoded', 'fitness_scalar', 'fitness_incremental', 'elites',
+                     'crossover', 'mutation', 'normalise', 'creativity_batch'):
+            assert stages[name]['count'] == 20
+        assert {f'selection_{scheme}' for scheme in benchmark.selection.SCHEMES} <= set(stages)
+        assert stages['profile']['corpus_recipes'] == corpus['recipes']
+        [run] = corpus['evolve']
+        assert (run['population_size'], run['generations'], run['workers']) == (10, 2, 1)
+        assert run['generations_per_second'] > 0
+    assert sorted(os.listdir(tmp_path / 'data')) == ['corpus_x1.kb', 'corpus_x2.csv', 'corpus_x2.kb']
@@ -0,0 +1,96 @@
+import contextlib
+import io
+import pytest
+import generator
+from controller import RunController
+
+def test_target_fitness():
+    controller = RunController(target_fitness=5.0)
+    controller.start(100, 0.0)
+    assert controller.update(0, 4.9, 3.0, 200, 1.0) is None
+    assert controller.update(1, 5.0, 3.0, 300, 2.0) == 'target_fitness'
+
+def test_stagnation():
+    controller = RunController(stagnation_window=3, tolerance=0.1)
+    controller.start(100, 0.0)
+    history = [(4.0, 2.0), (4.05, 2.05), (4.0, 2.0), (4.5, 2.0), (4.55, 2.0), (4.6, 2.1), (4.6, 2.1)]
+    reasons = [controller.update(gen, best, avg, 100 * (gen + 2), gen + 1.0)
+               for gen, (best, avg) in enumerate(history)]
+    # Improvements over tolerance at generations 0 and 3 only
+    assert reasons == [None] * 6 + ['stagnation']
+    assert controller.last_improvement == 3
+
+def test_evaluation_budget():
+    controller = RunController(max_evaluations=450)
+    assert controller.start(100, 0.0) is None
+    assert controller.update(0, 1.0, 1.0, 200, 1.0) is None
+    assert controller.update(1, 1.0, 1.0, 300, 2.0) is None
+    # 400 so far, and the next generation evaluates another 100
+    assert controller.update(2, 1.0, 1.0, 400, 3.0) == 'evaluation_budget'
+
+def test_evaluation_budget_before_the_first_generation():
+    assert RunController(max_evaluations=150).start(100, 0.0) == 'evaluation_budget'
+    assert RunController(max_evaluations=200).start(100, 0.0) is None
+    assert RunController().start(100, 0.0) is None
+
+def test_time_budget():
+    controller = RunController(time_budget=10.0)
+    controller.start(100, 1.0)
+    assert controller.update(0, 1.0, 1.0, 200, 3.0) is None
+    assert controller.update(1, 1.0, 1.0, 300, 6.0) is None
+    # 9 seconds so far, and the last generation took 3
+    assert controller.update(2, 1.0, 1.0, 400, 9.0) == 'time_budget'
+
+def test_stop_reasons_are_checked_in_order():
+    controller = RunController(time_budget=1.0, max_evaluations=100, target_fitness=1.0, stagnation_window=0)
+    controller.start(10, 0.0)
+    assert controller.update(0, 2.0, 1.0, 200, 2.0) == 'target_fitness'
+    controller.target_fitness = None
+    assert controller.update(1, 2.0, 1.0, 300, 3.0) == 'stagnation'
+    controller.stagnation_window = None
+    assert controller.update(2, 2.0, 1.0, 400, 4.0) == 'evaluation_budget'
+    controller.max_evaluations = None
+    assert controller.update(3, 2.0, 1.0, 500, 5.0) == 'time_budget'
+
+def test_mutation_rate_follows_diversity():
+    controller = RunController(mutation_rate=0.4, diversity_threshold=0.5, mutation_boost=2.0,
+                               max_mutation_rate=1.0)
+    assert controller.needs_diversity
+    controller.start(100, 0.0)
+    rates = []
+    for gen, unique in enumerate([0.3, 0.3, 0.3, 0.9, 0.9, 0.9]):
+        controller.update(gen, 1.0, 1.0, 100 * (gen + 2), gen + 1.0, {'unique_recipes': unique})
+        rates.append(controller.mutation_rate)
+    # Boosted up to the maximum, then back down to the base rate
+    assert rates == [0.8, 1.0, 1.0, 0.5, 0.4, 0.4]
+    # Without diversity figures the rate stays
+    controller.update(6, 1.0, 1.0, 800, 7.0)
+    assert controller.mutation_rate == 0.4
+    assert RunController(mutation_rate=0.4).needs_diversity is False
+
+def test_state_round_trip():
+    controller = RunController(stagnation_window=5, diversity_threshold=0.5)
+    controller.start(100, 0.5)
+    controller.update(0, 3.0, 2.0, 200, 1.5, {'unique_recipes': 0.1})
+    resumed = RunController(stagnation_window=5, diversity_threshold=0.5)
+    resumed.load_state(controller.state())
+    assert resumed.state() == controller.state()
+
+def run(controller, population_size=40, generations=30):
+    generator.fitness_cache.clear()
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        _, max_fitnesses, _ = generator.evolve(population_size, generations, seed=3, controller=controller)
+    return max_fitnesses, out.getvalue()
+
+@pytest.mark.parametrize('budget, expected', [(79, 0), (80, 1), (200, 4), (10_000, 30)])
+def test_evolve_stays_within_the_evaluation_budget(budget, expected):
+    max_fitnesses, out = run(RunController(max_evaluations=budget))
+    assert len(max_fitnesses) == expected
+    assert 40 * (expected + 1) <= budget
+    reason = 'generations' if expected == 30 else 'evaluation_budget'
+    assert f"Stopped after {expected} generations: {reason}" in out
+
+def test_evolve_stops_at_target_fitness():
+    max_fitnesses, out = run(RunController(target_fitness=0.0))
+    assert len(max_fitnesses) == 1
+    assert "Stopped after 1 generations: target_fitness" in out
@@ -0,0 +1,67 @@
+import contextlib
+import copy
+import io
+import pytest
+import creativity_evaluation
+import ga
+import generator
+import knowledge_base
+
+@pytest.fixture(scope='module')
+def corpus():
+    return knowledge_base.load_recipes(ga.kb.path)
+
+@pytest.fixture(scope='module')
+def recipes(corpus):
+    with contextlib.redirect_stdout(io.StringIO()):
+        evolved, _, _ = generator.evolve(60, 4, seed=11)
+    # Corpus recipes score similarity 1; a repeated ingredient pairs with itself
+    doubled = copy.deepcopy(corpus[3])
+    doubled['ingredients'].append(dict(doubled['ingredients'][0]))
+    unknown = {'name': 'unknown',
+               'ingredients': [{'ingredient': 'moon dust', 'amount': 1.0, 'unit': 'cup', 'rating': 0.5}]}
+    return evolved + copy.deepcopy(corpus[:5]) + [doubled, unknown]
+
+def test_batch_matches_scalar(corpus, recipes):
+    profile = creativity_evaluation.CorpusProfile(corpus)
+    batch = creativity_evaluation.evaluate_creativity_batch(recipes, profile, chunk_bytes=1 << 12)
+    for i, recipe in enumerate(recipes):
+        # A plain corpus list takes the full-scan path
+        scalar = creativity_evaluation.evaluate_creativity(recipe, corpus)
+        for key in ('creativity', 'novelty', 'value', 'typicality'):
+            assert batch[key][i] == pytest.approx(scalar[key]), (recipe['name'], key)
+        for key, value in scalar['components'].items():
+            assert batch[key][i] == pytest.approx(value), (recipe['name'], key)
+        similarity, nearest = creativity_evaluation.find_nearest_recipe(recipe, corpus)
+        assert batch['ingredient_novelty'][i] == pytest.approx(1 - similarity)
+        assert batch['nearest_recipe'][i] == nearest
+    assert batch['nearest_recipe'][-1] is None
+    assert (batch['ingredient_novelty'][60:65] == 0).all()
+
+def test_report_scores_more_than_forty(corpus, recipes):
+    population = generator.sort_population(recipes[:60])
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        generator.run_report(population, creativity_evaluation.CorpusProfile(corpus), top=len(population))
+    assert f"Recipe {len(population)}: " in out.getvalue()
+
+def test_exact_index_matches_full_scan(corpus, recipes):
+    index = creativity_evaluation.NoveltyIndex(corpus)
+    assert len(index) == len(corpus)
+    for recipe in recipes:
+        assert index.nearest(recipe) == creativity_evaluation.find_nearest_recipe(recipe, corpus)
+
+def test_minhash_index_finds_the_nearest_recipe(corpus):
+    small = corpus[:40]
+    index = creativity_evaluation.NoveltyIndex(small, mode='minhash')
+    # The recipes themselves, and each with one ingredient dropped
+    queries = list(small)
+    for recipe in small:
+        trimmed = copy.deepcopy(recipe)
+        del trimmed['ingredients'][len(trimmed['ingredients']) // 2]
+        queries.append(trimmed)
+    for query in queries:
+        similarity, nearest = index.nearest(query)
+        assert (similarity, nearest) == creativity_evaluation.find_nearest_recipe(query, small)
+    with pytest.raises(ValueError):
+        creativity_evaluation.NoveltyIndex(small, mode='kdtree')
@@ -0,0 +1,73 @@
+import copy
+import pytest
+import ga
+import knowledge_base
+from fitness_cache import LRUCache, cached_fitness, cached_scores, recipe_fingerprint
+
+@pytest.fixture(scope='module')
+def corpus():
+    return knowledge_base.load_recipes(ga.kb.path)
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=3)
+    for key in 'abc':
+        cache.put(key, key.upper())
+    assert cache.get('a') == 'A'  # now the most recent
+    cache.put('d', 'D')
+    assert 'b' not in cache
+    assert [key for key in 'abcd' if key in cache] == ['a', 'c', 'd']
+    cache.put('c', 'C2')  # an update refreshes too
+    cache.put('e', 'E')
+    assert 'a' not in cache and cache.get('c') == 'C2'
+    assert len(cache) == 3
+
+def test_lru_counts_hits_and_misses():
+    cache = LRUCache(maxsize=2)
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 2, 'hit_rate': 0.0}
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    assert cache.get('b', 'default') == 'default'
+    assert cache.get('a') == 1
+    assert 'b' not in cache  # membership is not a lookup
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'size': 1, 'maxsize': 2, 'hit_rate': 2 / 3}
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 2, 'hit_rate': 0.0}
+
+def test_equal_recipes_share_a_key(corpus):
+    recipe = corpus[0]
+    twin = copy.deepcopy(recipe)
+    twin['name'], twin['fitness'] = 'twin', 1.0
+    assert recipe_fingerprint(twin) == recipe_fingerprint(recipe)
+    # Any change to an ingredient entry, or to their order, is another recipe
+    changed = copy.deepcopy(recipe)
+    changed['ingredients'][0]['amount'] += 0.5
+    assert recipe_fingerprint(changed) != recipe_fingerprint(recipe)
+    reordered = copy.deepcopy(recipe)
+    reordered['ingredients'].reverse()
+    assert recipe_fingerprint(reordered) != recipe_fingerprint(recipe)
+
+def test_cached_scores_computes_only_misses(corpus):
+    cache = LRUCache()
+    batches = []
+    def score_batch(recipes):
+        batches.append([r['name'] for r in recipes])
+        return [len(r['ingredients']) for r in recipes]
+
+    first = cached_scores(corpus[:4], cache, score_batch)
+    assert first == [float(len(r['ingredients'])) for r in corpus[:4]]
+    twins = [dict(copy.deepcopy(r), name=f"twin {i}") for i, r in enumerate(corpus[:2])]
+    assert cached_scores(twins + corpus[4:6], cache, score_batch) == first[:2] + [
+        float(len(r['ingredients'])) for r in corpus[4:6]]
+    assert batches == [[r['name'] for r in corpus[:4]], [r['name'] for r in corpus[4:6]]]
+    assert (cache.hits, cache.misses) == (2, 6)
+    assert cached_scores(corpus[:6], cache, score_batch) == first + [
+        float(len(r['ingredients'])) for r in corpus[4:6]]
+    assert len(batches) == 2
+
+def test_cached_fitness_matches_calculate_fitness(corpus):
+    cache = LRUCache()
+    recipes = list(corpus[:20])
+    expected = [ga.calculate_fitness(r) for r in recipes]
+    assert cached_fitness(recipes, cache) == pytest.approx(expected)
+    assert cached_fitness(recipes, cache) == pytest.approx(expected)
+    assert (cache.hits, cache.misses) == (20, 20)
@@ -0,0 +1,121 @@
+import copy
+import random
+from collections import Counter
+import pytest
+import ga
+import knowledge_base
+
+def baseline_category(categories, ingredient_name):
+    """The original get_category: a scan of the category lists"""
+    for category, items in categories.items():
+        if ingredient_name.lower() in items:
+            return category
+    return 'other'
+
+@pytest.fixture
+def kb(monkeypatch):
+    original = ga.kb
+    monkeypatch.setenv(knowledge_base.PATH_ENV, original.path)
+    kb = ga.use_knowledge_base(knowledge_base.KnowledgeBase(original.path))
+    yield kb
+    ga.use_knowledge_base(original)
+
+def test_category_index_matches_baseline(kb):
+    assert not kb.loaded
+    categories = kb.categories  # the first table read loads them all
+    assert kb.loaded
+    names = {name for items in categories.values() for name in items}
+    names.update(ing['ingredient'] for r in kb.recipes for ing in r['ingredients'])
+    # Case variants of known names, and names in no category
+    variants = {variant for name in names for variant in (name.upper(), name.title(), ' ' + name)}
+    unknown = {'moon dust', 'Moon Dust', '', 'OTHER'}
+    for name in sorted(names | variants | unknown):
+        assert ga.get_category(name) == baseline_category(categories, name), name
+    assert {ga.get_category(name) for name in unknown} == {'other'}
+    assert ga.get_category('BUTTER') == ga.get_category('butter') != 'other'
+
+def test_registered_ingredients_keep_their_category(kb):
+    expected = {name: baseline_category(kb.categories, name) for name in ('Stardust', 'BUTTER', 'Cane Sugar')}
+    for name, category in expected.items():
+        ingredient_id = ga.get_ingredient_id(name)
+        assert kb.ingredient_names[ingredient_id] == name
+        assert ga.get_category(name) == category
+        assert ga.get_category_id(name) == kb.category_ids[category]
+        assert ga.get_ingredient_id(name) == ingredient_id
+
+def pool_entries(kb, pool):
+    return Counter(tuple(kb.recipes.ingredient(row).values()) for row in pool)
+
+def test_pools_hold_the_rows_of_their_category(kb):
+    # The candidate lists mutation used to build from every recipe
+    members, by_category = {cat: Counter() for cat in kb.categories}, {cat: Counter() for cat in kb.categories}
+    for recipe in kb.recipes:
+        for ing in recipe['ingredients']:
+            entry = tuple(ing.values())
+            by_category[ga.get_category(ing['ingredient'])][entry] += 1
+            for cat, items in kb.categories.items():
+                if ing['ingredient'].lower() in items:
+                    members[cat][entry] += 1
+    for cat in kb.categories:
+        assert pool_entries(kb, kb.member_pools[cat]) == members[cat], cat
+        assert pool_entries(kb, kb.category_pools[cat]) == by_category[cat], cat
+
+def test_row_pool_indexing(kb):
+    pool = kb.category_pools['flour']
+    rows = list(pool)
+    assert len(rows) == len(pool) > 0
+    assert pool[-1] == rows[-1] and pool[-len(pool)] == rows[0]
+    for k in (len(pool), -len(pool) - 1):
+        with pytest.raises(IndexError):
+            pool[k]
+    assert len(knowledge_base.RowPool(kb.recipes, [])) == 0
+
+def mutate_all(kb, seed):
+    """Every recipe of the corpus mutated many times with one seeded rng"""
+    rng = random.Random(seed)
+    changes = []
+    for recipe in kb.recipes[:50]:
+        for _ in range(10):
+            mutant = copy.deepcopy(recipe)
+            ga.mutation(mutant, rng=rng)
+            changes.append((recipe, mutant))
+    return changes
+
+def test_mutation_draws_from_the_right_pool(kb):
+    changes = mutate_all(kb, 4)
+    swaps = additions = 0
+    for recipe, mutant in changes:
+        before, after = recipe['ingredients'], mutant['ingredients']
+        if len(after) == len(before) and any(a['ingredient'] != b['ingredient'] for a, b in zip(after, before)):
+            # A swap: a listed member of the replaced ingredient's category, amount kept
+            [(old, new)] = [(b, a) for a, b in zip(after, before) if a != b]
+            cat = ga.get_category(old['ingredient'])
+            assert new['ingredient'].lower() in kb.categories[cat]
+            assert new['amount'] == old['amount']
+            swaps += 1
+        elif len(after) == len(before) + 1 and after[:-1] == before:
+            new = after[-1]
+            cat = ga.get_category(new['ingredient'])
+            if cat != 'addins' or new not in before:
+                # An addition: a recipe row of a category the recipe lacked
+                assert cat not in {ga.get_category(ing['ingredient']) for ing in before}
+                assert pool_entries(kb, kb.category_pools[cat])[tuple(new.values())]
+                additions += 1
+    assert swaps and additions
+    # The same seed draws the same rows
+    assert [mutant for _, mutant in mutate_all(kb, 4)] == [mutant for _, mutant in changes]
+    assert [mutant for _, mutant in mutate_all(kb, 5)] != [mutant for _, mutant in changes]
+
+def test_crossover_takes_each_category_from_one_parent(kb):
+    rng = random.Random(2)
+    recipes = list(kb.recipes[:40])
+    children = [ga.crossover(rng.choice(recipes), rng.choice(recipes), rng=random.Random(i), name=str(i))
+                for i in range(100)]
+    rng = random.Random(2)
+    for i, child in enumerate(children):
+        r1, r2 = rng.choice(recipes), rng.choice(recipes)
+        assert ga.crossover(r1, r2, rng=random.Random(i), name=str(i)) == child
+        for cat in {ga.get_category(ing['ingredient']) for ing in child['ingredients']}:
+            part = [ing for ing in child['ingredients'] if ga.get_category(ing['ingredient']) == cat]
+            assert part in ([ing for ing in r['ingredients'] if ga.get_category(ing['ingredient']) == cat]
+                            for r in (r1, r2))
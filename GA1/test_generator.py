@@ -0,0 +1,102 @@
+import contextlib
+import io
+import json
+import os
+import pytest
+import creativity_evaluation
+import ga
+import generator
+import knowledge_base
+import recipeClean
+from checkpoint import load_checkpoint
+
+def summary(population):
+    return [(r['name'], r['fitness'], r['ingredients']) for r in population]
+
+def run(workers, seed=5, population_size=100, generations=21):
+    """Final population of a seeded evolve run, as comparable tuples, with cold caches"""
+    generator.fitness_cache.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        population, max_fitnesses, _ = generator.evolve(population_size, generations, workers, seed)
+    return summary(population), max_fitnesses
+
+def test_same_population_for_any_worker_count():
+    single, single_best = run(1)
+    pooled, pooled_best = run(4)
+    assert pooled_best == single_best
+    assert pooled == single
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_resumed_run_continues_exactly(tmp_path, monkeypatch, incremental):
+    monkeypatch.setattr(generator, 'incremental_fitness', incremental)
+    straight_path, split_path = tmp_path / 'straight.ck', tmp_path / 'split.ck'
+    generator.fitness_cache.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        straight = generator.evolve(60, 12, seed=7, checkpoint_path=straight_path)
+        generator.evolve(60, 5, seed=7, checkpoint_path=split_path)
+        generator.fitness_cache.clear()
+        resumed = generator.evolve(60, 12, checkpoint_path=split_path, resume=load_checkpoint(split_path))
+    assert summary(resumed[0]) == summary(straight[0])
+    assert resumed[1:] == straight[1:]
+    # Names of new recipes are numbered from the generation, the run's name counter
+    straight_state, resumed_state = load_checkpoint(straight_path), load_checkpoint(split_path)
+    assert resumed_state['generation'] == straight_state['generation'] == 12
+    assert summary(resumed_state['population']) == summary(straight_state['population'])
+
+def test_pool_refuses_knowledge_base_without_file():
+    original = ga.kb
+    try:
+        ga.use_knowledge_base(knowledge_base.KnowledgeBase(recipes=knowledge_base.load_recipes(original.path)))
+        with pytest.raises(ValueError):
+            run(2)
+    finally:
+        ga.use_knowledge_base(original)
+
+def test_profile_cache_keeps_passed_recipes_apart(tmp_path):
+    path = ga.kb.path
+    recipes = knowledge_base.load_recipes(path)
+    subset = creativity_evaluation.load_profile(path, recipes=recipes[:5], cache_dir=tmp_path)
+    full = creativity_evaluation.load_profile(path, cache_dir=tmp_path)
+    assert len(subset) == 5
+    assert len(full) == len(recipes)
+    assert len(creativity_evaluation.load_profile(path, recipes=recipes[:5], cache_dir=tmp_path)) == 5
+
+def test_tables_published_together(monkeypatch):
+    kb = knowledge_base.KnowledgeBase(ga.kb.path)
+    seen = []
+    row_pool = knowledge_base.RowPool
+    def spy(*args):
+        # Built late in loading; no table may be visible yet
+        seen.append(set(kb.__dict__) & knowledge_base.KnowledgeBase._TABLES)
+        return row_pool(*args)
+    monkeypatch.setattr(knowledge_base, 'RowPool', spy)
+    kb.load()
+    assert seen and not any(seen)
+    assert knowledge_base.KnowledgeBase._TABLES <= set(kb.__dict__)
+
+def test_kb_file_matches_json(tmp_path, monkeypatch):
+    original = ga.kb
+    monkeypatch.setenv(knowledge_base.PATH_ENV, original.path)
+    with open(os.path.join(knowledge_base.DATA_DIR, 'recipes_output.json')) as f:
+        categories = json.load(f)['categories'][0]
+    csv_path = os.path.join(knowledge_base.DATA_DIR, '2_Scaled_Units_Cleaned.csv')
+    json_path, kb_path = str(tmp_path / 'recipes.json'), str(tmp_path / 'recipes.kb')
+    with contextlib.redirect_stdout(io.StringIO()):
+        recipeClean.transform_csv_to_json(csv_path, json_path, categories)
+        recipeClean.transform_csv_to_kb(csv_path, kb_path, categories)
+
+    from_json, from_kb = knowledge_base.load_recipes(json_path), knowledge_base.load_recipes(kb_path)
+    assert list(from_kb) == list(from_json)
+    assert from_kb.categories == from_json.categories == categories
+    json_kb, kb_kb = knowledge_base.KnowledgeBase(json_path).load(), knowledge_base.KnowledgeBase(kb_path).load()
+    assert kb_kb.ingredient_ids == json_kb.ingredient_ids
+    assert kb_kb.category_index == json_kb.category_index
+
+    try:
+        ga.use_knowledge_base(json_kb)
+        json_run = run(1)
+        ga.use_knowledge_base(kb_kb)
+        kb_run = run(1)
+    finally:
+        ga.use_knowledge_base(original)
+    assert kb_run == json_run
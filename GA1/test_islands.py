@@ -0,0 +1,45 @@
+import random
+import generator
+import islands
+import selection
+
+def summary(population):
+    return [(r['name'], r['fitness'], r['ingredients']) for r in population]
+
+def evolve_island(island, seed, size, generations):
+    """One island's population before its migration, as run_island evolves it"""
+    island_seed = f"{seed}:island{island}"
+    population = generator.initial_population(size, random.Random(island_seed))
+    for gen in range(generations):
+        population = generator.next_generation(population, gen, island_seed, prefix=f"recipe {island}.")
+    return population
+
+def test_two_islands_are_reproducible_and_migrants_replace_the_worst():
+    size, generations, migrants = 30, 4, 3
+    run = lambda: islands.run_islands(2, size, generations, migration_interval=generations,
+                                      migrants=migrants, seed=13)
+    populations, max_fitnesses, avg_fitnesses = run()
+    again = run()
+    assert [summary(p) for p in again[0]] == [summary(p) for p in populations]
+    assert again[1:] == (max_fitnesses, avg_fitnesses)
+
+    # One migration, after the last generation: each island's best replace the other's worst
+    before = [evolve_island(i, 13, size, generations) for i in range(2)]
+    for island, population in enumerate(before):
+        other = before[1 - island]
+        expected = list(population)
+        worst = selection.bottom(selection.fitness_array(population), migrants)
+        best = selection.top(selection.fitness_array(other), migrants)
+        for w, b in zip(worst, best):
+            expected[w] = other[b]
+        assert summary(populations[island]) == summary(generator.sort_population(expected))
+        assert max_fitnesses[island][-1] == max(r['fitness'] for r in expected)
+        assert len(max_fitnesses[island]) == len(avg_fitnesses[island]) == generations
+
+def test_migration_targets():
+    assert islands.migration_targets('ring', 3, 1, 0) == {0: [1], 1: [2], 2: [0]}
+    assert islands.migration_targets('fully_connected', 3, 1, 0) == {0: [1, 2], 1: [0, 2], 2: [0, 1]}
+    assert islands.migration_targets({0: [2]}, 3, 1, 0) == {0: [2], 1: [], 2: []}
+    shuffled = islands.migration_targets('random', 5, 4, 'seed')
+    assert shuffled == islands.migration_targets('random', 5, 4, 'seed')
+    assert sorted(dest for dests in shuffled.values() for dest in dests) == list(range(5))
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import selection
+
+@pytest.mark.parametrize('n, k', [(100, 10), (50, 10), (30, 30), (500, 100)])
+def test_tournament_entrants_are_distinct(n, k):
+    entrants = selection._distinct_draws(n, (400, 2), k, selection.rng_for('entrants'))
+    assert entrants.shape == (400, 2, k)
+    assert ((entrants >= 0) & (entrants < n)).all()
+    ordered = np.sort(entrants.reshape(-1, k), axis=1)
+    assert (ordered[:, 1:] != ordered[:, :-1]).all()
+
+def test_large_tournaments_draw_in_chunks():
+    # Chunks of a few rows draw the same keys in the same order as one matrix
+    whole = selection._distinct_draws(500, (300, 2), 100, selection.rng_for('chunks'))
+    chunked = selection._distinct_draws(500, (300, 2), 100, selection.rng_for('chunks'), chunk_keys=1700)
+    assert (chunked == whole).all()
+    with pytest.raises(ValueError):
+        selection._distinct_draws(10, (4, 2), 11, selection.rng_for('chunks'))
+
+def test_tournament_picks_the_fittest_entrant():
+    fitness = selection.rng_for('fitness').random(200)
+    pairs = selection.tournament(fitness, 300, selection.rng_for('winners'), tournament_size=200)
+    # Everyone enters: the best always wins
+    assert (pairs == fitness.argmax()).all()
+    pairs = selection.tournament(fitness, 300, selection.rng_for('winners'), tournament_size=20)
+    # Only the 19 least fit can never beat 20 distinct entrants
+    assert not np.isin(pairs, selection.bottom(fitness, 19)).any()
+
+def test_top_and_bottom_break_ties_by_index():
+    fitness = np.array([3., 5., 5., 1., 5., 3., 1.])
+    assert selection.top(fitness, 2).tolist() == [1, 2]
+    assert selection.top(fitness, 4).tolist() == [1, 2, 4, 0]
+    assert selection.top(fitness, 10).tolist() == [1, 2, 4, 0, 5, 3, 6]
+    assert selection.top(fitness, 0).tolist() == []
+    assert selection.bottom(fitness, 1).tolist() == [6]
+    assert selection.bottom(fitness, 3).tolist() == [6, 3, 5]
+    # As stable sorts of the whole population would order them
+    assert selection.top(fitness, 7).tolist() == sorted(range(7), key=lambda i: -fitness[i])
+    assert selection.bottom(fitness, 7).tolist() == sorted(range(7), key=lambda i: (fitness[i], -i))
+
+def test_truncation_draws_only_from_the_best_fraction():
+    fitness = np.arange(40, dtype=np.float64)[::-1].copy()
+    pairs = selection.truncation(fitness, 2000, selection.rng_for('truncation'), fraction=0.25)
+    assert pairs.shape == (2000, 2)
+    assert set(pairs.ravel().tolist()) == set(range(10))
+    # Never an empty pool
+    assert (selection.truncation(fitness, 5, selection.rng_for('truncation'), fraction=0.001) == 0).all()
+
+@pytest.mark.parametrize('pressure', [1.0, 1.5, 2.0])
+def test_rank_selection_follows_linear_ranking(pressure):
+    n, count = 5, 50000
+    fitness = np.array([2., 9., 4., 4., 0.])
+    pairs = selection.rank(fitness, count, selection.rng_for('rank'), pressure=pressure)
+    drawn = np.bincount(pairs.ravel(), minlength=n) / (2 * count)
+    # Ranks worst first: 4, 0, then the tie 2 before 3, then 1
+    ranks = np.array([1, 4, 2, 3, 0])
+    expected = (2 - pressure + 2 * (pressure - 1) * ranks / (n - 1)) / n
+    assert np.allclose(drawn, expected, atol=0.01)
+    assert (selection.rank(np.array([1.]), 3, selection.rng_for('rank')) == 0).all()
+
+def test_sus_counts_are_proportional_to_fitness():
+    fitness = np.array([1., 0., 3., -2., 4.])
+    pairs = selection.sus(fitness, 40, selection.rng_for('sus'))
+    counts = np.bincount(pairs.ravel(), minlength=5)
+    # 80 equally spaced pointers: each individual gets its share, give or take one
+    share = 80 * np.clip(fitness, 0, None) / 8
+    assert (np.abs(counts - share) < 1).all()
+    assert counts[1] == counts[3] == 0
+    # No positive fitness: uniform weights
+    counts = np.bincount(selection.sus(-np.ones(4), 10, selection.rng_for('sus')).ravel(), minlength=4)
+    assert counts.tolist() == [5, 5, 5, 5]
+
+def test_select_pairs_is_reproducible():
+    fitness = selection.rng_for('population').random(60)
+    for scheme in selection.SCHEMES:
+        first = selection.select_pairs(fitness, 30, selection.rng_for(scheme), scheme)
+        again = selection.select_pairs(fitness.tolist(), 30, selection.rng_for(scheme), scheme)
+        assert first.shape == (30, 2)
+        assert (first == again).all()
+    with pytest.raises(ValueError):
+        selection.select_pairs(fitness, 30, selection.rng_for('x'), 'roulette')
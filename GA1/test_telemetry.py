@@ -0,0 +1,87 @@
+import contextlib
+import io
+import pytest
+import generator
+from telemetry import Telemetry, population_diversity, read_log
+
+STAGES = {'selection', 'crossover', 'mutation', 'normalise', 'fitness', 'sorting'}
+
+@pytest.fixture
+def run_main(monkeypatch):
+    # main() sets these module settings; put them back afterwards
+    for name in ('selection_scheme', 'selection_params', 'elite_fraction', 'incremental_fitness',
+                 'mutation_rate', 'checkpoint_interval'):
+        monkeypatch.setattr(generator, name, getattr(generator, name))
+
+    def run_main(*argv):
+        generator.fitness_cache.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.main(['--top', '3', '--checkpoint-interval', '4', *argv])
+    return run_main
+
+def test_log_records(tmp_path):
+    path = tmp_path / 'run.jsonl'
+    seen = []
+    generator.fitness_cache.clear()
+    with Telemetry(str(path), callback=seen.append) as telemetry, contextlib.redirect_stdout(io.StringIO()):
+        generator.evolve(30, 3, seed=2, telemetry=telemetry)
+    records = read_log(str(path))
+    assert records == seen
+    assert [r['event'] for r in records] == ['start', 'generation', 'generation', 'generation', 'end']
+    assert records[0] == {'event': 'start', 'population_size': 30, 'generations': 3, 'workers': 1, 'seed': 2}
+    for gen, record in enumerate(read_log(str(path), event='generation')):
+        assert set(record) == {'event', 'gen', 'best', 'avg', 'worst', 'time', 'stages', 'diversity',
+                               'mutation_rate', 'cache'}
+        assert record['gen'] == gen
+        assert record['worst'] <= record['avg'] <= record['best']
+        assert STAGES <= set(record['stages'])
+        assert set(record['diversity']) == {'unique_recipes', 'distinct_ingredients', 'fitness_std'}
+        assert set(record['cache']) == {'hits', 'misses', 'size', 'maxsize', 'hit_rate'}
+    end = records[-1]
+    assert set(end) == {'event', 'generations', 'time', 'cache', 'stop_reason'}
+    assert (end['generations'], end['stop_reason']) == (3, 'generations')
+
+def test_resumed_log_drops_records_after_the_checkpoint(tmp_path, run_main):
+    log, checkpoint = str(tmp_path / 'run.jsonl'), str(tmp_path / 'run.ck')
+    run_main('--population-size', '30', '--generations', '6', '--seed', '2', '--log', log,
+             '--checkpoint', checkpoint)
+    # Records a crashed run wrote after its last checkpoint
+    with open(log, 'a', encoding='utf-8') as f:
+        f.write('{"event": "generation", "gen": 6}\n')
+    run_main('--generations', '12', '--log', log, '--resume', checkpoint)
+    straight = str(tmp_path / 'straight.jsonl')
+    run_main('--population-size', '30', '--generations', '12', '--seed', '2', '--log', straight)
+
+    records = read_log(log)
+    assert [r['event'] for r in records] == (['start'] + ['generation'] * 6 + ['start'] + ['generation'] * 6
+                                             + ['end', 'creativity'])
+    assert records[7]['resumed_from'] == 6
+    generations = read_log(log, event='generation')
+    assert [r['gen'] for r in generations] == list(range(12))
+    expected = read_log(straight, event='generation')
+    assert [(r['best'], r['avg'], r['worst']) for r in generations] == [
+        (r['best'], r['avg'], r['worst']) for r in expected]
+
+def test_truncate_at_tell(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    with Telemetry(path) as telemetry:
+        telemetry.record('a', x=1)
+        position = telemetry.tell()
+        telemetry.record('b', x=2)
+    with Telemetry(path, truncate_at=position) as telemetry:
+        telemetry.record('c', x=3)
+    assert read_log(path) == [{'event': 'a', 'x': 1}, {'event': 'c', 'x': 3}]
+    with Telemetry(path, append=True) as telemetry:
+        telemetry.record('d')
+    assert [r['event'] for r in read_log(path)] == ['a', 'c', 'd']
+    assert Telemetry(callback=print).tell() is None
+
+def test_population_diversity():
+    recipe = {'ingredients': [{'ingredient': 'egg', 'amount': 1, 'unit': 'egg'},
+                              {'ingredient': 'sugar', 'amount': 2.0, 'unit': 'cup'}], 'fitness': 1.0}
+    reordered = {'ingredients': recipe['ingredients'][::-1], 'fitness': 3.0}
+    other = {'ingredients': [{'ingredient': 'butter', 'amount': 1.0, 'unit': 'cup'}], 'fitness': 2.0}
+    diversity = population_diversity([recipe, reordered, other, other])
+    assert diversity == {'unique_recipes': 0.5, 'distinct_ingredients': 3,
+                         'fitness_std': pytest.approx(0.7071067811865476)}
+    assert population_diversity([]) == {'unique_recipes': 0.0, 'distinct_ingredients': 0, 'fitness_std': 0.0}
@@ -0,0 +1,198 @@
+"""
+CPU inference for hosts without a GPU.
+
+optimize_for_cpu returns a copy of a model for fp32 or int8 inference on
+CPU: GPT-2's Conv1D projections are turned into the equivalent nn.Linear
+layers so that torch.ao.quantization.quantize_dynamic can quantize them
+(Conv1D is not a Linear subclass and would be left in fp32), weights are
+stored as int8 and activations quantized on the fly. lm_head is left in
+fp32: its weight is tied to the token embedding wte, and quantizing it would
+store a second, int8 copy of the largest matrix of the model (and break the
+tie) for the one layer whose error goes straight into the logits.
+generate_poem_cpu runs
+generate_poem under torch.inference_mode with a chosen number of threads.
+
+The benchmark generates the same number of poems with the fp32 and the int8
+model, each in a fresh process, and reports tokens per second, latency per
+poem and peak resident memory while generating (counted from when the model
+is ready, where Linux allows it). The quality check compares the novelty of
+the poems and the share passing the keyword filter in the two modes.
+
+    python cpu_inference.py                        # tiny local GPT-2, no download
+    python cpu_inference.py --threads 4 --poems 20
+    python cpu_inference.py --model ./romantic_gpt2_finetuned
+"""
+import argparse
+import copy
+import gc
+import io
+import multiprocessing
+import random
+import resource
+import torch
+from torch import nn
+from transformers.pytorch_utils import Conv1D
+from ngram_index import load_index
+from pipeline import POEMS_FOLDER, generate_poem, is_romantic_poem, iter_poems
+from poem_format import ROMANTIC_PROMPTS
+from sampling import sample_sequential
+from text_analyzer import ROMANTIC_KEYWORDS
+
+def conv1d_to_linear(model):
+    """Replace every Conv1D (x @ weight + bias) of a model by the same nn.Linear, in place"""
+    for module in list(model.modules()):
+        for name, child in list(module.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data.clone()
+                setattr(module, name, linear)
+    return model
+
+def set_threads(num_threads=None):
+    """Threads of CPU inference (None leaves torch's default)"""
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    return torch.get_num_threads()
+
+def optimize_for_cpu(model, quantize=True, num_threads=None):
+    """
+    A copy of model on CPU in eval mode, with dynamic int8 quantization of
+    its linear layers (Conv1D included, lm_head excluded) if quantize.
+    """
+    set_threads(num_threads)
+    model = copy.deepcopy(model).to('cpu').eval()
+    if not quantize:
+        return model
+    engines = torch.backends.quantized.supported_engines
+    torch.backends.quantized.engine = 'fbgemm' if 'fbgemm' in engines else 'qnnpack'
+    conv1d_to_linear(model)
+    qconfig_spec = {name: torch.ao.quantization.default_dynamic_qconfig
+                    for name, module in model.named_modules()
+                    if isinstance(module, nn.Linear) and name != 'lm_head'}
+    return torch.ao.quantization.quantize_dynamic(model, qconfig_spec, dtype=torch.qint8, inplace=True)
+
+def generate_poem_cpu(model, tokenizer, num_threads=None, **generation_kwargs):
+    """generate_poem under torch.inference_mode, with num_threads threads"""
+    set_threads(num_threads)
+    with torch.inference_mode():
+        return generate_poem(model, tokenizer, **generation_kwargs)
+
+def model_size(model):
+    """Bytes of the serialized state dict (int8 weights count one byte each)"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+def _reset_peak_rss():
+    """Restart the peak resident memory count of the process, where Linux allows it"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def _peak_rss_mb():
+    """Peak resident memory of the process in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB on Linux
+
+def _load(options):
+    """(model, tokenizer) described by options: a saved model or a tiny GPT-2 of the inspiring set"""
+    if options['model']:
+        from pipeline import load_model, load_tokenizer
+        tokenizer = load_tokenizer(options['model'])
+        return load_model(options['model'], tokenizer), tokenizer
+    import tiny_gpt2
+    poems = list(iter_poems(options['folder']))
+    return tiny_gpt2.make_tiny(poems, n_embd=options['n_embd'], n_layer=options['n_layer'],
+                               n_head=options['n_head'])
+
+def run_mode(options):
+    """
+    Generate options['poems'] poems in one mode ('fp32' or 'int8').
+    Returns the poems and the timing and memory figures.
+    """
+    model, tokenizer = _load(options)
+    model = optimize_for_cpu(model, quantize=options['mode'] == 'int8', num_threads=options['threads'])
+    gc.collect()
+    _reset_peak_rss()  # Count the memory of generation, not of loading and converting the model
+    torch.manual_seed(options['seed'])
+    with torch.inference_mode():
+        accepted, stats = sample_sequential(
+            model, tokenizer, ROMANTIC_PROMPTS, lambda poem: True,
+            num_poems=options['poems'], max_candidates=options['poems'],
+            max_length=options['max_length'], rng=random.Random(options['seed']),
+        )
+    return {
+        'mode': options['mode'],
+        'poems': [a['poem'] for a in accepted],
+        'threads': torch.get_num_threads(),
+        'model_bytes': model_size(model),
+        'new_tokens': stats['new_tokens'],
+        'seconds': stats['seconds'],
+        'tokens_per_second': stats['new_tokens'] / stats['seconds'],
+        'seconds_per_poem': stats['seconds'] / stats['candidates'],
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+def benchmark(options):
+    """run_mode for fp32 and int8, each in a fresh process"""
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for mode in ('fp32', 'int8'):
+        with context.Pool(1) as pool:
+            results[mode] = pool.apply(run_mode, (dict(options, mode=mode),))
+    return results
+
+def quality_check(results, training_poems, keywords=ROMANTIC_KEYWORDS, threshold=2):
+    """Mean trigram and bigram novelty and keyword-filter pass rate of the poems of every mode"""
+    index = load_index(training_poems, ns=(2, 3))
+    report = {}
+    for mode, result in results.items():
+        poems = result['poems']
+        passed = [is_romantic_poem(poem, keywords, threshold) for poem in poems]
+        report[mode] = {
+            'trigram_novelty': float(index.novelty(poems, 3).mean()),
+            'bigram_novelty': float(index.novelty(poems, 2).mean()),
+            'pass_rate': sum(passed) / len(poems),
+        }
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark int8 against fp32 CPU inference")
+    parser.add_argument('--folder', default=POEMS_FOLDER, help="inspiring set, for novelty and the tiny tokenizer")
+    parser.add_argument('--model', help="directory of a saved model (default: a tiny random GPT-2)")
+    parser.add_argument('--n-embd', type=int, default=256, help="width of the tiny GPT-2")
+    parser.add_argument('--n-layer', type=int, default=4, help="layers of the tiny GPT-2")
+    parser.add_argument('--n-head', type=int, default=4, help="attention heads of the tiny GPT-2")
+    parser.add_argument('--poems', type=int, default=10)
+    parser.add_argument('--max-length', type=int, default=200)
+    parser.add_argument('--threads', type=int, help="torch threads (default: torch's choice)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    options = dict(model=args.model, folder=args.folder, n_embd=args.n_embd, n_layer=args.n_layer,
+                   n_head=args.n_head, poems=args.poems, max_length=args.max_length,
+                   threads=args.threads, seed=args.seed)
+    results = benchmark(options)
+    quality = quality_check(results, list(iter_poems(args.folder)))
+    for mode, r in results.items():
+        q = quality[mode]
+        print(f"{mode}: {r['tokens_per_second']:.0f} tokens/s, {r['seconds_per_poem'] * 1000:.0f} ms/poem, "
+              f"peak RSS {r['peak_rss_mb']:.0f} MB, model {r['model_bytes'] / 2**20:.1f} MB, {r['threads']} threads | "
+              f"novelty {q['trigram_novelty']:.3f}/{q['bigram_novelty']:.3f} (3/2-gram), "
+              f"keyword pass rate {q['pass_rate']:.0%}")
+    fp32, int8 = results['fp32'], results['int8']
+    print(f"int8 speedup {int8['tokens_per_second'] / fp32['tokens_per_second']:.2f}x, "
+          f"model {int8['model_bytes'] / fp32['model_bytes']:.0%} of fp32")
+
+if __name__ == "__main__":
+    main()
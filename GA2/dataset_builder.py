@@ -0,0 +1,259 @@
+"""
+Training datasets that do not spend the training steps on pad tokens.
+
+prepare_dataset in the notebook pads every poem to max_length=512 and cuts
+longer ones off. Two alternatives:
+
+    packed    every poem, formatted as <|startoftext|>poem<|endoftext|>, is
+              appended to one token stream that is cut into blocks of
+              block_size tokens. The <|endoftext|> token separates poems; a
+              long poem continues in the next block instead of being cut
+              off. Only the last block is padded.
+    bucketed  every poem (long ones split into chunks of at most block_size
+              tokens) is one example. PaddingCollator pads each batch only
+              to its longest example and the Trainer's length-grouped
+              sampler (pipeline.training_arguments) batches poems of
+              similar length together.
+
+Labels are the input ids with -100 on padding only, so the model still
+learns to end a poem: DataCollatorForLanguageModeling would also mask every
+real <|endoftext|>, as the pad token is the same token.
+
+utilisation_report() gives the share of real tokens among the tokens the
+model processes for the padded, bucketed and packed datasets.
+
+    python dataset_builder.py                     # report with a tokenizer trained locally
+    python dataset_builder.py --train-steps 20    # also time a tiny GPT-2 on each dataset
+    python dataset_builder.py --tokenizer gpt2    # report with the GPT-2 tokenizer
+"""
+import argparse
+import glob
+import itertools
+import os
+import time
+import numpy as np
+import torch
+from datasets import Dataset
+from poem_format import format_poem
+
+def tokenize_poems(poems, tokenizer):
+    """Token ids of every formatted poem, neither truncated nor padded"""
+    return tokenizer([format_poem(poem) for poem in poems])['input_ids']
+
+def pack_tokens(token_lists, block_size=512, pad_token_id=0):
+    """
+    Concatenate token lists and cut the stream into blocks.
+    Returns (input_ids, attention_mask) arrays of shape (blocks, block_size).
+    """
+    stream = np.fromiter(itertools.chain.from_iterable(token_lists), dtype=np.int64)
+    num_blocks = max(1, -(-len(stream) // block_size))
+    input_ids = np.full(num_blocks * block_size, pad_token_id, dtype=np.int64)
+    attention_mask = np.zeros(num_blocks * block_size, dtype=np.int64)
+    input_ids[:len(stream)] = stream
+    attention_mask[:len(stream)] = 1
+    return input_ids.reshape(num_blocks, block_size), attention_mask.reshape(num_blocks, block_size)
+
+def build_packed_dataset(token_lists, block_size=512, pad_token_id=0):
+    """Dataset of packed blocks, with input_ids, attention_mask and labels"""
+    input_ids, attention_mask = pack_tokens(token_lists, block_size, pad_token_id)
+    labels = np.where(attention_mask == 1, input_ids, -100)
+    return Dataset.from_dict({
+        'input_ids': input_ids.tolist(),
+        'attention_mask': attention_mask.tolist(),
+        'labels': labels.tolist(),
+    })
+
+def chunk_tokens(token_lists, max_length=512):
+    """Split every token list into pieces of at most max_length tokens"""
+    return [tokens[start:start + max_length]
+            for tokens in token_lists for start in range(0, len(tokens), max_length)]
+
+def build_bucketed_dataset(token_lists, max_length=512):
+    """
+    Dataset of unpadded examples with a 'length' column, for the Trainer's
+    length-grouped sampler and PaddingCollator.
+    """
+    chunks = chunk_tokens(token_lists, max_length)
+    return Dataset.from_dict({
+        'input_ids': chunks,
+        'attention_mask': [[1] * len(chunk) for chunk in chunks],
+        'labels': chunks,
+        'length': [len(chunk) for chunk in chunks],
+    })
+
+def build_padded_dataset(token_lists, block_size=512, pad_token_id=0):
+    """
+    The notebook's prepare_dataset from token lists: one example per poem,
+    truncated and padded to block_size, with input_ids and attention_mask.
+    Train it with DataCollatorForLanguageModeling(tokenizer, mlm=False).
+    """
+    features = padded_features(token_lists, block_size, pad_token_id)
+    return Dataset.from_dict({
+        'input_ids': [f['input_ids'] for f in features],
+        'attention_mask': [f['attention_mask'] for f in features],
+    })
+
+def matched_epochs(epochs, padded_examples, examples, batch_size=4):
+    """
+    Epochs over a dataset of examples that take as many optimizer steps as
+    epochs over the padded dataset of padded_examples (one per poem), so
+    packing or bucketing keeps the step budget, and warmup_steps its share.
+    """
+    padded_steps = -(-padded_examples // batch_size)
+    steps = -(-examples // batch_size)
+    return epochs * padded_steps / steps
+
+def prepare_packed_dataset(poems, tokenizer, block_size=512):
+    """prepare_dataset, packed"""
+    return build_packed_dataset(tokenize_poems(poems, tokenizer), block_size, tokenizer.pad_token_id)
+
+def prepare_bucketed_dataset(poems, tokenizer, max_length=512):
+    """prepare_dataset, one unpadded example per poem chunk"""
+    return build_bucketed_dataset(tokenize_poems(poems, tokenizer), max_length)
+
+
+class PaddingCollator:
+    """
+    Pad a batch to its longest example: pad_token_id in input_ids, 0 in
+    attention_mask and -100 in labels. Other columns are dropped.
+    """
+
+    def __init__(self, pad_token_id, pad_to_multiple_of=None):
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+
+    def __call__(self, features):
+        longest = max(len(f['input_ids']) for f in features)
+        if self.pad_to_multiple_of:
+            longest = -(-longest // self.pad_to_multiple_of) * self.pad_to_multiple_of
+        batch = {}
+        for key, pad in (('input_ids', self.pad_token_id), ('attention_mask', 0), ('labels', -100)):
+            batch[key] = torch.tensor([list(f[key]) + [pad] * (longest - len(f[key])) for f in features],
+                                      dtype=torch.long)
+        return batch
+
+def _batched_tokens(lengths, batch_size):
+    """Tokens processed when examples are batched in order, each batch padded to its longest"""
+    lengths = np.asarray(lengths)
+    return sum(int(lengths[i:i + batch_size].max()) * len(lengths[i:i + batch_size])
+               for i in range(0, len(lengths), batch_size))
+
+def utilisation_report(token_lists, block_size=512, batch_size=4):
+    """
+    Real and processed tokens of the three datasets. Bucketed assumes ideal
+    grouping (examples sorted by length); the Trainer's length-grouped
+    sampler comes close to it. 'dropped' counts the tokens padded mode cuts off.
+    """
+    lengths = np.array([len(tokens) for tokens in token_lists])
+    total = int(lengths.sum())
+
+    def entry(examples, real, processed, dropped=0):
+        return {'examples': examples, 'real_tokens': real, 'processed_tokens': processed,
+                'dropped_tokens': dropped, 'utilisation': real / processed if processed else 0.0}
+
+    kept = int(np.minimum(lengths, block_size).sum())
+    chunk_lengths = sorted((len(chunk) for chunk in chunk_tokens(token_lists, block_size)), reverse=True)
+    num_blocks = max(1, -(-total // block_size))
+    return {
+        'padded': entry(len(lengths), kept, len(lengths) * block_size, total - kept),
+        'bucketed': entry(len(chunk_lengths), total, _batched_tokens(chunk_lengths, batch_size)),
+        'packed': entry(num_blocks, total, num_blocks * block_size),
+    }
+
+def length_grouped_batches(lengths, batch_size, seed=0):
+    """Batches of example indices of similar length, in random order"""
+    order = np.argsort(lengths, kind='stable')
+    batches = [order[i:i + batch_size].tolist() for i in range(0, len(order), batch_size)]
+    np.random.default_rng(seed).shuffle(batches)
+    return batches
+
+def train_steps(model, dataset, collator, steps, batch_size=4, learning_rate=1e-4, seed=0, batches=None):
+    """
+    A plain CPU training loop over dataset for a number of steps, on
+    shuffled batches or the given batches of indices.
+    Returns (seconds, real tokens trained on, last loss).
+    """
+    torch.manual_seed(seed)
+    if batches is None:
+        loader = torch.utils.data.DataLoader(dataset, batch_size=batch_size, shuffle=True, collate_fn=collator)
+    else:
+        loader = torch.utils.data.DataLoader(dataset, batch_sampler=batches, collate_fn=collator)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=learning_rate)
+    model.train()
+    tokens = 0
+    loss = None
+    start = time.perf_counter()
+    for batch in itertools.islice(itertools.cycle(loader), steps):
+        loss = model(**batch).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        tokens += int(batch['attention_mask'].sum())
+    return time.perf_counter() - start, tokens, float(loss) if loss is not None else None
+
+def padded_features(token_lists, block_size, pad_token_id):
+    """The notebook's padded dataset (truncated and padded to block_size), as collator features"""
+    features = []
+    for tokens in token_lists:
+        tokens = list(tokens[:block_size])
+        pad = block_size - len(tokens)
+        features.append({
+            'input_ids': tokens + [pad_token_id] * pad,
+            'attention_mask': [1] * len(tokens) + [0] * pad,
+            'labels': tokens + [-100] * pad,
+        })
+    return features
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare padded, bucketed and packed training datasets")
+    parser.add_argument('--folder', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'romantic'),
+                        help="folder of RomanticPoems*.txt files")
+    parser.add_argument('--tokenizer', default='tiny',
+                        help="'tiny' trains a BPE tokenizer on the poems; anything else is passed to from_pretrained")
+    parser.add_argument('--block-size', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--train-steps', type=int, default=0,
+                        help="also train a tiny randomly initialised GPT-2 this many steps on each dataset")
+    args = parser.parse_args(argv)
+
+    poems = []
+    for path in sorted(glob.glob(os.path.join(args.folder, "RomanticPoems*.txt"))):
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        if content:
+            poems.append(content)
+
+    import tiny_gpt2
+    if args.tokenizer == 'tiny':
+        tokenizer = tiny_gpt2.make_tokenizer(poems)
+    else:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+        tokenizer.pad_token = tokenizer.eos_token
+    token_lists = tokenize_poems(poems, tokenizer)
+
+    report = utilisation_report(token_lists, args.block_size, args.batch_size)
+    print(f"{len(poems)} poems, {report['packed']['real_tokens']} tokens, block size {args.block_size}")
+    for mode, r in report.items():
+        print(f"  {mode:9s} {r['examples']:5d} examples  {r['processed_tokens']:8d} tokens processed  "
+              f"utilisation {r['utilisation']:.1%}  dropped {r['dropped_tokens']}")
+
+    if args.train_steps:
+        pad = tokenizer.pad_token_id
+        datasets = {
+            'padded': padded_features(token_lists, args.block_size, pad),
+            'bucketed': build_bucketed_dataset(token_lists, args.block_size),
+            'packed': build_packed_dataset(token_lists, args.block_size, pad),
+        }
+        for mode, dataset in datasets.items():
+            batches = None
+            if mode == 'bucketed':
+                batches = length_grouped_batches(dataset['length'], args.batch_size)
+            model = tiny_gpt2.make_model(tokenizer, n_positions=args.block_size)
+            seconds, tokens, loss = train_steps(model, dataset, PaddingCollator(pad), args.train_steps,
+                                                args.batch_size, batches=batches)
+            print(f"  {mode:9s} {args.train_steps} steps in {seconds:.2f}s, "
+                  f"{tokens / seconds:.0f} real tokens/s, loss {loss:.3f}")
+
+if __name__ == "__main__":
+    main()
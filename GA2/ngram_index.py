@@ -0,0 +1,175 @@
+"""
+Build-once n-gram index over the inspiring set, for novelty scoring.
+
+Poems are split into words exactly as compute_n_grams does (lowercase,
+whitespace). Every word gets a stable 64-bit hash, and every n-gram the
+polynomial hash of its words, so the n-grams of a poem are computed with a
+few array operations instead of string joins. For every n the index keeps
+the sorted distinct n-gram hashes of the corpus and, for each one, the
+poems that contain it (CSR layout: offsets into a postings array).
+
+max_overlap() answers, for a whole batch of generated poems at once, the
+largest share of a poem's distinct n-grams found in a single training poem,
+which is what compute_novelty_score computes one poem and one n at a time.
+The corpus is never rescanned: query n-grams are looked up with one
+searchsorted per batch.
+
+The index is saved as an .npz file together with a fingerprint of the
+poems it was built from; load_index() rebuilds it when the corpus changes.
+"""
+import hashlib
+import os
+import numpy as np
+
+VERSION = 1
+# Cached next to this module, not in the working directory
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'ngram_index.npz')
+_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+def corpus_fingerprint(poems):
+    """sha256 over the poems' text, in order"""
+    digest = hashlib.sha256()
+    for poem in poems:
+        data = poem.encode('utf-8')
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+    return digest.hexdigest()
+
+def _word_hash(word):
+    return int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def word_hashes(text, cache=None):
+    """64-bit hash of every word of text (lowercased and split on whitespace)"""
+    words = text.lower().split()
+    if cache is None:
+        return np.fromiter((_word_hash(w) for w in words), dtype=np.uint64, count=len(words))
+    hashes = np.empty(len(words), dtype=np.uint64)
+    for i, w in enumerate(words):
+        h = cache.get(w)
+        if h is None:
+            h = cache[w] = _word_hash(w)
+        hashes[i] = h
+    return hashes
+
+def ngram_hashes(words, n):
+    """Distinct hashes of the n-grams of a word hash array, sorted"""
+    count = len(words) - n + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    h = words[:count].copy()
+    for k in range(1, n):
+        h = h * _MULTIPLIER + words[k:k + count]  # wraps modulo 2**64
+    return np.unique(h)
+
+
+class NgramIndex:
+    """
+    Hashed n-gram postings of a corpus for several n at once.
+
+    tables[n] is (keys, offsets, postings): the sorted distinct n-gram
+    hashes of the corpus, and postings[offsets[i]:offsets[i + 1]] the
+    poems containing keys[i].
+    """
+
+    def __init__(self, ns, tables, num_poems, fingerprint):
+        self.ns = tuple(ns)
+        self.tables = tables
+        self.num_poems = num_poems
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, poems, ns=(2, 3)):
+        """Index the poems (a list of str) for every n in ns"""
+        cache = {}
+        words = [word_hashes(poem, cache) for poem in poems]
+        tables = {}
+        for n in ns:
+            grams = [ngram_hashes(w, n) for w in words]
+            all_keys = np.concatenate(grams) if grams else np.zeros(0, dtype=np.uint64)
+            poem_ids = np.repeat(np.arange(len(poems), dtype=np.int32), [len(g) for g in grams])
+            order = np.argsort(all_keys, kind='stable')  # postings stay in poem order
+            all_keys, poem_ids = all_keys[order], poem_ids[order]
+            keys, starts = np.unique(all_keys, return_index=True)
+            offsets = np.append(starts, len(all_keys)).astype(np.int64)
+            tables[n] = (keys, offsets, poem_ids)
+        return cls(ns, tables, len(poems), corpus_fingerprint(poems))
+
+    def max_overlap(self, poems, n):
+        """
+        For every poem of the batch: the largest share of its distinct
+        n-grams that occur in one training poem, and the index of that
+        training poem (-1 if the poem has no n-grams or no overlap).
+        """
+        keys, offsets, postings = self.tables[n]
+        grams = [ngram_hashes(word_hashes(poem), n) for poem in poems]
+        sizes = np.array([len(g) for g in grams], dtype=np.int64)
+        overlap = np.zeros(len(poems))
+        best = np.full(len(poems), -1, dtype=np.int64)
+        if not sizes.sum() or not len(keys):
+            return overlap, best
+
+        query = np.concatenate(grams)
+        query_ids = np.repeat(np.arange(len(poems)), sizes)
+        pos = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+        found = keys[pos] == query
+        pos, query_ids = pos[found], query_ids[found]
+
+        # Expand every hit to the poems listed for its n-gram
+        counts = offsets[pos + 1] - offsets[pos]
+        starts = np.repeat(offsets[pos] - np.cumsum(counts) + counts, counts)
+        hits = postings[starts + np.arange(counts.sum())]
+        pairs, shared = np.unique(np.repeat(query_ids, counts) * self.num_poems + hits, return_counts=True)
+        query_ids, hits = np.divmod(pairs, self.num_poems)
+
+        # Per query, the training poem sharing the most n-grams (lowest index on ties)
+        order = np.lexsort((hits, -shared, query_ids))
+        first = order[np.flatnonzero(np.diff(query_ids[order], prepend=-1))]
+        best[query_ids[first]] = hits[first]
+        overlap[query_ids[first]] = shared[first] / sizes[query_ids[first]]
+        return overlap, best
+
+    def novelty(self, poems, n=3):
+        """compute_novelty_score for a batch: 1 - max overlap, 0.0 for poems without n-grams"""
+        overlap, _ = self.max_overlap(poems, n)
+        sizes = np.array([len(poem.split()) - n + 1 for poem in poems])
+        return np.where(sizes > 0, 1 - overlap, 0.0)
+
+    def save(self, path=CACHE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        arrays = {}
+        for n, (keys, offsets, postings) in self.tables.items():
+            arrays[f'keys_{n}'] = keys
+            arrays[f'offsets_{n}'] = offsets
+            arrays[f'postings_{n}'] = postings
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, version=VERSION, ns=np.array(self.ns), num_poems=self.num_poems,
+                 fingerprint=self.fingerprint, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=CACHE_PATH):
+        with np.load(path) as data:
+            if int(data['version']) != VERSION:
+                raise ValueError(f"{path}: unsupported index version")
+            ns = [int(n) for n in data['ns']]
+            tables = {n: (data[f'keys_{n}'], data[f'offsets_{n}'], data[f'postings_{n}']) for n in ns}
+            return cls(ns, tables, int(data['num_poems']), str(data['fingerprint']))
+
+def load_index(poems, ns=(2, 3), path=CACHE_PATH):
+    """
+    The index of poems for ns, read from path if it was built from the same
+    poems and covers every n, else built and saved there.
+    """
+    fingerprint = corpus_fingerprint(poems)
+    if os.path.exists(path):
+        try:
+            index = NgramIndex.load(path)
+            if index.fingerprint == fingerprint and set(ns) <= set(index.ns):
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+    index = NgramIndex.build(poems, ns)
+    index.save(path)
+    return index
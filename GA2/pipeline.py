@@ -0,0 +1,464 @@
+"""
+The notebook's pipeline as an importable module with a command line:
+loading the inspiring set, building the training dataset, fine-tuning,
+generating romantic poems and evaluating them, without Jupyter.
+
+Poems are read lazily (iter_poems). TokenCache keeps the token ids of every
+poem file on disk under GA2/.cache/tokens, keyed by the tokenizer and the
+SHA-256 of the file's content, so only new or changed files are tokenized
+again. A manifest of file sizes and modification times lets unchanged files
+be recognised without reading them.
+
+    python pipeline.py tokenize --tokenizer gpt2
+    python pipeline.py train --model gpt2 --output ./romantic_gpt2_finetuned
+    python pipeline.py generate --model ./romantic_gpt2_finetuned --poems 3
+    python pipeline.py generate --model ./romantic_gpt2_finetuned --int8 --threads 4
+    python pipeline.py evaluate generated_poems/romantic_poem_*.txt --json evaluation.json
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import numpy as np
+from ngram_index import load_index
+from poem_format import END_TOKEN, ROMANTIC_PROMPTS, START_TOKEN, clean_poem
+from suffix_automaton import automaton_for
+from text_analyzer import ROMANTIC_KEYWORDS, Lexicon, PoemAnalyzer
+
+# The inspiring set and the token cache are found next to this module,
+# not in the working directory
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+POEMS_FOLDER = os.path.join(MODULE_DIR, "romantic")
+TOKEN_CACHE = os.path.join(MODULE_DIR, '.cache', 'tokens')
+
+# LOADING
+
+def poem_files(folder_path):
+    """Paths of the RomanticPoems*.txt files of a folder, sorted"""
+    return sorted(glob.glob(os.path.join(folder_path, "RomanticPoems*.txt")))
+
+def iter_poems(folder_path):
+    """Yield the non-empty poems of a folder one file at a time"""
+    for file_path in poem_files(folder_path):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+        except Exception as e:
+            print(f"Error reading {file_path}: {e}")
+            continue
+        if content:  # Only yield non-empty poems
+            yield content
+
+def load_poems_from_folder(folder_path):
+    """
+    Load all poems from text files in the specified folder.
+    Expected filename format: RomanticPoems*.txt
+    """
+    poems = list(iter_poems(folder_path))
+    print(f"Loaded {len(poems)} poems from '{folder_path}'")
+    return poems
+
+# TOKENIZATION
+
+def tokenizer_fingerprint(tokenizer):
+    """Hash of everything that decides the tokens of a text"""
+    h = hashlib.sha256(type(tokenizer).__name__.encode())
+    if hasattr(tokenizer, 'backend_tokenizer'):  # fast tokenizer: vocabulary, merges and normalisation
+        h.update(tokenizer.backend_tokenizer.to_str().encode())
+    else:
+        h.update(json.dumps(sorted(tokenizer.get_vocab().items())).encode())
+        h.update(json.dumps(sorted(' '.join(pair) for pair in getattr(tokenizer, 'bpe_ranks', {}))).encode())
+    h.update(json.dumps(tokenizer.all_special_tokens).encode())
+    return h.hexdigest()[:16]
+
+
+class TokenCache:
+    """
+    Token ids of formatted poem files (<|startoftext|>poem<|endoftext|>),
+    stored as one .npy file per distinct file content and tokenizer.
+    hits and misses count the files found in and added to the cache.
+    """
+
+    def __init__(self, tokenizer, directory=TOKEN_CACHE):
+        self.tokenizer = tokenizer
+        self.directory = directory
+        self.token_directory = os.path.join(directory, tokenizer_fingerprint(tokenizer))
+        self.manifest_path = os.path.join(directory, 'files.json')
+        self.hits = self.misses = 0
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def _content_hash(self, path):
+        """SHA-256 of a file, from the manifest while its size and modification time are unchanged"""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self.manifest.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256'], None
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        self.manifest[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+        return digest, data
+
+    def token_lists(self, paths, batch_size=256):
+        """Token ids of every non-empty poem file, in order, tokenizing only the files not cached"""
+        os.makedirs(self.token_directory, exist_ok=True)
+        tokens = [None] * len(paths)
+        missing = []
+        for i, path in enumerate(paths):
+            digest, data = self._content_hash(path)
+            cached = os.path.join(self.token_directory, digest + '.npy')
+            if os.path.exists(cached):
+                tokens[i] = np.load(cached).tolist()
+                self.hits += 1
+                continue
+            if data is None:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            missing.append((i, cached, data.decode('utf-8').strip()))
+
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            texts = [text for _, _, text in batch if text]
+            if texts:
+                from dataset_builder import tokenize_poems
+                encoded = iter(tokenize_poems(texts, self.tokenizer))
+            else:
+                encoded = iter(())
+            for i, cached, text in batch:
+                ids = next(encoded) if text else []  # Empty poems are stored as no tokens
+                np.save(cached + '.tmp.npy', np.asarray(ids, dtype=np.int32))
+                os.replace(cached + '.tmp.npy', cached)
+                tokens[i] = list(ids)
+                self.misses += 1
+
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self.manifest_path)
+        return [t for t in tokens if t]
+
+def load_token_lists(folder_path, tokenizer, cache_dir=TOKEN_CACHE):
+    """Token ids of the poems of a folder, through the on-disk cache"""
+    cache = TokenCache(tokenizer, cache_dir)
+    token_lists = cache.token_lists(poem_files(folder_path))
+    print(f"Tokenized {cache.misses} poem files, {cache.hits} from the cache")
+    return token_lists
+
+def build_training_dataset(folder_path, tokenizer, block_size=512, mode='padded', cache_dir=TOKEN_CACHE):
+    """
+    Padded (the notebook's default), packed or bucketed training dataset
+    (see dataset_builder.py) of the poems of a folder.
+    Returns (dataset, number of poems).
+    """
+    from dataset_builder import build_bucketed_dataset, build_packed_dataset, build_padded_dataset
+    token_lists = load_token_lists(folder_path, tokenizer, cache_dir)
+    if mode == 'bucketed':
+        dataset = build_bucketed_dataset(token_lists, block_size)
+    elif mode == 'packed':
+        dataset = build_packed_dataset(token_lists, block_size, tokenizer.pad_token_id)
+    else:
+        dataset = build_padded_dataset(token_lists, block_size, tokenizer.pad_token_id)
+    return dataset, len(token_lists)
+
+# GENERATION
+
+def generate_poem(model, tokenizer, prompt="", max_length=200, temperature=0.9,
+                  top_k=50, top_p=0.95, num_return_sequences=1):
+    """
+    Generate a poem using the fine-tuned model.
+
+    Args:
+        prompt: Starting text for the poem (empty for free generation)
+        max_length: Maximum length of generated text
+        temperature: Sampling temperature (higher = more random)
+        top_k: Top-k sampling parameter
+        top_p: Nucleus sampling parameter
+        num_return_sequences: Number of poems to generate
+    """
+    import torch
+    model.eval()
+    input_ids = tokenizer.encode(f"{START_TOKEN}{prompt}", return_tensors='pt')
+    device = next(model.parameters()).device
+    input_ids = input_ids.to(device)
+
+    with torch.no_grad():
+        output = model.generate(
+            input_ids,
+            max_length=max_length,
+            temperature=temperature,
+            top_k=top_k,
+            top_p=top_p,
+            num_return_sequences=num_return_sequences,
+            do_sample=True,
+            pad_token_id=tokenizer.eos_token_id,
+            eos_token_id=tokenizer.encode(END_TOKEN)[0]
+        )
+    return [clean_poem(tokenizer.decode(sequence, skip_special_tokens=False)) for sequence in output]
+
+_keyword_lexicons = {}
+
+def is_romantic_poem(text, keywords=ROMANTIC_KEYWORDS, threshold=2):
+    """
+    Check if a poem contains romantic themes based on keyword presence.
+
+    Args:
+        text: The poem text to check
+        keywords: List of romantic keywords
+        threshold: Minimum number of keywords required
+
+    Returns:
+        Boolean indicating if poem is sufficiently romantic
+    """
+    keywords = tuple(keywords)
+    if keywords not in _keyword_lexicons:
+        _keyword_lexicons[keywords] = Lexicon(keywords)
+    found = _keyword_lexicons[keywords].find(text.lower())
+    count = sum(1 for keyword in keywords if keyword in found)
+    return count >= threshold
+
+def generate_romantic_poem(model, tokenizer, max_attempts=10, batch_size=None, prompts=ROMANTIC_PROMPTS,
+                           keywords=ROMANTIC_KEYWORDS, threshold=2, rng=random, **generation_kwargs):
+    """
+    Generate a romantic poem by:
+    1. Using a romantic prompt
+    2. Filtering results to ensure romantic content
+
+    With batch_size, the same number of candidates (max_attempts * num_return_sequences)
+    is sampled batch_size at a time from a single encoding of the prompt, stopping at
+    the first romantic one (see sampling.py).
+    Returns (poem, prompt).
+    """
+    if max_attempts < 1:
+        raise ValueError(f"max_attempts must be at least 1, got {max_attempts}")
+
+    def accept(poem):
+        return is_romantic_poem(poem, keywords, threshold)
+
+    if batch_size:
+        from sampling import sample_poems
+        num_return_sequences = generation_kwargs.pop('num_return_sequences', 1)
+        accepted, candidates, _ = sample_poems(
+            model, tokenizer, prompts, accept, num_poems=1, batch_size=batch_size,
+            max_candidates=max_attempts * num_return_sequences, rng=rng, **generation_kwargs
+        )
+        # If we couldn't generate a sufficiently romantic poem, return the last one
+        poem = accepted[0] if accepted else candidates[-1]
+        return poem['poem'], poem['prompt']
+
+    for attempt in range(max_attempts):
+        prompt = rng.choice(prompts)
+        poems = generate_poem(model, tokenizer, prompt=prompt, **generation_kwargs)
+        for poem in poems:
+            if accept(poem):
+                return poem, prompt
+
+    # If we couldn't generate a sufficiently romantic poem, return the last one
+    return poems[0], prompt
+
+# EVALUATION
+
+def evaluate_poems(poems, training_poems, analyzer=None, workers=1):
+    """
+    Automatic metrics of every poem: novelty against the training poems
+    (bigram and trigram novelty, longest verbatim match over 30 characters)
+    and the text metrics of text_analyzer. Returns one dict per poem.
+    """
+    analyzer = analyzer or PoemAnalyzer()
+    index = load_index(training_poems, ns=(2, 3))
+    automaton = automaton_for(training_poems)
+    trigram_scores = index.novelty(poems, n=3)
+    bigram_scores = index.novelty(poems, n=2)
+    results = []
+    for i, (poem, analysis) in enumerate(zip(poems, analyzer.analyze_batch(poems, workers))):
+        size, poem_index, _ = automaton.longest_match(poem.lower())
+        results.append({
+            'poem_id': i + 1,
+            'trigram_novelty': float(trigram_scores[i]),
+            'bigram_novelty': float(bigram_scores[i]),
+            'exact_match_length': size if size > 30 else 0,
+            'exact_match_poem': poem_index if size > 30 else -1,
+            **analysis,
+        })
+    return results
+
+# COMMAND LINE
+
+def load_tokenizer(name, folder_path=POEMS_FOLDER):
+    """A pretrained tokenizer with <|endoftext|> as pad token, or 'tiny' (tiny_gpt2.py)"""
+    if name == 'tiny':
+        import tiny_gpt2
+        return tiny_gpt2.make_tokenizer(list(iter_poems(folder_path)))
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    tokenizer.pad_token = tokenizer.eos_token
+    return tokenizer
+
+def load_model(name, tokenizer):
+    """A pretrained or fine-tuned causal LM, or 'tiny' (a random tiny GPT-2 sized for tokenizer)"""
+    if name == 'tiny':
+        import tiny_gpt2
+        return tiny_gpt2.make_model(tokenizer)
+    from transformers import AutoModelForCausalLM
+    model = AutoModelForCausalLM.from_pretrained(name)
+    model.config.pad_token_id = tokenizer.eos_token_id
+    return model
+
+def tokenize_command(args):
+    tokenizer = load_tokenizer(args.tokenizer, args.folder)
+    token_lists = load_token_lists(args.folder, tokenizer, args.cache_dir)
+    from dataset_builder import utilisation_report
+    report = utilisation_report(token_lists, args.block_size)
+    for mode, r in report.items():
+        print(f"{mode}: {r['examples']} examples, token utilisation {r['utilisation']:.1%}")
+
+def training_arguments(bucketed=False, **kwargs):
+    """
+    TrainingArguments from the keyword arguments this transformers version
+    accepts (transformers 5 dropped overwrite_output_dir, for one).
+    bucketed batches examples of similar length together: group_by_length
+    before transformers 5, train_sampling_strategy from then on.
+    """
+    import inspect
+    from transformers import TrainingArguments
+    accepted = inspect.signature(TrainingArguments.__init__).parameters
+    if bucketed:
+        if 'group_by_length' in accepted:
+            kwargs['group_by_length'] = True
+        else:
+            kwargs['train_sampling_strategy'] = 'group_by_length'
+    return TrainingArguments(**{key: value for key, value in kwargs.items() if key in accepted})
+
+def train_command(args):
+    import torch
+    from transformers import DataCollatorForLanguageModeling, Trainer, default_data_collator
+    from dataset_builder import PaddingCollator, matched_epochs
+    tokenizer = load_tokenizer(args.tokenizer or args.model, args.folder)
+    model = load_model(args.model, tokenizer)
+    dataset, num_poems = build_training_dataset(args.folder, tokenizer, args.block_size, args.mode, args.cache_dir)
+    # --epochs counts epochs of the padded dataset; packed and bucketed
+    # datasets have another number of examples, so they train for as many
+    # optimizer steps instead of as many passes
+    epochs = matched_epochs(args.epochs, num_poems, len(dataset), args.batch_size)
+    print(f"Dataset prepared with {len(dataset)} examples, training for {epochs:.1f} epochs")
+    training_args = training_arguments(
+        bucketed=args.mode == 'bucketed',
+        output_dir=args.checkpoints,
+        overwrite_output_dir=True,
+        num_train_epochs=epochs,
+        max_steps=args.max_steps,
+        per_device_train_batch_size=args.batch_size,
+        save_steps=100,
+        save_total_limit=2,
+        logging_steps=100,
+        learning_rate=args.learning_rate,
+        warmup_steps=100,
+        weight_decay=0.01,
+        prediction_loss_only=True,
+        fp16=torch.cuda.is_available(),
+        report_to=[],
+    )
+    if args.mode == 'padded':
+        collator = DataCollatorForLanguageModeling(tokenizer=tokenizer, mlm=False)
+    elif args.mode == 'bucketed':
+        collator = PaddingCollator(tokenizer.pad_token_id)
+    else:
+        collator = default_data_collator
+    trainer = Trainer(model=model, args=training_args, data_collator=collator, train_dataset=dataset)
+    trainer.train()
+    model.save_pretrained(args.output)
+    tokenizer.save_pretrained(args.output)
+    print(f"Model saved to '{args.output}'")
+
+def generate_command(args):
+    import torch
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    tokenizer = load_tokenizer(args.tokenizer or args.model, args.folder)
+    model = load_model(args.model, tokenizer)
+    if args.int8 or args.threads:
+        from cpu_inference import optimize_for_cpu
+        model = optimize_for_cpu(model, quantize=args.int8, num_threads=args.threads)
+    os.makedirs(args.output, exist_ok=True)
+    for i in range(args.poems):
+        with torch.inference_mode():
+            poem, prompt = generate_romantic_poem(
+                model, tokenizer, max_attempts=args.max_attempts, batch_size=args.batch_size,
+                max_length=args.max_length, temperature=args.temperature, top_k=50, top_p=0.95,
+            )
+        path = os.path.join(args.output, f"romantic_poem_{i+1}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(poem)
+        print(f"{path} (started with: '{prompt}')")
+
+def evaluate_command(args):
+    poems = []
+    for path in args.poems:
+        with open(path, 'r', encoding='utf-8') as f:
+            poems.append(f.read().strip())
+    results = evaluate_poems(poems, list(iter_poems(args.folder)), workers=args.workers)
+    for path, r in zip(args.poems, results):
+        print(f"{path}: novelty {(r['trigram_novelty'] + r['bigram_novelty']) / 2:.3f}, "
+              f"exact match {r['exact_match_length']} chars, {r['coherence']['num_lines']} lines, "
+              f"{len(r['emotions'])}/6 emotions, {len(r['rhyme']['pairs'])} rhyme pairs, "
+              f"rhythm {r['rhythm']['consistency']:.2f}, {len(r['imagery'])}/4 imagery")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(dict(zip(args.poems, results)), f, indent=1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Romantic poem generator pipeline")
+    parser.add_argument('--folder', default=POEMS_FOLDER, help="folder of RomanticPoems*.txt files")
+    parser.add_argument('--cache-dir', default=TOKEN_CACHE, help="directory of the token cache")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    tokenize = commands.add_parser('tokenize', help="tokenize the inspiring set into the cache")
+    tokenize.add_argument('--tokenizer', default='gpt2', help="pretrained tokenizer, or 'tiny'")
+    tokenize.add_argument('--block-size', type=int, default=512)
+    tokenize.set_defaults(run=tokenize_command)
+
+    train = commands.add_parser('train', help="fine-tune a model on the inspiring set")
+    train.add_argument('--model', default='gpt2', help="pretrained model, or 'tiny'")
+    train.add_argument('--tokenizer', help="default: the model's")
+    train.add_argument('--output', default='./romantic_gpt2_finetuned')
+    train.add_argument('--checkpoints', default='./romantic_gpt2_output', help="Trainer output directory")
+    train.add_argument('--mode', choices=('padded', 'packed', 'bucketed'), default='padded')
+    train.add_argument('--block-size', type=int, default=512)
+    train.add_argument('--epochs', type=float, default=400,
+                       help="epochs of the padded dataset; other modes train for as many steps")
+    train.add_argument('--max-steps', type=int, default=-1, help="stop after this many steps (overrides --epochs)")
+    train.add_argument('--batch-size', type=int, default=4)
+    train.add_argument('--learning-rate', type=float, default=1e-5)
+    train.set_defaults(run=train_command)
+
+    generate = commands.add_parser('generate', help="generate romantic poems into a folder")
+    generate.add_argument('--model', default='./romantic_gpt2_finetuned', help="saved model, or 'tiny'")
+    generate.add_argument('--tokenizer', help="default: the model's")
+    generate.add_argument('--output', default='generated_poems')
+    generate.add_argument('--poems', type=int, default=3)
+    generate.add_argument('--batch-size', type=int, default=8, help="0 samples one candidate at a time")
+    generate.add_argument('--max-attempts', type=int, default=10)
+    generate.add_argument('--max-length', type=int, default=200)
+    generate.add_argument('--temperature', type=float, default=0.85)
+    generate.add_argument('--seed', type=int, default=42)
+    generate.add_argument('--int8', action='store_true', help="dynamic int8 quantization for CPU (cpu_inference.py)")
+    generate.add_argument('--threads', type=int, help="torch threads for CPU inference")
+    generate.set_defaults(run=generate_command)
+
+    evaluate = commands.add_parser('evaluate', help="automatic metrics of poem files")
+    evaluate.add_argument('poems', nargs='+', help="text files of generated poems")
+    evaluate.add_argument('--json', help="also write the metrics to this file")
+    evaluate.add_argument('--workers', type=int, default=1, help="processes for the text metrics")
+    evaluate.set_defaults(run=evaluate_command)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+Text conventions of the poems the model is trained on and generates: the
+special tokens around a poem, the prompts generation starts from, and the
+formatting and cleaning of poem text. Kept free of torch and transformers so
+that loading and evaluating poems does not need them.
+"""
+
+START_TOKEN = '<|startoftext|>'
+END_TOKEN = '<|endoftext|>'
+
+ROMANTIC_PROMPTS = ["Love", "My heart", "My dear", "Sweet", "Beloved",
+                    "In your eyes", "Your beauty", "Romance", "Passion", "Tenderness"]
+
+def format_poem(poem):
+    """A poem as the model is trained on it"""
+    return f"{START_TOKEN}{poem}{END_TOKEN}"
+
+def clean_poem(text):
+    """Decoded text without the special tokens, as generate_poem returns it"""
+    return text.replace(START_TOKEN, "").replace(END_TOKEN, "").strip()
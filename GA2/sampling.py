@@ -0,0 +1,241 @@
+"""
+Batched rejection sampling of poems.
+
+generate_romantic_poem in the notebook samples one candidate per
+model.generate call and filters it afterwards, so every attempt encodes the
+prompt again and runs the model on a batch of one. sample_poems instead
+
+  * runs each prompt through the model once and keeps its key/value cache
+    and next-token logits, reused by every candidate sampled from it;
+  * samples batch_size candidates at a time from that cache, with the same
+    temperature, top-k and top-p warpers as model.generate;
+  * drops candidates from the batch as soon as they emit <|endoftext|> and
+    tests them right away, stopping the whole search once num_poems have
+    been accepted.
+
+Every candidate comes back with its metadata (prompt, round, tokens, whether
+it ended on its own, whether it was accepted).
+
+    python sampling.py                   # benchmark on a tiny local GPT-2
+    python sampling.py --poems 20 --batch-size 16
+"""
+import argparse
+import copy
+import glob
+import os
+import random
+import time
+import torch
+from transformers import LogitsProcessorList, TemperatureLogitsWarper, TopKLogitsWarper, TopPLogitsWarper
+from poem_format import ROMANTIC_PROMPTS, START_TOKEN, clean_poem
+from text_analyzer import ROMANTIC_KEYWORDS
+
+def _repeat_cache(cache, n):
+    """A copy of a batch-of-one key/value cache, repeated n times along the batch"""
+    if hasattr(cache, 'batch_repeat_interleave'):  # transformers Cache object
+        cache = copy.deepcopy(cache)
+        cache.batch_repeat_interleave(n)
+        return cache
+    return tuple(tuple(t.repeat_interleave(n, dim=0) for t in layer) for layer in cache)
+
+def _select_cache(cache, index):
+    """Keep the rows of index (a LongTensor) of a key/value cache"""
+    if hasattr(cache, 'batch_select_indices'):
+        cache.batch_select_indices(index)
+        return cache
+    return tuple(tuple(t.index_select(0, index) for t in layer) for layer in cache)
+
+def warpers(temperature=0.9, top_k=50, top_p=0.95):
+    """The logits warpers model.generate applies for these sampling parameters"""
+    processors = LogitsProcessorList()
+    if temperature is not None and temperature != 1.0:
+        processors.append(TemperatureLogitsWarper(temperature))
+    if top_k:
+        processors.append(TopKLogitsWarper(top_k))
+    if top_p is not None and top_p < 1.0:
+        processors.append(TopPLogitsWarper(top_p))
+    return processors
+
+
+class PromptState:
+    """A prompt run through the model once: its ids, key/value cache and next-token logits"""
+
+    def __init__(self, model, tokenizer, prompt):
+        device = next(model.parameters()).device
+        self.prompt = prompt
+        self.input_ids = tokenizer.encode(f"{START_TOKEN}{prompt}", return_tensors='pt').to(device)
+        with torch.no_grad():
+            output = model(self.input_ids, use_cache=True)
+        self.past_key_values = output.past_key_values
+        self.logits = output.logits[:, -1, :]
+
+def sample_round(model, tokenizer, state, batch_size, processors, max_length=200):
+    """
+    Sample batch_size continuations of a prompt from its cached state.
+    Yields (sequence ids, new tokens, ended with eos) for every candidate
+    as soon as it is finished; stop iterating to stop sampling.
+    max_length counts the prompt, as in model.generate.
+    """
+    eos_token_id = tokenizer.eos_token_id
+    max_new_tokens = max_length - state.input_ids.shape[1]
+    if max_new_tokens <= 0:
+        return
+    past = _repeat_cache(state.past_key_values, batch_size)
+    logits = state.logits.repeat(batch_size, 1)
+    sequences = state.input_ids.repeat(batch_size, 1)
+    for step in range(max_new_tokens):
+        scores = processors(sequences, logits.float())
+        next_tokens = torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1).squeeze(1)
+        sequences = torch.cat([sequences, next_tokens[:, None]], dim=1)
+
+        ended = next_tokens == eos_token_id
+        done = ended | (step == max_new_tokens - 1)
+        for row in done.nonzero().flatten().tolist():
+            yield sequences[row], step + 1, bool(ended[row])
+        if done.all():
+            return
+        if done.any():
+            # Finished candidates leave the batch
+            keep = (~done).nonzero().flatten()
+            sequences, next_tokens = sequences[keep], next_tokens[keep]
+            past = _select_cache(past, keep)
+
+        with torch.no_grad():
+            output = model(next_tokens[:, None], past_key_values=past, use_cache=True)
+        past = output.past_key_values
+        logits = output.logits[:, -1, :]
+
+def sample_poems(model, tokenizer, prompts, accept, num_poems=1, batch_size=8, max_candidates=80,
+                 max_length=200, temperature=0.9, top_k=50, top_p=0.95, rng=random):
+    """
+    Sample candidates batch_size at a time, each batch from a prompt drawn
+    with rng, until num_poems pass accept (a function of the poem text) or
+    max_candidates have been sampled.
+    Returns (accepted, candidates, stats): accepted and every candidate as
+    dicts with 'poem', 'prompt', 'round', 'new_tokens', 'ended' and
+    'accepted', and stats with the counts and seconds spent.
+    """
+    model.eval()
+    processors = warpers(temperature, top_k, top_p)
+    states = {}
+    accepted, candidates = [], []
+    rounds = new_tokens = 0
+    start = time.perf_counter()
+    while len(accepted) < num_poems and len(candidates) < max_candidates:
+        prompt = rng.choice(prompts)
+        if prompt not in states:
+            states[prompt] = PromptState(model, tokenizer, prompt)
+        size = min(batch_size, max_candidates - len(candidates))
+        for sequence, tokens, ended in sample_round(model, tokenizer, states[prompt], size, processors, max_length):
+            poem = clean_poem(tokenizer.decode(sequence, skip_special_tokens=False))
+            candidate = {
+                'poem': poem,
+                'prompt': prompt,
+                'round': rounds,
+                'new_tokens': tokens,
+                'ended': ended,
+                'accepted': accept(poem),
+            }
+            candidates.append(candidate)
+            new_tokens += tokens
+            if candidate['accepted']:
+                accepted.append(candidate)
+                if len(accepted) >= num_poems:
+                    break
+        rounds += 1
+
+    seconds = time.perf_counter() - start
+    stats = {
+        'rounds': rounds,
+        'candidates': len(candidates),
+        'accepted': len(accepted),
+        'new_tokens': new_tokens,
+        'seconds': seconds,
+        'accepted_per_second': len(accepted) / seconds if seconds > 0 else None,
+    }
+    return accepted, candidates, stats
+
+def sample_sequential(model, tokenizer, prompts, accept, num_poems=1, max_candidates=80,
+                      max_length=200, temperature=0.9, top_k=50, top_p=0.95, rng=random):
+    """
+    The notebook's approach, one model.generate call per candidate; the
+    baseline of the benchmark. Returns (accepted, stats) like sample_poems.
+    """
+    model.eval()
+    device = next(model.parameters()).device
+    accepted = []
+    candidates = new_tokens = 0
+    start = time.perf_counter()
+    while len(accepted) < num_poems and candidates < max_candidates:
+        prompt = rng.choice(prompts)
+        input_ids = tokenizer.encode(f"{START_TOKEN}{prompt}", return_tensors='pt').to(device)
+        with torch.no_grad():
+            output = model.generate(
+                input_ids,
+                max_length=max_length,
+                temperature=temperature,
+                top_k=top_k,
+                top_p=top_p,
+                num_return_sequences=1,
+                do_sample=True,
+                pad_token_id=tokenizer.eos_token_id,
+                eos_token_id=tokenizer.eos_token_id,
+            )
+        poem = clean_poem(tokenizer.decode(output[0], skip_special_tokens=False))
+        candidates += 1
+        new_tokens += output.shape[1] - input_ids.shape[1]
+        if accept(poem):
+            accepted.append({'poem': poem, 'prompt': prompt})
+    seconds = time.perf_counter() - start
+    stats = {
+        'candidates': candidates,
+        'accepted': len(accepted),
+        'new_tokens': new_tokens,
+        'seconds': seconds,
+        'accepted_per_second': len(accepted) / seconds if seconds > 0 else None,
+    }
+    return accepted, stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark batched against sequential rejection sampling")
+    parser.add_argument('--folder', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'romantic'),
+                        help="poems the tiny model's tokenizer is trained on")
+    parser.add_argument('--model', help="directory of a saved model (default: a tiny random GPT-2)")
+    parser.add_argument('--poems', type=int, default=10, help="accepted poems to sample")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-candidates', type=int, default=200)
+    parser.add_argument('--max-length', type=int, default=200)
+    parser.add_argument('--threshold', type=int, default=2, help="keywords a poem needs to be accepted")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.model:
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.model)
+        model = AutoModelForCausalLM.from_pretrained(args.model)
+    else:
+        import tiny_gpt2
+        poems = []
+        for path in sorted(glob.glob(os.path.join(args.folder, "RomanticPoems*.txt"))):
+            with open(path, 'r', encoding='utf-8') as f:
+                poems.append(f.read().strip())
+        model, tokenizer = tiny_gpt2.make_tiny(poems)
+    from pipeline import is_romantic_poem
+
+    def accept(poem):
+        return is_romantic_poem(poem, ROMANTIC_KEYWORDS, args.threshold)
+    options = dict(num_poems=args.poems, max_candidates=args.max_candidates, max_length=args.max_length)
+
+    torch.manual_seed(args.seed)
+    _, sequential = sample_sequential(model, tokenizer, ROMANTIC_PROMPTS, accept,
+                                      rng=random.Random(args.seed), **options)
+    torch.manual_seed(args.seed)
+    _, _, batched = sample_poems(model, tokenizer, ROMANTIC_PROMPTS, accept, batch_size=args.batch_size,
+                                 rng=random.Random(args.seed), **options)
+    for name, stats in (('sequential', sequential), (f'batched x{args.batch_size}', batched)):
+        print(f"{name:12s} {stats['accepted']:3d}/{stats['candidates']:3d} accepted in {stats['seconds']:.2f}s: "
+              f"{stats['accepted_per_second'] or 0:.2f} poems/s, "
+              f"{stats['new_tokens'] / stats['seconds']:.0f} tokens/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Longest verbatim match between a poem and the inspiring set.
+
+A suffix automaton of the training poems, joined by a separator character,
+recognises every substring of every poem. Walking a generated poem through
+it (following suffix links on a mismatch, as in the classic longest common
+substring algorithm) finds its longest substring that occurs in the corpus
+in time linear in the length of the poem, whatever the size of the corpus.
+Each state remembers where its strings first end in the corpus, which gives
+the training poem and position of the match.
+
+The automaton has at most twice as many states as the corpus has
+characters and is built in linear time, once per corpus (automaton_for
+keeps the one of the last corpus it was asked for).
+"""
+from bisect import bisect_right
+from ngram_index import corpus_fingerprint
+
+SEPARATOR = '\x00'
+
+
+class SuffixAutomaton:
+    """Suffix automaton of a list of texts"""
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.starts = []
+        self.next = [{}]       # transitions of every state
+        self.link = [-1]       # suffix link
+        self.length = [0]      # length of the longest string of the state
+        self.first_end = [-1]  # corpus position where the state's strings first end
+        last = 0
+        position = 0
+        for k, text in enumerate(self.texts):
+            if k:
+                last = self._extend(last, SEPARATOR, position)
+                position += 1
+            self.starts.append(position)
+            for c in text:
+                last = self._extend(last, c, position)
+                position += 1
+
+    def _extend(self, last, c, position):
+        nxt, link, length, first_end = self.next, self.link, self.length, self.first_end
+        cur = len(length)
+        nxt.append({})
+        link.append(0)
+        length.append(length[last] + 1)
+        first_end.append(position)
+        p = last
+        while p != -1 and c not in nxt[p]:
+            nxt[p][c] = cur
+            p = link[p]
+        if p != -1:
+            q = nxt[p][c]
+            if length[p] + 1 == length[q]:
+                link[cur] = q
+            else:
+                # Split q: the clone takes the strings of length up to length[p] + 1
+                clone = len(length)
+                nxt.append(dict(nxt[q]))
+                link.append(link[q])
+                length.append(length[p] + 1)
+                first_end.append(first_end[q])
+                while p != -1 and nxt[p].get(c) == q:
+                    nxt[p][c] = clone
+                    p = link[p]
+                link[q] = clone
+                link[cur] = clone
+        return cur
+
+    def longest_match(self, text):
+        """
+        (length, text index, start) of the longest substring of text that
+        occurs in one of the texts, at its first occurrence in the corpus;
+        (0, -1, -1) if no character matches.
+        """
+        nxt, link, length = self.next, self.link, self.length
+        state = matched = 0
+        best = best_state = 0
+        for c in text:
+            if c == SEPARATOR:
+                state = matched = 0
+                continue
+            while state and c not in nxt[state]:
+                state = link[state]
+                matched = length[state]
+            if c in nxt[state]:
+                state = nxt[state][c]
+                matched += 1
+            if matched > best:
+                best, best_state = matched, state
+        if not best:
+            return 0, -1, -1
+        start = self.first_end[best_state] - best + 1
+        index = bisect_right(self.starts, start) - 1
+        return best, index, start - self.starts[index]
+
+    def longest_matches(self, texts):
+        """longest_match for every text of a batch"""
+        return [self.longest_match(text) for text in texts]
+
+_cache = {}
+
+def automaton_for(poems):
+    """Suffix automaton of the lowercased poems, reused while the poems are the same"""
+    fingerprint = corpus_fingerprint(poems)
+    if fingerprint not in _cache:
+        _cache.clear()
+        _cache[fingerprint] = SuffixAutomaton(poem.lower() for poem in poems)
+    return _cache[fingerprint]
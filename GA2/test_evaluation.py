@@ -0,0 +1,201 @@
+import difflib
+import glob
+import os
+import re
+from collections import Counter
+import pytest
+
+from ngram_index import NgramIndex, load_index
+import pipeline
+from pipeline import MODULE_DIR, POEMS_FOLDER, iter_poems
+from suffix_automaton import SuffixAutomaton
+from text_analyzer import ROMANTIC_KEYWORDS, PoemAnalyzer
+
+# The notebook's metrics, the references the new structures must reproduce
+
+def compute_n_grams(text, n=3):
+    words = text.lower().split()
+    return [' '.join(words[i:i+n]) for i in range(len(words)-n+1)]
+
+def compute_novelty_score(generated_poem, training_poems, n=3):
+    gen_ngrams = set(compute_n_grams(generated_poem, n))
+    if not gen_ngrams:
+        return 0.0
+    max_overlap = 0
+    for train_poem in training_poems:
+        train_ngrams = set(compute_n_grams(train_poem, n))
+        if train_ngrams:
+            overlap = len(gen_ngrams.intersection(train_ngrams)) / len(gen_ngrams)
+            max_overlap = max(max_overlap, overlap)
+    return 1 - max_overlap
+
+def compute_exact_match_ratio(generated_poem, training_poems):
+    gen_text = generated_poem.lower()
+    for train_poem in training_poems:
+        train_text = train_poem.lower()
+        matcher = difflib.SequenceMatcher(None, gen_text, train_text)
+        match = matcher.find_longest_match(0, len(gen_text), 0, len(train_text))
+        if match.size > 30:
+            return match.size, train_text[match.b:match.b+match.size]
+    return 0, ""
+
+def is_romantic_poem(text, keywords, threshold=2):
+    text_lower = text.lower()
+    count = sum(1 for keyword in keywords if keyword in text_lower)
+    return count >= threshold
+
+def evaluate_coherence_metrics(poem):
+    lines = [line.strip() for line in poem.split('\n') if line.strip()]
+    metrics = {
+        'num_lines': len(lines),
+        'avg_line_length': sum(len(line.split()) for line in lines) / len(lines) if lines else 0,
+        'has_punctuation': bool(re.search(r'[.!?,;:]', poem)),
+        'repeated_words': 0,
+        'sentence_fragments': 0,
+    }
+    word_counts = Counter(poem.lower().split())
+    metrics['repeated_words'] = sum(1 for count in word_counts.values() if count > 3)
+    metrics['sentence_fragments'] = sum(1 for line in lines if len(line.split()) < 3)
+    return metrics
+
+def found_words(poem, lexicon):
+    poem_lower = poem.lower()
+    found_words = {}
+    for category, words in lexicon.items():
+        found = [word for word in words if word in poem_lower]
+        if found:
+            found_words[category] = found
+    return found_words
+
+def analyze_emotional_vocabulary(poem):
+    return found_words(poem, {
+        'love': ['love', 'adore', 'cherish', 'devotion', 'affection', 'passion'],
+        'longing': ['yearn', 'desire', 'miss', 'wish', 'long', 'crave', 'ache'],
+        'beauty': ['beautiful', 'lovely', 'gorgeous', 'fair', 'radiant', 'exquisite'],
+        'intimacy': ['kiss', 'embrace', 'touch', 'caress', 'tender', 'gentle'],
+        'joy': ['delight', 'bliss', 'happiness', 'joy', 'ecstasy', 'rapture'],
+        'sadness': ['sorrow', 'melancholy', 'tears', 'pain', 'heartbreak', 'mourn']
+    })
+
+def analyze_imagery(poem):
+    return found_words(poem, {
+        'visual': ['see', 'look', 'gaze', 'bright', 'dark', 'shimmer', 'glow', 'shadow'],
+        'tactile': ['touch', 'soft', 'warm', 'cold', 'smooth', 'rough'],
+        'auditory': ['hear', 'sound', 'whisper', 'song', 'music', 'voice'],
+        'nature': ['rose', 'flower', 'moon', 'sun', 'star', 'sky', 'ocean', 'wind']
+    })
+
+def detect_rhyme_scheme(poem):
+    lines = [line.strip() for line in poem.split('\n') if line.strip()]
+    if len(lines) < 2:
+        return None, []
+    last_words = []
+    for line in lines:
+        words = re.findall(r'\b\w+\b', line.lower())
+        if words:
+            last_words.append(words[-1])
+    rhyme_pairs = []
+    for i in range(len(last_words) - 1):
+        for j in range(i + 1, len(last_words)):
+            if last_words[i][-2:] == last_words[j][-2:] and len(last_words[i]) > 2:
+                rhyme_pairs.append((i, j, last_words[i], last_words[j]))
+    return last_words, rhyme_pairs
+
+def analyze_rhythm(poem):
+    lines = [line.strip() for line in poem.split('\n') if line.strip()]
+    def count_syllables_rough(line):
+        vowels = 'aeiouAEIOU'
+        syllables = 0
+        previous_was_vowel = False
+        for char in line:
+            is_vowel = char in vowels
+            if is_vowel and not previous_was_vowel:
+                syllables += 1
+            previous_was_vowel = is_vowel
+        return max(1, syllables)
+    syllable_counts = [count_syllables_rough(line) for line in lines]
+    if not syllable_counts:
+        return {'pattern': 'None', 'consistency': 0}
+    avg_syllables = sum(syllable_counts) / len(syllable_counts)
+    variance = sum((c - avg_syllables) ** 2 for c in syllable_counts) / len(syllable_counts)
+    return {
+        'avg_syllables': avg_syllables,
+        'consistency': 1 / (1 + variance),
+        'pattern': syllable_counts[:min(5, len(syllable_counts))]
+    }
+
+@pytest.fixture(scope='module')
+def training_poems():
+    return list(iter_poems(POEMS_FOLDER))
+
+@pytest.fixture(scope='module')
+def poems(training_poems):
+    generated = []
+    for path in sorted(glob.glob(os.path.join(MODULE_DIR, 'generated_poems', '*.txt'))):
+        with open(path, encoding='utf-8') as f:
+            generated.append(f.read())
+    # Verbatim training poems, and halves of two training poems joined
+    spliced = [training_poems[i][:len(training_poems[i]) // 2] + '\n' + training_poems[i + 1][-200:]
+               for i in range(0, 20, 2)]
+    edge_cases = ['', 'love', 'my heart', 'Love\nheart', 'lovely belong', '  \n\n  ',
+                  'A lovely song\nwhere we belong;\nsweetheart, dear heart!', 'Rose.\n\nClose']
+    return generated + training_poems[:10] + spliced + edge_cases
+
+def test_novelty_matches_notebook(training_poems, poems):
+    index = NgramIndex.build(training_poems, ns=(2, 3))
+    for n in (2, 3):
+        scores = index.novelty(poems, n=n)
+        assert scores.tolist() == [compute_novelty_score(poem, training_poems, n) for poem in poems]
+
+def test_load_index_rebuilds_for_a_changed_corpus(tmp_path, training_poems):
+    path = str(tmp_path / 'index.npz')
+    first = load_index(training_poems[:20], ns=(2, 3), path=path)
+    assert load_index(training_poems[:20], ns=(2, 3), path=path).fingerprint == first.fingerprint
+
+    changed = training_poems[:19] + [training_poems[19] + '\nOne more line of love']
+    index = load_index(changed, ns=(2, 3), path=path)
+    assert index.fingerprint != first.fingerprint
+    assert index.num_poems == 20
+    assert NgramIndex.load(path).fingerprint == index.fingerprint
+    poem = 'one more line of love'
+    assert index.novelty([poem], n=3).tolist() == [compute_novelty_score(poem, changed, 3)]
+    assert first.novelty([poem], n=3).tolist() == [1.0]
+
+def test_longest_match_matches_difflib(training_poems, poems):
+    automaton = SuffixAutomaton(poem.lower() for poem in training_poems)
+    texts = [poem.lower() for poem in training_poems]
+    # difflib is slow: the generated poems, one verbatim and three spliced poems, the edge cases
+    for poem in poems[:7] + poems[16:19] + poems[-8:]:
+        query = poem.lower()
+        size, index, start = automaton.longest_match(query)
+        # Without autojunk difflib finds the true longest common substring
+        longest = max(difflib.SequenceMatcher(None, query, text, autojunk=False)
+                      .find_longest_match(0, len(query), 0, len(text)).size for text in texts)
+        assert size == longest
+        if size:
+            assert texts[index][start:start + size] in query
+        else:
+            assert (index, start) == (-1, -1)
+        # The notebook's verdict of a verbatim match over 30 characters
+        assert (size > 30) == (compute_exact_match_ratio(poem, training_poems)[0] > 30)
+
+def test_analyzer_matches_notebook(training_poems, poems):
+    analyzer = PoemAnalyzer()
+    for poem in training_poems + poems:
+        analysis = analyzer.analyze(poem)
+        romantic = is_romantic_poem(poem, ROMANTIC_KEYWORDS)
+        assert analysis['romantic']['is_romantic'] == romantic
+        assert pipeline.is_romantic_poem(poem) == romantic
+        assert analysis['coherence'] == evaluate_coherence_metrics(poem)
+        assert analysis['emotions'] == analyze_emotional_vocabulary(poem)
+        assert analysis['imagery'] == analyze_imagery(poem)
+        last_words, pairs = detect_rhyme_scheme(poem)
+        assert analysis['rhyme'] == {'last_words': last_words, 'pairs': pairs}
+        assert analysis['rhythm'] == analyze_rhythm(poem)
+
+def test_analyzer_finds_words_inside_words():
+    analysis = PoemAnalyzer().analyze('lovely belong')
+    # 'love' inside 'lovely' and 'long' inside 'belong', as substring tests find them
+    assert analysis['romantic'] == {'keywords': 1, 'is_romantic': False}
+    assert analysis['emotions'] == {'love': ['love'], 'longing': ['long'], 'beauty': ['lovely']}
+    assert analysis['rhyme'] == {'last_words': None, 'pairs': []}
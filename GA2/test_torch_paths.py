@@ -0,0 +1,223 @@
+import copy
+import random
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("datasets")
+
+from cpu_inference import conv1d_to_linear, optimize_for_cpu
+from dataset_builder import (PaddingCollator, build_bucketed_dataset, build_packed_dataset, matched_epochs,
+                             tokenize_poems, utilisation_report)
+from pipeline import POEMS_FOLDER, iter_poems
+from poem_format import START_TOKEN
+from sampling import PromptState, sample_poems, sample_round, warpers
+import pipeline
+import tiny_gpt2
+
+BLOCK_SIZE = 64
+
+@pytest.fixture(scope='module')
+def poems():
+    return list(iter_poems(POEMS_FOLDER))[:20]
+
+@pytest.fixture(scope='module')
+def tiny(poems):
+    model, tokenizer = tiny_gpt2.make_tiny(poems, vocab_size=500, n_positions=128, n_embd=32)
+    return model.eval(), tokenizer
+
+def test_packed_blocks(poems, tiny):
+    _, tokenizer = tiny
+    token_lists = tokenize_poems(poems, tokenizer)
+    dataset = build_packed_dataset(token_lists, BLOCK_SIZE, tokenizer.pad_token_id)
+    stream = [token for tokens in token_lists for token in tokens]
+    assert len(dataset) == -(-len(stream) // BLOCK_SIZE)
+
+    packed = []
+    for k, example in enumerate(dataset):
+        ids, mask, labels = example['input_ids'], example['attention_mask'], example['labels']
+        assert len(ids) == len(mask) == len(labels) == BLOCK_SIZE
+        if k < len(dataset) - 1:
+            assert all(mask)  # Only the last block is padded
+        assert labels == [t if m else -100 for t, m in zip(ids, mask)]
+        packed.extend(t for t, m in zip(ids, mask) if m)
+    assert packed == stream
+
+def test_bucketed_examples_chunk_long_poems(poems, tiny):
+    _, tokenizer = tiny
+    token_lists = tokenize_poems(poems, tokenizer)
+    assert max(len(tokens) for tokens in token_lists) > BLOCK_SIZE
+    dataset = build_bucketed_dataset(token_lists, BLOCK_SIZE)
+    examples = iter(dataset)
+    for tokens in token_lists:
+        # Every poem comes back whole, in chunks of at most BLOCK_SIZE tokens
+        pieces = [next(examples) for _ in range(-(-len(tokens) // BLOCK_SIZE))]
+        assert [t for piece in pieces for t in piece['input_ids']] == tokens
+        for piece in pieces:
+            assert piece['labels'] == piece['input_ids']
+            assert piece['attention_mask'] == [1] * piece['length']
+            assert piece['length'] == len(piece['input_ids']) <= BLOCK_SIZE
+    assert next(examples, None) is None
+
+def test_padding_collator_pads_to_the_longest_example():
+    features = [{'input_ids': [5, 6, 7], 'attention_mask': [1, 1, 1], 'labels': [5, 6, 7], 'length': 3},
+                {'input_ids': [8, 9, 10, 11, 12], 'attention_mask': [1] * 5, 'labels': [8, 9, 10, 11, 12],
+                 'length': 5}]
+    batch = PaddingCollator(pad_token_id=0)(features)
+    assert set(batch) == {'input_ids', 'attention_mask', 'labels'}
+    assert batch['input_ids'].tolist() == [[5, 6, 7, 0, 0], [8, 9, 10, 11, 12]]
+    assert batch['attention_mask'].tolist() == [[1, 1, 1, 0, 0], [1, 1, 1, 1, 1]]
+    assert batch['labels'].tolist() == [[5, 6, 7, -100, -100], [8, 9, 10, 11, 12]]
+    assert batch['input_ids'].dtype == torch.long
+    batch = PaddingCollator(pad_token_id=2, pad_to_multiple_of=4)(features)
+    assert batch['input_ids'].tolist() == [[5, 6, 7, 2, 2, 2, 2, 2], [8, 9, 10, 11, 12, 2, 2, 2]]
+    assert batch['labels'][1].tolist() == [8, 9, 10, 11, 12, -100, -100, -100]
+
+def test_utilisation_report_counts_tokens():
+    token_lists = [list(range(5)), list(range(10)), list(range(23))]
+    report = utilisation_report(token_lists, block_size=10, batch_size=2)
+    # Padded: 3 poems of 10 tokens, the longest cut to 10
+    assert report['padded'] == {'examples': 3, 'real_tokens': 25, 'processed_tokens': 30,
+                                'dropped_tokens': 13, 'utilisation': 25 / 30}
+    # Bucketed: chunks of 10, 10, 10, 5 and 3 in batches [10, 10], [10, 5], [3]
+    assert report['bucketed'] == {'examples': 5, 'real_tokens': 38, 'processed_tokens': 43,
+                                  'dropped_tokens': 0, 'utilisation': 38 / 43}
+    # Packed: 38 tokens in 4 blocks of 10
+    assert report['packed'] == {'examples': 4, 'real_tokens': 38, 'processed_tokens': 40,
+                                'dropped_tokens': 0, 'utilisation': 38 / 40}
+
+@pytest.mark.parametrize('epochs, padded_examples, examples, batch_size',
+                         [(3, 10, 5, 4), (1, 100, 37, 4), (2.5, 7, 7, 2), (4, 1, 9, 8)])
+def test_matched_epochs_keep_the_step_budget(epochs, padded_examples, examples, batch_size):
+    matched = matched_epochs(epochs, padded_examples, examples, batch_size)
+    padded_steps = epochs * -(-padded_examples // batch_size)
+    assert matched * -(-examples // batch_size) == pytest.approx(padded_steps)
+
+def write_poems(folder, poems):
+    folder.mkdir(exist_ok=True)
+    for i, poem in enumerate(poems):
+        (folder / f"RomanticPoems{i}.txt").write_text(poem, encoding='utf-8')
+    return pipeline.poem_files(str(folder))
+
+def test_token_cache_retokenizes_only_edited_files(tmp_path, poems, tiny):
+    _, tokenizer = tiny
+    paths = write_poems(tmp_path / 'poems', poems[:4])
+    cache_dir = str(tmp_path / 'tokens')
+    first = pipeline.TokenCache(tokenizer, cache_dir)
+    assert first.token_lists(paths) == tokenize_poems(poems[:4], tokenizer)
+    assert (first.hits, first.misses) == (0, 4)
+
+    # A longer file: its size changes whatever the clock resolution
+    edited = poems[2] + "\nAnd one more line of love"
+    with open(paths[2], 'w', encoding='utf-8') as f:
+        f.write(edited)
+    cache = pipeline.TokenCache(tokenizer, cache_dir)
+    expected = tokenize_poems(poems[:2] + [edited] + poems[3:4], tokenizer)
+    assert cache.token_lists(paths) == expected
+    assert (cache.hits, cache.misses) == (3, 1)
+    again = pipeline.TokenCache(tokenizer, cache_dir)
+    assert again.token_lists(paths) == expected
+    assert (again.hits, again.misses) == (4, 0)
+
+def test_token_cache_keeps_tokenizers_apart(tmp_path, poems, tiny):
+    _, tokenizer = tiny
+    other = tiny_gpt2.make_tokenizer(poems, vocab_size=400)
+    paths = write_poems(tmp_path / 'poems', poems[:3])
+    cache_dir = str(tmp_path / 'tokens')
+    pipeline.TokenCache(tokenizer, cache_dir).token_lists(paths)
+    cache = pipeline.TokenCache(other, cache_dir)
+    assert cache.token_directory != pipeline.TokenCache(tokenizer, cache_dir).token_directory
+    assert cache.token_lists(paths) == tokenize_poems(poems[:3], other)
+    assert (cache.hits, cache.misses) == (0, 3)
+    # Both tokenizers' tokens stay cached
+    for t in (tokenizer, other):
+        cache = pipeline.TokenCache(t, cache_dir)
+        assert cache.token_lists(paths) == tokenize_poems(poems[:3], t)
+        assert (cache.hits, cache.misses) == (3, 0)
+
+def test_sample_round_greedy_matches_generate(tiny):
+    model, tokenizer = tiny
+    max_length = 40
+    state = PromptState(model, tokenizer, "Love")
+    processors = warpers(temperature=1.0, top_k=1, top_p=1.0)
+    sampled = [sequence for sequence, _, _ in sample_round(model, tokenizer, state, 3, processors, max_length)]
+
+    input_ids = tokenizer.encode(f"{START_TOKEN}Love", return_tensors='pt')
+    with torch.no_grad():
+        generated = model.generate(input_ids, max_length=max_length, do_sample=False,
+                                   pad_token_id=tokenizer.eos_token_id, eos_token_id=tokenizer.eos_token_id)
+    assert len(sampled) == 3
+    for sequence in sampled:
+        assert torch.equal(sequence, generated[0])
+
+def test_sample_poems_stops_at_num_poems_or_max_candidates(tiny):
+    model, tokenizer = tiny
+    seen = []
+    def every_third(poem):
+        seen.append(poem)
+        return len(seen) % 3 == 0
+
+    rng = random.Random(0)
+    accepted, candidates, stats = sample_poems(model, tokenizer, ["Love", "My heart"], every_third, num_poems=2,
+                                               batch_size=4, max_candidates=20, max_length=24, rng=rng)
+    # The second accepted candidate is the sixth: the second round stops there
+    assert [c['accepted'] for c in candidates] == [False, False, True, False, False, True]
+    assert accepted == [candidates[2], candidates[5]]
+    assert [c['round'] for c in candidates] == [0, 0, 0, 0, 1, 1]
+    assert (stats['rounds'], stats['candidates'], stats['accepted']) == (2, 6, 2)
+    assert stats['new_tokens'] == sum(c['new_tokens'] for c in candidates)
+
+    accepted, candidates, stats = sample_poems(model, tokenizer, ["Love"], lambda poem: False, num_poems=1,
+                                               batch_size=8, max_candidates=19, max_length=24, rng=rng)
+    assert accepted == []
+    assert len(candidates) == 19
+    assert [c['round'] for c in candidates] == [0] * 8 + [1] * 8 + [2] * 3
+
+def test_romantic_poem_needs_an_attempt(tiny):
+    model, tokenizer = tiny
+    for batch_size in (None, 4):
+        with pytest.raises(ValueError):
+            pipeline.generate_romantic_poem(model, tokenizer, max_attempts=0, batch_size=batch_size)
+    # Nothing passes: the last candidate comes back
+    poem, prompt = pipeline.generate_romantic_poem(model, tokenizer, max_attempts=3, batch_size=2,
+                                                   threshold=100, max_length=24, rng=random.Random(1))
+    assert prompt in pipeline.ROMANTIC_PROMPTS
+    assert isinstance(poem, str)
+
+def test_int8_model_logits(tiny):
+    model, tokenizer = tiny
+    quantized = optimize_for_cpu(model, quantize=True)
+    input_ids = tokenizer.encode(f"{START_TOKEN}My heart", return_tensors='pt')
+    with torch.inference_mode():
+        logits = quantized(input_ids).logits
+        reference = model(input_ids).logits
+    assert logits.shape == reference.shape == (1, input_ids.shape[1], len(tokenizer))
+    assert torch.isfinite(logits).all()
+    assert (logits - reference).abs().max() < 0.05
+    assert torch.equal(logits.argmax(-1), reference.argmax(-1))
+
+def test_conv1d_to_linear_keeps_logits(tiny):
+    model, tokenizer = tiny
+    converted = conv1d_to_linear(copy.deepcopy(model))
+    assert isinstance(converted.transformer.h[0].mlp.c_proj, torch.nn.Linear)
+    input_ids = tokenizer.encode(f"{START_TOKEN}My heart", return_tensors='pt')
+    with torch.inference_mode():
+        assert torch.equal(converted(input_ids).logits, model(input_ids).logits)
+
+def test_int8_model_keeps_lm_head_tied(tiny):
+    model, _ = tiny
+    quantized = optimize_for_cpu(model, quantize=True)
+    dynamic_linear = torch.ao.nn.quantized.dynamic.Linear
+    assert isinstance(quantized.transformer.h[0].attn.c_attn, dynamic_linear)
+    assert type(quantized.lm_head) is torch.nn.Linear
+    assert quantized.lm_head.weight.dtype == torch.float32
+    assert quantized.lm_head.weight is quantized.transformer.wte.weight
+
+@pytest.mark.parametrize('mode', ['padded', 'bucketed'])
+def test_train_command_runs(tmp_path, mode):
+    pytest.importorskip("accelerate")
+    output = tmp_path / 'model'
+    pipeline.main(['--cache-dir', str(tmp_path / 'tokens'), 'train', '--model', 'tiny', '--max-steps', '1',
+                   '--mode', mode, '--checkpoints', str(tmp_path / 'checkpoints'), '--output', str(output)])
+    assert (output / 'config.json').exists()
+    assert (output / 'tokenizer_config.json').exists()
@@ -0,0 +1,204 @@
+"""
+Single-pass text analysis of poems for the evaluation metrics.
+
+is_romantic_poem, analyze_emotional_vocabulary, analyze_imagery,
+evaluate_coherence_metrics, detect_rhyme_scheme and analyze_rhythm each
+lowercase and scan a poem again, and every keyword check is a separate
+substring test. PoemAnalyzer lowercases and splits a poem once and returns
+all of their results together, with the same values.
+
+Lexicons: all word lists are merged into one trie, compiled into a single
+regular expression that is tried at every position of a text (a
+deterministic automaton run by the regex engine, in C). It reports the
+longest word starting at each position; every word that is a prefix of it
+occurs there too. This finds exactly the words the substring tests find,
+'love' inside 'lovely' or 'long' inside 'belong' included, so the scores do
+not change. As the words are made of word characters, each one occurs
+within a single token of the text: the poem is split into tokens once and
+the automaton only runs on tokens it has not seen before, the words found
+in every token being remembered.
+
+Rhymes: line endings are grouped by their last two letters, the rhyme key
+detect_rhyme_scheme compares, so pairs come from the groups instead of
+comparing every pair of lines.
+
+analyze_batch() runs over many poems, optionally in a process pool.
+"""
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+ROMANTIC_KEYWORDS = [
+    'love', 'heart', 'dear', 'sweet', 'beloved', 'kiss', 'embrace',
+    'passion', 'romance', 'tender', 'beauty', 'soul', 'desire', 'devotion',
+    'affection', 'cherish', 'adore', 'darling', 'sweetheart', 'angel'
+]
+
+EMOTION_WORDS = {
+    'love': ['love', 'adore', 'cherish', 'devotion', 'affection', 'passion'],
+    'longing': ['yearn', 'desire', 'miss', 'wish', 'long', 'crave', 'ache'],
+    'beauty': ['beautiful', 'lovely', 'gorgeous', 'fair', 'radiant', 'exquisite'],
+    'intimacy': ['kiss', 'embrace', 'touch', 'caress', 'tender', 'gentle'],
+    'joy': ['delight', 'bliss', 'happiness', 'joy', 'ecstasy', 'rapture'],
+    'sadness': ['sorrow', 'melancholy', 'tears', 'pain', 'heartbreak', 'mourn']
+}
+
+IMAGERY_WORDS = {
+    'visual': ['see', 'look', 'gaze', 'bright', 'dark', 'shimmer', 'glow', 'shadow'],
+    'tactile': ['touch', 'soft', 'warm', 'cold', 'smooth', 'rough'],
+    'auditory': ['hear', 'sound', 'whisper', 'song', 'music', 'voice'],
+    'nature': ['rose', 'flower', 'moon', 'sun', 'star', 'sky', 'ocean', 'wind']
+}
+
+PUNCTUATION = re.compile(r'[.!?,;:]')
+WORD = re.compile(r'\b\w+\b')
+TOKEN = re.compile(r'\w+')
+VOWEL_RUN = re.compile(r'[aeiouAEIOU]+')
+
+def _trie_pattern(node):
+    """Regex matching the longest word of a trie (nested dicts, '' marks a word end)"""
+    branches = [re.escape(c) + _trie_pattern(child) for c, child in sorted(node.items()) if c]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    return f'(?:{pattern})?' if '' in node else pattern
+
+
+class Lexicon:
+    """The words of a list that occur in a text, as `word in text` would find them"""
+
+    def __init__(self, words):
+        self.words = list(dict.fromkeys(w for w in words if w))
+        # A word of word characters only occurs within one token of the text
+        self._other_words = [w for w in self.words if not TOKEN.fullmatch(w)]
+        trie = {}
+        for word in self.words:
+            node = trie
+            for c in word:
+                node = node.setdefault(c, {})
+            node[''] = True
+        self._regex = re.compile('(?=(' + _trie_pattern(trie) + '))') if self.words else None
+        self._prefixes = {w: [p for p in self.words if w.startswith(p)] for w in self.words}
+        self._token_words = {}
+
+    def scan(self, text):
+        """Set of the words occurring in text, from one pass of the automaton"""
+        found = set()
+        if self._regex is not None:
+            for match in self._regex.finditer(text):
+                found.update(self._prefixes[match.group(1)])
+        return found
+
+    def find(self, text):
+        """Set of the words occurring in text; tokens seen before are not scanned again"""
+        found = set()
+        token_words = self._token_words
+        for token in set(TOKEN.findall(text)):
+            words = token_words.get(token)
+            if words is None:
+                words = token_words[token] = frozenset(self.scan(token))
+            found |= words
+        found.update(w for w in self._other_words if w in text)
+        return found
+
+def rhyme_pairs(last_words):
+    """
+    (i, j, word i, word j) for i < j whose last two letters agree and whose
+    first word is longer than two letters, as detect_rhyme_scheme pairs them.
+    """
+    groups = {}
+    for i, word in enumerate(last_words):
+        groups.setdefault(word[-2:], []).append(i)
+    pairs = []
+    for members in groups.values():
+        for k, i in enumerate(members):
+            if len(last_words[i]) > 2:
+                pairs.extend((i, j, last_words[i], last_words[j]) for j in members[k + 1:])
+    pairs.sort()
+    return pairs
+
+
+class PoemAnalyzer:
+    """
+    All text metrics of a poem from one pass. keywords and threshold are
+    those of is_romantic_poem; emotion_words and imagery_words map category
+    names to word lists.
+    """
+
+    def __init__(self, keywords=ROMANTIC_KEYWORDS, threshold=2, emotion_words=EMOTION_WORDS,
+                 imagery_words=IMAGERY_WORDS):
+        self.keywords = list(keywords)
+        self.threshold = threshold
+        self.emotion_words = emotion_words
+        self.imagery_words = imagery_words
+        all_words = list(self.keywords)
+        for lexicon in (emotion_words, imagery_words):
+            for words in lexicon.values():
+                all_words.extend(words)
+        self.lexicon = Lexicon(all_words)
+
+    def analyze(self, poem):
+        """
+        Dict of
+            romantic   {'keywords': count, 'is_romantic': bool}   (is_romantic_poem)
+            coherence  evaluate_coherence_metrics
+            emotions   analyze_emotional_vocabulary
+            imagery    analyze_imagery
+            rhyme      {'last_words', 'pairs'}   (detect_rhyme_scheme; None and [] under two lines)
+            rhythm     analyze_rhythm
+        """
+        lower = poem.lower()
+        found = self.lexicon.find(lower)
+        lines = [line.strip() for line in poem.split('\n') if line.strip()]
+        words_per_line = [len(line.split()) for line in lines]
+
+        count = sum(1 for keyword in self.keywords if keyword in found)
+        coherence = {
+            'num_lines': len(lines),
+            'avg_line_length': sum(words_per_line) / len(lines) if lines else 0,
+            'has_punctuation': bool(PUNCTUATION.search(poem)),
+            'repeated_words': sum(1 for c in Counter(lower.split()).values() if c > 3),
+            'sentence_fragments': sum(1 for n in words_per_line if n < 3),
+        }
+
+        def categories(lexicon):
+            matches = {}
+            for category, words in lexicon.items():
+                hits = [word for word in words if word in found]
+                if hits:
+                    matches[category] = hits
+            return matches
+
+        if len(lines) < 2:
+            rhyme = {'last_words': None, 'pairs': []}
+        else:
+            last_words = []
+            for line in lines:
+                line_words = WORD.findall(line.lower())
+                if line_words:
+                    last_words.append(line_words[-1])
+            rhyme = {'last_words': last_words, 'pairs': rhyme_pairs(last_words)}
+
+        syllables = [max(1, len(VOWEL_RUN.findall(line))) for line in lines]
+        if syllables:
+            avg = sum(syllables) / len(syllables)
+            variance = sum((c - avg) ** 2 for c in syllables) / len(syllables)
+            rhythm = {'avg_syllables': avg, 'consistency': 1 / (1 + variance), 'pattern': syllables[:5]}
+        else:
+            rhythm = {'pattern': 'None', 'consistency': 0}
+
+        return {
+            'romantic': {'keywords': count, 'is_romantic': count >= self.threshold},
+            'coherence': coherence,
+            'emotions': categories(self.emotion_words),
+            'imagery': categories(self.imagery_words),
+            'rhyme': rhyme,
+            'rhythm': rhythm,
+        }
+
+    def analyze_batch(self, poems, workers=1, chunksize=256):
+        """analyze() for every poem, in a pool of workers processes if workers > 1"""
+        if workers > 1:
+            with ProcessPoolExecutor(workers) as executor:
+                return list(executor.map(self.analyze, poems, chunksize=chunksize))
+        return [self.analyze(poem) for poem in poems]
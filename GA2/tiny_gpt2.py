@@ -0,0 +1,43 @@
+"""
+A tiny, randomly initialised GPT-2 and a byte-level BPE tokenizer trained
+on the inspiring set. Both are built locally in seconds, so the dataset
+builders, samplers and benchmarks can be exercised on CPU without
+downloading gpt2. The model is untrained: what it writes is noise, but it
+costs what a GPT-2 of its shape costs.
+"""
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+from poem_format import END_TOKEN
+
+def make_tokenizer(poems, vocab_size=2000):
+    """Byte-level BPE tokenizer trained on poems, with <|endoftext|> as eos and pad token"""
+    bpe = Tokenizer(models.BPE())
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=vocab_size, special_tokens=[END_TOKEN],
+                                  initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    bpe.train_from_iterator(poems, trainer)
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=bpe, bos_token=END_TOKEN, eos_token=END_TOKEN)
+    tokenizer.pad_token = tokenizer.eos_token
+    return tokenizer
+
+def make_model(tokenizer, n_positions=512, n_embd=64, n_layer=2, n_head=2, seed=0):
+    """Randomly initialised GPT2LMHeadModel sized for tokenizer"""
+    torch.manual_seed(seed)
+    config = GPT2Config(
+        vocab_size=len(tokenizer),
+        n_positions=n_positions,
+        n_embd=n_embd,
+        n_layer=n_layer,
+        n_head=n_head,
+        bos_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.eos_token_id,
+    )
+    return GPT2LMHeadModel(config)
+
+def make_tiny(poems, vocab_size=2000, **config):
+    """(model, tokenizer) pair; config is passed to make_model"""
+    tokenizer = make_tokenizer(poems, vocab_size)
+    return make_model(tokenizer, **config), tokenizer